@@ -18,7 +18,7 @@
 from django.conf import settings
 from rest_framework.routers import DefaultRouter, SimpleRouter
 
-from mac_backend_api.audio.api.views import AudioViewSet, StreamViewSet
+from mac_backend_api.audio.api.views import AudioViewSet, StreamViewSet, TranscodeQueueViewSet, UploadSessionViewSet
 from mac_backend_api.users.api.views import UserViewSet
 
 app_name = "api"
@@ -31,6 +31,8 @@ else:
 router.register("users", UserViewSet)
 router.register("audio", AudioViewSet)
 router.register("stream", StreamViewSet)
+router.register("uploads", UploadSessionViewSet)
+router.register("transcode-queue", TranscodeQueueViewSet, basename="transcode-queue")
 
 urlpatterns = [
 ]
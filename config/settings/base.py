@@ -15,6 +15,7 @@
 #  You should have received a copy of the GNU General Public License
 #  along with mac_backend_api.  If not, see <https://www.gnu.org/licenses/>.
 
+import os
 from pathlib import Path
 
 ROOT_DIR = Path(__file__).resolve(strict=True).parent.parent.parent
@@ -142,3 +143,72 @@ ADMIN_SITE_PATH = "admin/"
 
 # Custom User Model
 AUTH_USER_MODEL = "users.User"
+
+# Audio Transcoding
+# CPUs left to the API processes, the worker never runs more transcoding processes than the remaining CPUs
+TRANSCODE_RESERVED_CPUS = 1
+TRANSCODE_WORKER_PROCESSES = max((os.cpu_count() or 1) - TRANSCODE_RESERVED_CPUS, 1)
+# The worker lowers its scheduling priority by this much so requests are served first
+TRANSCODE_WORKER_NICENESS = 10
+TRANSCODE_POLL_INTERVAL = 1.0
+# Jobs running for longer than this many seconds are assumed to belong to a dead worker and are queued again
+TRANSCODE_JOB_TIMEOUT = 60 * 60
+# Uploads are accepted with a 202 once this many interactive jobs are queued, and refused with a 503 at the max depth
+TRANSCODE_QUEUE_HIGH_WATER_MARK = 200
+TRANSCODE_QUEUE_MAX_DEPTH = 2000
+TRANSCODE_RETRY_AFTER = 30
+# The length of HLS segments in seconds, None disables segmented output.  Only MP3 and AAC streams are segmented
+TRANSCODE_SEGMENT_DURATION = 6
+# The disk budget in bytes of renditions only the rendition cache holds, least recently used ones are evicted above it
+TRANSCODE_CACHE_MAX_SIZE = 100 * 1024 ** 3
+# Only render the middle rendition of each upload, the others are rendered the first time they are requested
+TRANSCODE_LAZY_RENDITIONS = False
+# The number of seconds a request waits for a stream to be rendered before answering with a 503
+TRANSCODE_ON_DEMAND_TIMEOUT = 10
+TRANSCODE_ON_DEMAND_POLL_INTERVAL = 0.25
+
+# Waveforms
+WAVEFORM_SAMPLES_PER_PIXEL = (256, 512, 1024, 2048, 4096, 8192)
+WAVEFORM_DEFAULT_SAMPLES_PER_PIXEL = 1024
+WAVEFORM_BITS = 8
+WAVEFORM_CACHE_MAX_AGE = 60 * 60 * 24 * 365
+
+# Uploads
+FILE_UPLOAD_HANDLERS = [
+    "mac_backend_api.audio.hashing.HashingMemoryFileUploadHandler",
+    "mac_backend_api.audio.hashing.HashingTemporaryFileUploadHandler",
+]
+UPLOAD_SESSION_MAX_SIZE = 2 * 1024 ** 3
+
+# Media Delivery
+# "x-accel-redirect" or "x-sendfile" to have the web server send stream files, None to send them from Django
+MEDIA_OFFLOAD = None
+# The internal nginx location aliased to MEDIA_ROOT, used with "x-accel-redirect"
+MEDIA_OFFLOAD_PREFIX = "/protected/"
+
+# Stream Storage
+# Stream and segment files are stored by the SHA-256 of their contents, sharded under this directory of MEDIA_ROOT
+STREAM_STORAGE_PREFIX = "audio/objects"
+# True to fsync every file as it is written, "batch" to fsync pending files together, False to leave it to the OS
+STREAM_STORAGE_FSYNC = "batch"
+STREAM_STORAGE_FSYNC_BATCH_SIZE = 64
+
+# Listens
+# The longest time in seconds a listen is buffered in memory before it is added to the audio's listen_count
+LISTEN_FLUSH_INTERVAL = 5
+
+# Likes
+# The most like and unlike operations a client may send in one batch request
+LIKE_BATCH_MAX_SIZE = 500
+
+# Trending
+# Listens and likes lose half of their weight in the trending score every this many hours
+TRENDING_HALF_LIFE = 24
+# The number of days of listens and likes a full computation of the trending scores reads
+TRENDING_WINDOW = 7
+# The number of listens a like is worth
+TRENDING_LIKE_WEIGHT = 5
+# Scores which decay below this are removed from the trending table
+TRENDING_MIN_SCORE = 0.01
+# The most audios the trending feed returns
+TRENDING_FEED_SIZE = 50
@@ -45,3 +45,6 @@ EMAIL_PORT = 1025
 # MEDIA
 MEDIA_ROOT = path.join(ROOT_DIR, "development_media_storage")
 MEDIA_URL = "/media/"
+
+# Serve offloaded media from Django when MEDIA_OFFLOAD is enabled without a web server in front
+MIDDLEWARE += ["mac_backend_api.audio.middleware.MediaOffloadStandInMiddleware"]
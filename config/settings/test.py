@@ -45,3 +45,10 @@ TEMPLATES[-1]["OPTIONS"]["loaders"] = [
 # EMAIL
 
 EMAIL_BACKEND = "django.core.mail.backends.locmem.EmailBackend"
+
+# Keep the test process at its normal priority when running the transcode worker
+TRANSCODE_WORKER_NICENESS = 0
+# Answer requests for unrendered streams immediately, no worker runs during the tests
+TRANSCODE_ON_DEMAND_TIMEOUT = 0
+# Write listens immediately, the buffer's timer thread would not share the test database's transaction
+LISTEN_FLUSH_INTERVAL = 0
@@ -17,24 +17,31 @@
 from django.conf import settings
 from django.contrib import admin
 
-from mac_backend_api.audio.models import Audio, Stream, Like
+from mac_backend_api.audio.models import (Audio, CachedRendition, Stream, Like, SkippedRendition, TranscodeJob,
+                                          TrendingScore)
 
 
 class StreamInline(admin.StackedInline):
     model = Stream
 
 
+class SkippedRenditionInline(admin.TabularInline):
+    model = SkippedRendition
+    readonly_fields = ["format", "sample_rate", "bit_rate", "reason"]
+    extra = 0
+
+
 @admin.register(Audio)
 class AudioAdmin(admin.ModelAdmin):
     list_display = ["title", "uploaded_at", "is_public", "listen_count", "like_count"]
     search_fields = ["title", "authors__username", "streams__format", "streams__bit_rate", "streams__sample_rate"]
-    inlines = [StreamInline]
+    inlines = [StreamInline, SkippedRenditionInline]
 
 
 @admin.register(Stream)
 class StreamAdmin(admin.ModelAdmin):
     list_display = ["audio__title", "audio__is_public", "audio__uploaded_at", "allow_downloads", "format", "bit_rate",
-                    "sample_rate"]
+                    "sample_rate", "status"]
     search_fields = ["audio__title", "audio__authors__username", "format", "bit_rate", "sample_rate"]
 
     def audio__title(self, instance) -> str:
@@ -54,3 +61,23 @@ class LikeAdmin(admin.ModelAdmin):
 
     def audio__title(self, instance) -> str:
         return instance.audio.title
+
+
+@admin.register(TranscodeJob)
+class TranscodeJobAdmin(admin.ModelAdmin):
+    list_display = ["stream", "status", "priority", "attempts", "created_at", "started_at", "finished_at"]
+    list_filter = ["status", "priority"]
+    search_fields = ["stream__id", "stream__audio__title"]
+
+
+@admin.register(CachedRendition)
+class CachedRenditionAdmin(admin.ModelAdmin):
+    list_display = ["source_hash", "format", "bit_rate", "sample_rate", "encoder_version", "total_size", "last_used_at"]
+    list_filter = ["format", "encoder_version"]
+    search_fields = ["source_hash"]
+
+
+@admin.register(TrendingScore)
+class TrendingScoreAdmin(admin.ModelAdmin):
+    list_display = ["audio", "score", "computed_through"]
+    search_fields = ["audio__title"]
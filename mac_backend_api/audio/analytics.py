@@ -0,0 +1,59 @@
+#  Copyright (C) 2020  Mind Audio Central
+#
+#  This file is part of mac_backend_api.
+#
+#  mac_backend_api is free software: you can redistribute it and/or modify
+#  it under the terms of the GNU General Public License as published by
+#  the Free Software Foundation, either version 3 of the License, or
+#  (at your option) any later version.
+#
+#  mac_backend_api is distributed in the hope that it will be useful,
+#  but WITHOUT ANY WARRANTY; without even the implied warranty of
+#  MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+#  GNU General Public License for more details.
+#
+#  You should have received a copy of the GNU General Public License
+#  along with mac_backend_api.  If not, see <https://www.gnu.org/licenses/>.
+from datetime import timedelta
+
+from django.db.models import F, Sum
+from django.db.models.functions import TruncDay, TruncWeek
+
+from mac_backend_api.audio.models import ListenRollup
+
+DEFAULT_RANGE = timedelta(days=7)
+
+INTERVALS = {
+    "hour": lambda field: F(field),
+    "day": TruncDay,
+    "week": TruncWeek,
+}
+
+
+def get_listen_series(rollups, since, until, interval="hour") -> list:
+    """
+    Sum hourly ListenRollups into a time series.
+    :param rollups:  A queryset of the ListenRollups to include, such as those of an audio or an author's audios.
+    :param since:    The start of the series, inclusive.
+    :param until:    The end of the series, exclusive.
+    :param interval: "hour", "day", or "week".  Default is "hour".
+    :return:         A list of dictionaries containing the 'time' each interval starts and its 'count' of listens, in
+                     order.  Intervals without listens are left out.
+    """
+    rollups = rollups.filter(hour__gte=since, hour__lt=until).order_by()
+    rows = rollups.annotate(time=INTERVALS[interval]("hour")).values("time").annotate(count=Sum("count"))
+    return list(rows.order_by("time"))
+
+
+def get_audio_listen_series(audio, since, until, interval="hour") -> list:
+    """
+    Get the listen time series of an audio.  See `get_listen_series`.
+    """
+    return get_listen_series(ListenRollup.objects.filter(audio=audio), since, until, interval)
+
+
+def get_author_listen_series(author, since, until, interval="hour") -> list:
+    """
+    Get the listen time series of every audio by an author combined.  See `get_listen_series`.
+    """
+    return get_listen_series(ListenRollup.objects.filter(audio__authors=author), since, until, interval)
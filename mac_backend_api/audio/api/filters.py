@@ -0,0 +1,45 @@
+#  Copyright (C) 2020  Mind Audio Central
+#
+#  This file is part of mac_backend_api.
+#
+#  mac_backend_api is free software: you can redistribute it and/or modify
+#  it under the terms of the GNU General Public License as published by
+#  the Free Software Foundation, either version 3 of the License, or
+#  (at your option) any later version.
+#
+#  mac_backend_api is distributed in the hope that it will be useful,
+#  but WITHOUT ANY WARRANTY; without even the implied warranty of
+#  MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+#  GNU General Public License for more details.
+#
+#  You should have received a copy of the GNU General Public License
+#  along with mac_backend_api.  If not, see <https://www.gnu.org/licenses/>.
+
+from rest_framework.exceptions import ValidationError
+from rest_framework.filters import BaseFilterBackend
+
+
+class AudioMetadataFilter(BaseFilterBackend):
+    """
+    Filters Audio by the metadata probed from its source file.
+
+    Each query parameter in `FILTERS` maps to a lookup and the type its value is converted to.
+    """
+    FILTERS = {
+        "min_duration": ("duration__gte", float),
+        "max_duration": ("duration__lte", float),
+        "channels": ("channels", int),
+        "min_sample_rate": ("source_sample_rate__gte", int),
+        "min_bit_rate": ("source_bit_rate__gte", int),
+    }
+
+    def filter_queryset(self, request, queryset, view):
+        for parameter, (lookup, value_type) in self.FILTERS.items():
+            value = request.query_params.get(parameter)
+            if value is None:
+                continue
+            try:
+                queryset = queryset.filter(**{lookup: value_type(value)})
+            except ValueError:
+                raise ValidationError({parameter: f"Expected a value of type {value_type.__name__}."})
+        return queryset
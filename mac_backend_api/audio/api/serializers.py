@@ -15,9 +15,18 @@
 #  You should have received a copy of the GNU General Public License
 #  along with mac_backend_api.  If not, see <https://www.gnu.org/licenses/>.
 
+from django.conf import settings
+from django.core.files.base import ContentFile
+from django.utils import timezone
 from rest_framework import serializers
 
-from mac_backend_api.audio.models import Audio, Stream
+from mac_backend_api.audio.analytics import DEFAULT_RANGE, INTERVALS
+from mac_backend_api.audio.hashing import get_sha256
+from mac_backend_api.audio.models import Audio, SkippedRendition, Stream, UploadSession
+from mac_backend_api.audio.presets import plan_renditions
+from mac_backend_api.audio.probe import probe_file
+from mac_backend_api.audio.transcoding.cache import find_cached_rendition
+from mac_backend_api.audio.transcoding.queue import enqueue_stream, reuse_waveforms
 
 
 class NoFileUpdatesSerializer(serializers.ModelSerializer):
@@ -59,7 +68,8 @@ class StreamSerializer(NoFileUpdatesSerializer):
 
     class Meta:
         model = Stream
-        fields = ["id", "url", "audio", "format", "bit_rate", "sample_rate", "allow_downloads", "file"]
+        fields = ["id", "url", "audio", "format", "bit_rate", "sample_rate", "allow_downloads", "status", "file",
+                  "duration", "channels", "actual_bit_rate", "actual_sample_rate", "size"]
 
         extra_kwargs = {
             "url": {"view_name": "api:stream-detail", "lookup_field": "id"}
@@ -73,14 +83,16 @@ class NestedStreamSerializer(serializers.ModelSerializer):
     """
     class Meta:
         model = Stream
-        fields = ["id", "url", "format", "bit_rate", "sample_rate", "allow_downloads", "file"]
+        fields = ["id", "url", "format", "bit_rate", "sample_rate", "allow_downloads", "status", "file",
+                  "duration", "channels", "actual_bit_rate", "actual_sample_rate", "size"]
 
         extra_kwargs = {
             "url": {"view_name": "api:stream-detail", "lookup_field": "id"}
         }
 
 
-DEFAULT_STREAM_PRESETS = (
+# Renditions served whole by the media view.
+OGG_STREAM_PRESETS = (
     {
         "format": Stream.AudioFormat.OGG,
         "sample_rate": Stream.AudioSampleRate.HIGH,
@@ -98,6 +110,27 @@ DEFAULT_STREAM_PRESETS = (
     }
 )
 
+# Renditions segmented for the HLS playlists, which only support AAC and MP3 segments.  AAC in HLS is limited to 48 kHz.
+HLS_STREAM_PRESETS = (
+    {
+        "format": Stream.AudioFormat.AAC,
+        "sample_rate": Stream.AudioSampleRate.AVERAGE,
+        "bit_rate": Stream.AudioBitRate.HIGH
+    },
+    {
+        "format": Stream.AudioFormat.AAC,
+        "sample_rate": Stream.AudioSampleRate.AVERAGE,
+        "bit_rate": Stream.AudioBitRate.AVERAGE
+    },
+    {
+        "format": Stream.AudioFormat.AAC,
+        "sample_rate": Stream.AudioSampleRate.LOW,
+        "bit_rate": Stream.AudioBitRate.LOW
+    }
+)
+
+DEFAULT_STREAM_PRESETS = OGG_STREAM_PRESETS + HLS_STREAM_PRESETS
+
 
 class AudioSerializer(NoFileUpdatesSerializer):
     streams = NestedStreamSerializer(
@@ -120,24 +153,63 @@ class AudioSerializer(NoFileUpdatesSerializer):
         )
     )
 
+    liked_by_me = serializers.SerializerMethodField(
+        help_text="True if the current user likes the audio."
+    )
+
     class Meta:
         model = Audio
-        fields = ["id", "title", "url", "description", "listen_count", "uploaded_at", "is_public", "authors",
-                  "streams", "file"]
+        fields = ["id", "title", "url", "description", "listen_count", "like_count", "liked_by_me", "uploaded_at",
+                  "is_public", "duration", "channels", "loudness", "peak", "rms", "authors", "streams", "file"]
 
         extra_kwargs = {
             "url": {"view_name": "api:audio-detail", "lookup_field": "id"}
         }
 
+    def get_liked_by_me(self, audio) -> bool:
+        """
+        Read the `liked_by_me` annotation added by `AudioViewSet`, querying for the like when it is missing.
+        """
+        liked_by_me = getattr(audio, "liked_by_me", None)
+        if liked_by_me is not None:
+            return liked_by_me
+        user = getattr(self.context.get("request"), "user", None)
+        if user is None or not user.is_authenticated:
+            return False
+        return audio.like_set.filter(user=user).exists()
+
     def create(self, validated_data):
         """
-        Strips the "file" field, calls
+        Strips the "file" field, creates the Audio, stores the file as its source, then queues its default streams.
         """
         audio_file = self.pop_file(validated_data)
         audio = super().create(validated_data)
-        self.create_default_streams(audio, audio_file)
+        self.save_source(audio, audio_file)
+        self.create_default_streams(audio)
         return audio
 
+    def save_source(self, audio, audio_file):
+        """
+        Store the uploaded file as the Audio's source and probe its metadata.
+
+        If an identical file was uploaded before, its stored copy, metadata, and waveforms are reused instead of writing
+        and probing the file again.
+        :param audio:      The Audio instance.
+        :param audio_file: A file-like object containing the uploaded audio data.
+        """
+        audio.source_hash = get_sha256(audio_file)
+        duplicate = Audio.objects.filter(source_hash=audio.source_hash).exclude(id=audio.id).exclude(source="").first()
+        if duplicate is not None:
+            audio.source.name = duplicate.source.name
+            for field in (*Audio.METADATA_FIELDS.values(), *Audio.LOUDNESS_FIELDS):
+                setattr(audio, field, getattr(duplicate, field))
+        else:
+            audio.source.save(audio_file.name, audio_file, save=False)
+            audio.set_metadata(probe_file(audio.source.path), save=False)
+        audio.save()
+        if duplicate is not None:
+            reuse_waveforms(audio)
+
     def pop_file(self, data):
         """
         Pop the file field from the data if it is present.
@@ -150,21 +222,134 @@ class AudioSerializer(NoFileUpdatesSerializer):
             file = None
         return file
 
-    def create_default_streams(self, audio, audio_file, presets=DEFAULT_STREAM_PRESETS):
+    def create_default_streams(self, audio, presets=DEFAULT_STREAM_PRESETS):
         """
-        Create the default streams for the Audio.
-        :param audio:      The Audio instance to create
-        :param audio_file: A file-like object containing the uploaded audio data.
-        :param presets:    A list of dictionaries containing the 'format', 'sample_rate', and 'bit_rate' of the
-                           streams to create.  A stream will be created for each entry in the list using the settings
-                           provided by the entry.
+        Create the default streams for the Audio and queue them for transcoding.
+
+        The streams are left in the "pending" state, their files are rendered from the Audio's source by the
+        `transcode_worker` management command.  Renditions cached for an identical source are reused instead.  Presets
+        are first fitted to the source by `plan_renditions`, the presets it skips are recorded as SkippedRenditions.
+
+        With `TRANSCODE_LAZY_RENDITIONS` only the middle rendition of each format's ladder is queued, the others are
+        left "deferred" until they are first requested.
+        :param audio:   The Audio instance, its source file must already be saved.
+        :param presets: A list of dictionaries containing the 'format', 'sample_rate', and 'bit_rate' of the
+                        streams to create.  A stream will be created for each entry in the list using the settings
+                        provided by the entry.
         """
-        for preset in presets:
+        presets, skipped = plan_renditions(audio, presets)
+        SkippedRendition.objects.bulk_create(
+            SkippedRendition(audio=audio, format=preset["format"], sample_rate=preset["sample_rate"],
+                             bit_rate=preset["bit_rate"], reason=reason)
+            for preset, reason in skipped
+        )
+        eager_indices = set()
+        for audio_format in dict.fromkeys(preset["format"] for preset in presets):
+            indices = [index for index, preset in enumerate(presets) if preset["format"] == audio_format]
+            eager_indices.add(indices[len(indices) // 2])
+        for index, preset in enumerate(presets):
             stream = Stream(
                 audio=audio,
                 format=preset.get("format"),
                 sample_rate=preset.get("sample_rate"),
                 bit_rate=preset.get("bit_rate"),
-                file=audio_file
+                status=Stream.StreamStatus.PENDING
             )
+            rendition = find_cached_rendition(stream)
+            if rendition is not None:
+                stream.file.name = rendition.file.name
+                stream.copy_metadata(rendition)
+                stream.status = Stream.StreamStatus.READY
+                stream.rendered_at = timezone.now()
+            elif settings.TRANSCODE_LAZY_RENDITIONS and index not in eager_indices:
+                stream.status = Stream.StreamStatus.DEFERRED
             stream.save()
+            if stream.status == Stream.StreamStatus.PENDING:
+                enqueue_stream(stream)
+            elif rendition is not None:
+                stream.copy_segments(rendition)
+
+
+class LikeOperationSerializer(serializers.Serializer):
+    audio = serializers.CharField(
+        max_length=14,
+        help_text="The id of the audio."
+    )
+    liked = serializers.BooleanField(
+        help_text="True to like the audio, false to unlike it."
+    )
+
+
+class LikeBatchSerializer(serializers.Serializer):
+    operations = LikeOperationSerializer(
+        many=True,
+        help_text="The likes and unlikes to apply in order, only the last operation for each audio takes effect."
+    )
+
+    def validate_operations(self, operations):
+        if len(operations) > settings.LIKE_BATCH_MAX_SIZE:
+            raise serializers.ValidationError(f"At most {settings.LIKE_BATCH_MAX_SIZE} operations may be sent at "
+                                              f"once")
+        return operations
+
+
+class ListenSeriesQuerySerializer(serializers.Serializer):
+    since = serializers.DateTimeField(
+        required=False,
+        help_text="The start of the series, inclusive.  Default is a week before `until`."
+    )
+    until = serializers.DateTimeField(
+        required=False,
+        help_text="The end of the series, exclusive.  Default is now."
+    )
+    interval = serializers.ChoiceField(
+        choices=list(INTERVALS),
+        default="hour",
+        help_text="The length of each point of the series."
+    )
+
+    def validate(self, data):
+        data.setdefault("until", timezone.now())
+        data.setdefault("since", data["until"] - DEFAULT_RANGE)
+        if data["since"] >= data["until"]:
+            raise serializers.ValidationError("since must be before until")
+        return data
+
+
+class UploadSessionSerializer(serializers.ModelSerializer):
+    offset = serializers.IntegerField(
+        source="received",
+        read_only=True,
+        help_text="The number of bytes received so far, the next chunk must start at this offset."
+    )
+
+    audio = serializers.HyperlinkedRelatedField(
+        lookup_field="id",
+        read_only=True,
+        view_name="api:audio-detail"
+    )
+
+    class Meta:
+        model = UploadSession
+        fields = ["id", "url", "title", "description", "is_public", "filename", "size", "offset", "audio",
+                  "created_at"]
+
+        extra_kwargs = {
+            "url": {"view_name": "api:uploadsession-detail", "lookup_field": "id"}
+        }
+
+    def validate_size(self, size):
+        if size < 1:
+            raise serializers.ValidationError("The file must not be empty")
+        if size > settings.UPLOAD_SESSION_MAX_SIZE:
+            raise serializers.ValidationError(f"The file must not be larger than {settings.UPLOAD_SESSION_MAX_SIZE} "
+                                              f"bytes")
+        return size
+
+    def create(self, validated_data):
+        """
+        Creates the session and the empty file chunks will be written to.
+        """
+        session = super().create(validated_data)
+        session.file.save(session.filename, ContentFile(b""))
+        return session
@@ -15,13 +15,47 @@
 #  You should have received a copy of the GNU General Public License
 #  along with mac_backend_api.  If not, see <https://www.gnu.org/licenses/>.
 
+import re
+from io import BytesIO
+
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.db import transaction
+from django.db.models import BooleanField, Exists, OuterRef, Q, Value
+from django.http import FileResponse, HttpResponse
+from django.shortcuts import get_object_or_404
+from django.urls import reverse
+from django.utils.cache import patch_cache_control
+from rest_framework import status
+from rest_framework.decorators import action
+from rest_framework.exceptions import NotFound, PermissionDenied
+from rest_framework.filters import OrderingFilter
+from rest_framework.mixins import CreateModelMixin, DestroyModelMixin, RetrieveModelMixin
 from rest_framework.parsers import MultiPartParser, JSONParser, FormParser
-from rest_framework.permissions import IsAuthenticatedOrReadOnly, DjangoModelPermissionsOrAnonReadOnly
-from rest_framework.viewsets import ModelViewSet
+from rest_framework.permissions import IsAuthenticatedOrReadOnly, DjangoModelPermissionsOrAnonReadOnly, IsAuthenticated
+from rest_framework.permissions import IsAdminUser
+from rest_framework.response import Response
+from rest_framework.viewsets import ModelViewSet, GenericViewSet, ViewSet
+
+from mac_backend_api.audio.api.exceptions import StreamNotReady
+from mac_backend_api.audio.api.filters import AudioMetadataFilter
+from mac_backend_api.audio.api.negotiation import IgnoreClientContentNegotiation
+from mac_backend_api.audio.analytics import get_audio_listen_series, get_author_listen_series
+from mac_backend_api.audio.api.serializers import (AudioSerializer, LikeBatchSerializer, ListenSeriesQuerySerializer,
+                                                   StreamSerializer, UploadSessionSerializer)
+from mac_backend_api.audio.exceptions import UploadConflictException
+from mac_backend_api.audio.likes import apply_like_operations
+from mac_backend_api.audio.models import Audio, Like, Stream, UploadSession
+from mac_backend_api.audio.permission_checks import IsOwnerOrReadOnly, CanAddAudio
+from mac_backend_api.audio.playlists import PLAYLIST_CONTENT_TYPE, render_master_playlist, render_variant_playlist
+from mac_backend_api.audio.streaming import CONTENT_TYPES, is_playback_start, serve_file
+from mac_backend_api.audio.transcoding.encoder import SEGMENT_FORMATS
+from mac_backend_api.audio.transcoding.on_demand import wait_for_rendition
+from mac_backend_api.audio.transcoding.scheduler import get_backpressure_status, get_queue_metrics
+
+CONTENT_RANGE_PATTERN = re.compile(r"^bytes (?P<start>\d+)-(?P<end>\d+)/(?P<total>\d+)$")
 
-from mac_backend_api.audio.api.serializers import AudioSerializer, StreamSerializer
-from mac_backend_api.audio.models import Audio, Stream
-from mac_backend_api.audio.permission_checks import IsOwnerOrReadOnly
+User = get_user_model()
 
 
 class AudioViewSet(ModelViewSet):
@@ -30,11 +64,182 @@ class AudioViewSet(ModelViewSet):
     queryset = Audio.objects.all()
     parser_classes = (MultiPartParser, FormParser, JSONParser)
     permission_classes = (IsAuthenticatedOrReadOnly, IsOwnerOrReadOnly, DjangoModelPermissionsOrAnonReadOnly)
+    filter_backends = (AudioMetadataFilter, OrderingFilter)
+    ordering_fields = ("title", "uploaded_at", "listen_count", "like_count", "duration", "channels", "source_bit_rate",
+                       "source_sample_rate", "source_size")
+
+    def get_queryset(self):
+        """
+        Prefetch the audios' streams and authors, and annotate whether the current user likes each audio with an
+        EXISTS subquery, so a page of audios takes the same number of queries whatever its size.
+        """
+        queryset = super().get_queryset().prefetch_related("streams", "authors")
+        if self.request.user.is_authenticated:
+            return queryset.annotate(liked_by_me=Exists(Like.objects.filter(audio=OuterRef("pk"),
+                                                                            user=self.request.user)))
+        return queryset.annotate(liked_by_me=Value(False, output_field=BooleanField()))
 
     def filter_queryset(self, queryset):
         if self.action == "list":
             queryset = queryset.filter(is_public=True)
-        return queryset
+        return super().filter_queryset(queryset)
+
+    def create(self, request, *args, **kwargs):
+        """
+        Create an Audio, pushing back on clients while the transcode queue is backed up.
+
+        Above `TRANSCODE_QUEUE_HIGH_WATER_MARK` queued jobs the upload is accepted with a 202, its streams will be
+        rendered late.  At `TRANSCODE_QUEUE_MAX_DEPTH` the upload is refused with a 503 before its body is read.  Both
+        responses carry a Retry-After header.
+        """
+        backpressure = get_backpressure_status()
+        if backpressure == status.HTTP_503_SERVICE_UNAVAILABLE:
+            response = Response({"detail": "Too many uploads are waiting to be transcoded, try again later."},
+                                status=status.HTTP_503_SERVICE_UNAVAILABLE)
+            response["Retry-After"] = settings.TRANSCODE_RETRY_AFTER
+            return response
+        response = super().create(request, *args, **kwargs)
+        if backpressure == status.HTTP_202_ACCEPTED and response.status_code == status.HTTP_201_CREATED:
+            response.status_code = status.HTTP_202_ACCEPTED
+            response["Retry-After"] = settings.TRANSCODE_RETRY_AFTER
+        return response
+
+    @action(detail=True, methods=["post"], permission_classes=[IsAuthenticated])
+    def like(self, request, *args, **kwargs):
+        """
+        Like the audio as the current user.  Liking an audio which is already liked does nothing.
+        """
+        audio = self.get_object()
+        audio.add_like(request.user)
+        return self.make_like_response(audio, liked=True)
+
+    @action(detail=True, methods=["post"], permission_classes=[IsAuthenticated])
+    def unlike(self, request, *args, **kwargs):
+        """
+        Remove the current user's like from the audio.  Unliking an audio which is not liked does nothing.
+        """
+        audio = self.get_object()
+        audio.remove_like(request.user)
+        return self.make_like_response(audio, liked=False)
+
+    def make_like_response(self, audio, liked) -> Response:
+        """
+        Build the response of the like and unlike actions.
+        :param audio: The Audio which was liked or unliked.
+        :param liked: True if the current user now likes the audio.
+        :return:      A Response containing the user's like state and the audio's like count.
+        """
+        audio.refresh_from_db(fields=["like_count"])
+        return Response({"id": audio.id, "liked": liked, "like_count": audio.like_count})
+
+    @action(detail=False, methods=["post"], url_path="likes", permission_classes=[IsAuthenticated])
+    def like_batch(self, request, *args, **kwargs):
+        """
+        Apply many likes and unlikes for the current user in one transaction, for clients syncing offline likes.
+
+        Expects `{"operations": [{"audio": id, "liked": bool}, ...]}`.  Audios which do not exist are skipped and listed
+        in the response's "not_found".
+        """
+        serializer = LikeBatchSerializer(data=request.data)
+        serializer.is_valid(raise_exception=True)
+        operations = [(operation["audio"], operation["liked"]) for operation in serializer.validated_data["operations"]]
+        return Response(apply_like_operations(request.user, operations))
+
+    @action(detail=False, methods=["get"])
+    def trending(self, request, *args, **kwargs):
+        """
+        List the public audios with the highest trending scores, as last computed by `update_trending`.
+
+        `?limit=` returns fewer than `TRENDING_FEED_SIZE` audios.
+        """
+        try:
+            limit = int(request.query_params.get("limit", settings.TRENDING_FEED_SIZE))
+        except ValueError:
+            return Response({"limit": "Expected a value of type int."}, status=status.HTTP_400_BAD_REQUEST)
+        limit = max(1, min(limit, settings.TRENDING_FEED_SIZE))
+        audios = self.get_queryset().filter(is_public=True, trending_score__isnull=False)
+        audios = audios.order_by("-trending_score__score")[:limit]
+        return Response(self.get_serializer(audios, many=True).data)
+
+    @action(detail=True, methods=["get"], url_path="listens", permission_classes=[IsAuthenticated])
+    def listen_series(self, request, *args, **kwargs):
+        """
+        Report the audio's listens as a time series, read from its hourly rollups.  Only the audio's authors and staff
+        may view it.
+
+        `?since=` and `?until=` bound the series, the last week by default.  `?interval=` is "hour", "day", or "week".
+        """
+        audio = self.get_object()
+        if not request.user.is_staff and not audio.authors.filter(pk=request.user.pk).exists():
+            raise PermissionDenied("Only the audio's authors may view its listens.")
+        query = self.get_listen_series_query(request)
+        return Response(dict(query, series=get_audio_listen_series(audio, **query)))
+
+    @action(detail=False, methods=["get"], url_path="listens", permission_classes=[IsAuthenticated])
+    def author_listen_series(self, request, *args, **kwargs):
+        """
+        Report the combined listens of an author's audios as a time series, read from their hourly rollups.
+        `?author=` is the author's username, the current user by default.  Only the author and staff may view it.
+
+        Accepts the same parameters as the audio's listens.
+        """
+        username = request.query_params.get("author", request.user.username)
+        if username != request.user.username and not request.user.is_staff:
+            raise PermissionDenied("Only the author may view their listens.")
+        author = get_object_or_404(User, username=username)
+        query = self.get_listen_series_query(request)
+        return Response(dict(query, author=author.username, series=get_author_listen_series(author, **query)))
+
+    def get_listen_series_query(self, request) -> dict:
+        """
+        Validate the parameters of the listen series actions.
+        :param request: The request.
+        :return:        A dictionary containing the 'since', 'until', and 'interval' of the series.
+        """
+        serializer = ListenSeriesQuerySerializer(data=request.query_params)
+        serializer.is_valid(raise_exception=True)
+        return serializer.validated_data
+
+    @action(detail=True, methods=["get"], content_negotiation_class=IgnoreClientContentNegotiation)
+    def waveform(self, request, *args, **kwargs):
+        """
+        Serve the audio's precomputed waveform peaks in the audiowaveform "dat" format.
+
+        `?samples_per_pixel=` selects the finest stored resolution covering at least that many samples per pixel.
+        """
+        audio = self.get_object()
+        try:
+            samples_per_pixel = int(request.query_params.get("samples_per_pixel",
+                                                             settings.WAVEFORM_DEFAULT_SAMPLES_PER_PIXEL))
+        except ValueError:
+            return Response({"samples_per_pixel": "Expected a value of type int."}, status=status.HTTP_400_BAD_REQUEST)
+        waveforms = audio.waveforms.all()
+        waveform = waveforms.filter(samples_per_pixel__gte=samples_per_pixel).first() or waveforms.last()
+        if waveform is None:
+            raise NotFound("The waveform has not been computed yet.")
+        response = FileResponse(waveform.file.open("rb"), content_type="application/octet-stream")
+        patch_cache_control(response, public=True, max_age=settings.WAVEFORM_CACHE_MAX_AGE, immutable=True)
+        return response
+
+    @action(detail=True, methods=["get"], content_negotiation_class=IgnoreClientContentNegotiation)
+    def playlist(self, request, *args, **kwargs):
+        """
+        Serve an HLS master playlist with a variant for every segmented stream of the audio.  Only streams in one of the
+        `SEGMENT_FORMATS` HLS supports are listed.
+        """
+        audio = self.get_object()
+        playable = Q(status=Stream.StreamStatus.READY, segments__isnull=False)
+        if settings.TRANSCODE_SEGMENT_DURATION:
+            # Deferred streams are listed too, they are rendered when their variant playlist is first requested.
+            playable |= Q(status=Stream.StreamStatus.DEFERRED)
+        streams = audio.streams.filter(playable, format__in=SEGMENT_FORMATS).distinct()
+        streams = streams.order_by("-bit_rate")
+        if not streams:
+            raise NotFound("The audio has no segmented streams yet.")
+        playlist = render_master_playlist(streams, lambda stream: request.build_absolute_uri(
+            reverse("api:stream-playlist", kwargs={"id": stream.id})
+        ))
+        return HttpResponse(playlist, content_type=PLAYLIST_CONTENT_TYPE)
 
 
 class StreamViewSet(ModelViewSet):
@@ -42,3 +247,169 @@ class StreamViewSet(ModelViewSet):
     lookup_field = "id"
     queryset = Stream.objects.all()
     permission_classes = (IsAuthenticatedOrReadOnly, IsOwnerOrReadOnly, DjangoModelPermissionsOrAnonReadOnly)
+
+    def get_rendered_stream(self) -> Stream:
+        """
+        Get the requested stream, rendering it first if it is deferred or waiting for it if it is being rendered.
+        :return: The ready Stream.
+        """
+        stream = self.get_object()
+        if stream.status != Stream.StreamStatus.READY:
+            stream = wait_for_rendition(stream)
+        if stream.status == Stream.StreamStatus.FAILED:
+            raise NotFound("The stream could not be rendered.")
+        if stream.status != Stream.StreamStatus.READY:
+            raise StreamNotReady()
+        return stream
+
+    @action(detail=True, methods=["get"], content_negotiation_class=IgnoreClientContentNegotiation)
+    def media(self, request, *args, **kwargs):
+        """
+        Serve the stream's file with support for Range and conditional requests.
+
+        `?download=true` offers the file as an attachment, which is only allowed when the stream allows downloads or the
+        user is one of the audio's authors.  Other requests which start at the beginning of the file count as a listen.
+        """
+        stream = self.get_rendered_stream()
+        if not stream.file:
+            raise NotFound("The stream has no file.")
+        download = request.query_params.get("download", "").lower() in ("1", "true")
+        if download and not stream.allow_downloads and request.user not in stream.audio.authors.all():
+            raise PermissionDenied("Downloads are not allowed for this stream.")
+        if not download and is_playback_start(request):
+            stream.audio.add_listen()
+        return serve_file(request, stream.file, CONTENT_TYPES[stream.format], f"{stream.id}.{stream.format}",
+                          as_attachment=download)
+
+    @action(detail=True, methods=["get"], content_negotiation_class=IgnoreClientContentNegotiation)
+    def playlist(self, request, *args, **kwargs):
+        """
+        Serve an HLS media playlist of the stream's segments.
+        """
+        stream = self.get_rendered_stream()
+        segments = list(stream.segments.all())
+        if not segments:
+            raise NotFound("The stream has no segments.")
+        playlist = render_variant_playlist(segments, lambda segment: request.build_absolute_uri(
+            reverse("api:stream-segment", kwargs={"id": stream.id, "index": segment.index})
+        ))
+        return HttpResponse(playlist, content_type=PLAYLIST_CONTENT_TYPE)
+
+    @action(detail=True, methods=["get"], url_path=r"segments/(?P<index>[0-9]+)",
+            content_negotiation_class=IgnoreClientContentNegotiation)
+    def segment(self, request, index, *args, **kwargs):
+        """
+        Serve one of the stream's segments, through the same permission checks and offloading as `media`.  Requesting
+        the first segment from its start counts as a listen.
+        """
+        stream = self.get_rendered_stream()
+        segment = get_object_or_404(stream.segments.all(), index=index)
+        if segment.index == 0 and is_playback_start(request):
+            stream.audio.add_listen()
+        return serve_file(request, segment.file, CONTENT_TYPES[stream.format],
+                          f"{stream.id}-{segment.index}.{stream.format}")
+
+
+class UploadSessionViewSet(CreateModelMixin, RetrieveModelMixin, DestroyModelMixin, GenericViewSet):
+    """
+    Resumable uploads for large audio files.
+
+    Create a session, PUT the file in byte ranges with a `Content-Range` header, then POST to `finalize` to create the
+    Audio.  Retrieving a session returns the offset an interrupted upload should resume from.
+    """
+    serializer_class = UploadSessionSerializer
+    lookup_field = "id"
+    queryset = UploadSession.objects.all()
+    parser_classes = (JSONParser, FormParser)
+    permission_classes = (IsAuthenticated, CanAddAudio)
+
+    def get_queryset(self):
+        return super().get_queryset().filter(user=self.request.user)
+
+    def perform_create(self, serializer):
+        serializer.save(user=self.request.user)
+
+    def perform_destroy(self, instance):
+        instance.file.delete(save=False)
+        instance.delete()
+
+    def update(self, request, *args, **kwargs):
+        """
+        Write a byte range of the file.  The body is streamed to disk and never read into memory as a whole, bytes
+        past the end of the declared range are ignored.  A chunk racing another chunk of the same upload gets a 409.
+        """
+        match = CONTENT_RANGE_PATTERN.match(request.META.get("HTTP_CONTENT_RANGE", ""))
+        if match is None:
+            return Response({"detail": "A 'Content-Range: bytes <start>-<end>/<total>' header is required."},
+                            status=status.HTTP_400_BAD_REQUEST)
+        start, end, total = (int(match.group(name)) for name in ("start", "end", "total"))
+        session = self.get_object()
+        if session.audio_id is not None or total != session.size or end < start or end >= session.size:
+            return Response({"detail": "The range does not fit the file.", "offset": session.received},
+                            status=status.HTTP_416_REQUESTED_RANGE_NOT_SATISFIABLE)
+        if start > session.received:
+            return Response({"detail": "The range starts after the received data.", "offset": session.received},
+                            status=status.HTTP_409_CONFLICT)
+        try:
+            session.write_chunk(request.stream if request.stream is not None else BytesIO(), start, end - start + 1)
+        except UploadConflictException:
+            session.refresh_from_db(fields=["received"])
+            return Response({"detail": "Another chunk of the upload was written concurrently.",
+                             "offset": session.received}, status=status.HTTP_409_CONFLICT)
+        return Response(self.get_serializer(session).data)
+
+    @action(detail=True, methods=["post"])
+    def finalize(self, request, *args, **kwargs):
+        """
+        Create the Audio, authored by the uploader, and queue its streams once the whole file has been received.
+        Finalizing again returns the same Audio.
+
+        The session is locked while it is finalized, so concurrent requests create a single Audio.  When the file
+        duplicates an existing source it is not moved into place, the partial file is deleted instead.  Creating the
+        Audio is subject to the same backpressure as `AudioViewSet.create`, the received file is kept when it is
+        refused so finalizing can be retried.
+        """
+        backpressure = None
+        with transaction.atomic():
+            session = self.get_object()
+            session = UploadSession.objects.select_for_update().get(id=session.id)
+            if session.audio is None:
+                if not session.is_complete:
+                    return Response({"detail": "The upload is incomplete.", "offset": session.received},
+                                    status=status.HTTP_409_CONFLICT)
+                backpressure = get_backpressure_status()
+                if backpressure == status.HTTP_503_SERVICE_UNAVAILABLE:
+                    response = Response({"detail": "Too many uploads are waiting to be transcoded, try again later."},
+                                        status=status.HTTP_503_SERVICE_UNAVAILABLE)
+                    response["Retry-After"] = settings.TRANSCODE_RETRY_AFTER
+                    return response
+                with session.as_upload() as upload:
+                    serializer = AudioSerializer(context=self.get_serializer_context(), data={
+                        "title": session.title,
+                        "description": session.description,
+                        "is_public": session.is_public,
+                        "file": upload
+                    })
+                    serializer.is_valid(raise_exception=True)
+                    session.audio = serializer.save()
+                session.audio.authors.add(session.user)
+                if session.file.storage.exists(session.file.name):
+                    session.file.delete(save=False)
+                session.file.name = ""
+                session.save(update_fields=["audio", "file", "updated_at"])
+        serializer = AudioSerializer(session.audio, context=self.get_serializer_context())
+        if backpressure == status.HTTP_202_ACCEPTED:
+            response = Response(serializer.data, status=status.HTTP_202_ACCEPTED)
+            response["Retry-After"] = settings.TRANSCODE_RETRY_AFTER
+            return response
+        return Response(serializer.data, status=status.HTTP_201_CREATED)
+
+
+class TranscodeQueueViewSet(ViewSet):
+    permission_classes = (IsAdminUser,)
+
+    def list(self, request, *args, **kwargs):
+        """
+        Report the depth of the transcode queue.
+        """
+        return Response(get_queue_metrics())
@@ -0,0 +1,190 @@
+#  Copyright (C) 2020  Mind Audio Central
+#
+#  This file is part of mac_backend_api.
+#
+#  mac_backend_api is free software: you can redistribute it and/or modify
+#  it under the terms of the GNU General Public License as published by
+#  the Free Software Foundation, either version 3 of the License, or
+#  (at your option) any later version.
+#
+#  mac_backend_api is distributed in the hope that it will be useful,
+#  but WITHOUT ANY WARRANTY; without even the implied warranty of
+#  MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+#  GNU General Public License for more details.
+#
+#  You should have received a copy of the GNU General Public License
+#  along with mac_backend_api.  If not, see <https://www.gnu.org/licenses/>.
+
+import math
+import os
+import platform
+import sys
+import time
+from contextlib import contextmanager
+from functools import wraps
+from io import BytesIO
+
+import django
+from django.core.files.uploadedfile import SimpleUploadedFile
+from pydub.generators import Sine
+
+from mac_backend_api.audio.api import serializers
+from mac_backend_api.audio.api.serializers import AudioSerializer
+from mac_backend_api.audio.models import TranscodeJob
+from mac_backend_api.audio.transcoding import queue
+
+try:
+    import resource
+except ImportError:
+    # Peak memory is not reported where the resource module is unavailable (Windows).
+    resource = None
+
+# The functions timed as ingest stages, as (stage, owner, attribute name) tuples.
+STAGES = (
+    ("hash", serializers, "get_sha256"),
+    ("probe", serializers, "probe_file"),
+    ("plan", serializers, "plan_renditions"),
+    ("streams", AudioSerializer, "create_default_streams"),
+    ("transcode", queue, "run_jobs"),
+)
+
+CONTENT_TYPES = {
+    "wav": "audio/wav",
+    "mp3": "audio/mpeg",
+}
+
+
+def make_source(audio_format, duration, frequency) -> SimpleUploadedFile:
+    """
+    Generate a synthetic sine wave upload.
+    :param audio_format: The format to encode the source in, "wav" or "mp3".  MP3 requires ffmpeg.
+    :param duration:     The length of the source in seconds.
+    :param frequency:    The tone's frequency, vary it so every source has a different hash.
+    :return:             The uploaded file.
+    """
+    buffer = BytesIO()
+    Sine(frequency, sample_rate=44100).to_audio_segment(duration=duration * 1000).export(buffer, format=audio_format)
+    return SimpleUploadedFile(f"source.{audio_format}", buffer.getvalue(), content_type=CONTENT_TYPES[audio_format])
+
+
+class StageTimer:
+    """
+    Accumulates the time spent in each ingest stage while `timing` is active, by wrapping the stage functions.
+    """
+
+    def __init__(self):
+        self.totals = dict()
+
+    @contextmanager
+    def timing(self):
+        """
+        Wrap every stage function for the duration of the block.
+        """
+        originals = list()
+        for stage, owner, name in STAGES:
+            original = getattr(owner, name)
+            originals.append((owner, name, original))
+            setattr(owner, name, self.wrap(stage, original))
+        try:
+            yield self
+        finally:
+            for owner, name, original in originals:
+                setattr(owner, name, original)
+
+    def wrap(self, stage, function):
+        @wraps(function)
+        def timed(*args, **kwargs):
+            start = time.perf_counter()
+            try:
+                return function(*args, **kwargs)
+            finally:
+                self.totals[stage] = self.totals.get(stage, 0.0) + time.perf_counter() - start
+        return timed
+
+    def reset(self) -> dict:
+        """
+        Return the accumulated totals and start counting from zero.
+        :return: A dictionary mapping stage names to seconds.
+        """
+        totals, self.totals = self.totals, dict()
+        return totals
+
+
+def percentile(values, percent) -> float:
+    """
+    Get a nearest-rank percentile.
+    :param values:  The measured values.
+    :param percent: The percentile, from 0 to 100.
+    :return:        The value, or None if there are no values.
+    """
+    if not values:
+        return None
+    ordered = sorted(values)
+    return ordered[max(math.ceil(percent / 100 * len(ordered)) - 1, 0)]
+
+
+def get_peak_rss() -> int:
+    """
+    Get the peak resident set size of this process and its finished children, such as ffmpeg.
+    :return: The peak RSS in bytes, or None if it cannot be measured.
+    """
+    if resource is None:
+        return None
+    peak = max(resource.getrusage(resource.RUSAGE_SELF).ru_maxrss,
+               resource.getrusage(resource.RUSAGE_CHILDREN).ru_maxrss)
+    # ru_maxrss is in bytes on macOS and in kilobytes elsewhere.
+    return peak if sys.platform == "darwin" else peak * 1024
+
+
+def run_case(audio_format, duration, count, transcode=False) -> dict:
+    """
+    Upload `count` synthetic sources through `AudioSerializer.create` and measure it.
+    :param audio_format: The format of the sources.
+    :param duration:     The length of each source in seconds.
+    :param count:        The number of uploads.
+    :param transcode:    Also render each upload's queued streams after it.  Default is False.
+    :return:             A dictionary of the case's parameters and results.
+    """
+    timer = StageTimer()
+    latencies = list()
+    sources = [make_source(audio_format, duration, 220 + index) for index in range(count)]
+    with timer.timing():
+        for source in sources:
+            start = time.perf_counter()
+            serializer = AudioSerializer(data={"title": "benchmark", "file": source})
+            serializer.is_valid(raise_exception=True)
+            audio = serializer.save()
+            if transcode:
+                # Only the upload's own jobs, other queued jobs are left to the transcode worker.
+                queue.run_jobs(queue.start_jobs(TranscodeJob.objects.filter(stream__audio=audio)))
+            latencies.append(time.perf_counter() - start)
+    total = sum(latencies)
+    stages = timer.reset()
+    return {
+        "format": audio_format,
+        "duration": duration,
+        "count": count,
+        "transcode": transcode,
+        "uploads_per_second": count / total if total else None,
+        "latency": {
+            "mean": total / count,
+            "p50": percentile(latencies, 50),
+            "p99": percentile(latencies, 99),
+            "max": max(latencies),
+        },
+        "stages": {stage: {"total": seconds, "mean": seconds / count} for stage, seconds in stages.items()},
+    }
+
+
+def get_environment() -> dict:
+    """
+    Describe the machine and software the benchmark ran on, so results from different runs can be compared.
+    :return: A dictionary of environment details.
+    """
+    return {
+        "python": platform.python_version(),
+        "django": django.get_version(),
+        "platform": platform.platform(),
+        "machine": platform.machine(),
+        "cpu_count": os.cpu_count(),
+    }
@@ -20,3 +20,10 @@ class UserAlreadyLikesException(Exception):
 
     def __init__(self):
         super(Exception, self).__init__("User already likes the audio")
+
+
+class UploadConflictException(Exception):
+    """Raised when a chunk cannot be written because another chunk of the same upload is being written or was written"""
+
+    def __init__(self):
+        super(Exception, self).__init__("Another chunk of the upload was written concurrently")
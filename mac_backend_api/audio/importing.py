@@ -0,0 +1,156 @@
+#  Copyright (C) 2020  Mind Audio Central
+#
+#  This file is part of mac_backend_api.
+#
+#  mac_backend_api is free software: you can redistribute it and/or modify
+#  it under the terms of the GNU General Public License as published by
+#  the Free Software Foundation, either version 3 of the License, or
+#  (at your option) any later version.
+#
+#  mac_backend_api is distributed in the hope that it will be useful,
+#  but WITHOUT ANY WARRANTY; without even the implied warranty of
+#  MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+#  GNU General Public License for more details.
+#
+#  You should have received a copy of the GNU General Public License
+#  along with mac_backend_api.  If not, see <https://www.gnu.org/licenses/>.
+import hashlib
+import os
+
+from django.conf import settings
+from django.core.files import File
+from django.db import transaction
+from django.utils import timezone
+
+from mac_backend_api.audio.api.serializers import DEFAULT_STREAM_PRESETS
+from mac_backend_api.audio.hashing import get_sha256
+from mac_backend_api.audio.models import (Audio, ImportedFile, SkippedRendition, Stream, TranscodeJob,
+                                          get_audio_source_upload_path)
+from mac_backend_api.audio.presets import plan_renditions
+from mac_backend_api.audio.probe import probe_file
+from mac_backend_api.audio.transcoding.cache import QUERY_BATCH_SIZE, find_cached_rendition
+
+
+def find_audio_files(directory):
+    """
+    Walk a directory for files in a supported audio format, in a stable order so an import resumes where it stopped.
+    :param directory: The directory to walk.
+    :return:          A generator of absolute file paths.
+    """
+    for root, directories, files in os.walk(os.path.abspath(directory)):
+        directories.sort()
+        for name in sorted(files):
+            if Stream.is_valid_extension(os.path.splitext(name)[1][1:]):
+                yield os.path.join(root, name)
+
+
+def get_path_hash(path) -> str:
+    """
+    Get the SHA-256 hex digest of a path, used to look up ImportedFile records.
+    :param path: The absolute path.
+    :return:     The hex digest.
+    """
+    return hashlib.sha256(path.encode("utf-8", "surrogateescape")).hexdigest()
+
+
+def filter_imported(paths) -> list:
+    """
+    Remove the paths which already have an ImportedFile record.
+    :param paths: A list of absolute paths.
+    :return:      The paths which have not been imported, in their original order.
+    """
+    hashes = {get_path_hash(path): path for path in paths}
+    imported = set()
+    keys = list(hashes)
+    for start in range(0, len(keys), QUERY_BATCH_SIZE):
+        batch = keys[start:start + QUERY_BATCH_SIZE]
+        imported.update(ImportedFile.objects.filter(path_hash__in=batch).values_list("path_hash", flat=True))
+    return [path for path_hash, path in hashes.items() if path_hash not in imported]
+
+
+def prepare_file(path) -> dict:
+    """
+    Hash, probe, and store a file as an Audio source.  This does not use the database, so it can run in a process pool.
+
+    Sources are stored by their content, a file identical to one stored before is not written again.
+    :param path: The absolute path of the file.
+    :return:     A dictionary containing the 'path', and either the stored 'source' name, its 'source_hash', and its
+                 'metadata' as returned by `probe_file`, or the 'error' raised while preparing it.
+    """
+    try:
+        metadata = probe_file(path)
+        with open(path, "rb") as source:
+            file = File(source, name=os.path.basename(path))
+            source_hash = get_sha256(file)
+            storage = Audio.source.field.storage
+            name = get_audio_source_upload_path(Audio(source_hash=source_hash), path)
+            if not storage.exists(name):
+                name = storage.save(name, file)
+    except Exception as error:
+        return {"path": path, "error": str(error)}
+    return {"path": path, "source": name, "source_hash": source_hash, "metadata": metadata}
+
+
+@transaction.atomic
+def import_batch(prepared, authors=(), is_public=False, presets=DEFAULT_STREAM_PRESETS) -> list:
+    """
+    Create the Audio, authors, Streams, and bulk TranscodeJobs of a batch of prepared files in a single transaction,
+    along with the ImportedFile records which checkpoint them.
+
+    Streams are planned as for an upload: presets are fitted to each source, cached renditions are reused, and with
+    `TRANSCODE_LAZY_RENDITIONS` only the middle rendition is queued.
+    :param prepared:  A list of dictionaries returned by `prepare_file`, without errors.
+    :param authors:   The Users to add as the authors of every Audio.
+    :param is_public: The `is_public` value of every Audio.  Default is False.
+    :param presets:   The stream presets to plan, as for `AudioSerializer.create_default_streams`.
+    :return:          The queued TranscodeJob instances.
+    """
+    audios = list()
+    for result in prepared:
+        audio = Audio(
+            title=os.path.splitext(os.path.basename(result["path"]))[0][:100],
+            is_public=is_public,
+            source=result["source"],
+            source_hash=result["source_hash"]
+        )
+        audio.set_metadata(result["metadata"], save=False)
+        audios.append(audio)
+    Audio.objects.bulk_create(audios)
+    Audio.authors.through.objects.bulk_create(
+        Audio.authors.through(audio_id=audio.id, user_id=author.pk) for audio in audios for author in authors
+    )
+    skipped_renditions, streams, cached = list(), list(), list()
+    for audio in audios:
+        planned, skipped = plan_renditions(audio, presets)
+        skipped_renditions.extend(
+            SkippedRendition(audio=audio, format=preset["format"], sample_rate=preset["sample_rate"],
+                             bit_rate=preset["bit_rate"], reason=reason)
+            for preset, reason in skipped
+        )
+        eager_index = len(planned) // 2
+        for index, preset in enumerate(planned):
+            stream = Stream(audio=audio, format=preset["format"], sample_rate=preset["sample_rate"],
+                            bit_rate=preset["bit_rate"], status=Stream.StreamStatus.PENDING)
+            rendition = find_cached_rendition(stream)
+            if rendition is not None:
+                stream.file.name = rendition.file.name
+                stream.copy_metadata(rendition)
+                stream.status = Stream.StreamStatus.READY
+                stream.rendered_at = timezone.now()
+                cached.append((stream, rendition))
+            elif settings.TRANSCODE_LAZY_RENDITIONS and index != eager_index:
+                stream.status = Stream.StreamStatus.DEFERRED
+            streams.append(stream)
+    SkippedRendition.objects.bulk_create(skipped_renditions)
+    Stream.objects.bulk_create(streams)
+    for stream, rendition in cached:
+        stream.copy_segments(rendition)
+    jobs = TranscodeJob.objects.bulk_create(
+        TranscodeJob(stream=stream, priority=TranscodeJob.JobPriority.BULK)
+        for stream in streams if stream.status == Stream.StreamStatus.PENDING
+    )
+    ImportedFile.objects.bulk_create(
+        ImportedFile(path=result["path"], path_hash=get_path_hash(result["path"]), audio=audio)
+        for result, audio in zip(prepared, audios)
+    )
+    return jobs
@@ -0,0 +1,88 @@
+#  Copyright (C) 2020  Mind Audio Central
+#
+#  This file is part of mac_backend_api.
+#
+#  mac_backend_api is free software: you can redistribute it and/or modify
+#  it under the terms of the GNU General Public License as published by
+#  the Free Software Foundation, either version 3 of the License, or
+#  (at your option) any later version.
+#
+#  mac_backend_api is distributed in the hope that it will be useful,
+#  but WITHOUT ANY WARRANTY; without even the implied warranty of
+#  MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+#  GNU General Public License for more details.
+#
+#  You should have received a copy of the GNU General Public License
+#  along with mac_backend_api.  If not, see <https://www.gnu.org/licenses/>.
+from django.db import transaction
+from django.db.models import Count, F, OuterRef, Subquery
+from django.db.models.functions import Coalesce
+
+from mac_backend_api.audio.models import Audio, Like
+
+RECONCILE_BATCH_SIZE = 500
+
+
+def count_likes():
+    """
+    Build a subquery counting the likes of the Audio in the outer query.
+    :return: An expression which is the number of likes, 0 when there are none.
+    """
+    counts = Like.objects.filter(audio=OuterRef("pk")).order_by().values("audio").annotate(count=Count("pk"))
+    return Coalesce(Subquery(counts.values("count")), 0)
+
+
+def reconcile_like_counts(batch_size=RECONCILE_BATCH_SIZE) -> int:
+    """
+    Recompute the `like_count` of every Audio from its Like objects, correcting counts which drifted, for example when
+    likes were deleted in bulk.
+
+    Audios are checked in batches paged through by id, each drifted batch is corrected with a single UPDATE.
+    :param batch_size: The number of audios checked by each query.  Default is `RECONCILE_BATCH_SIZE`.
+    :return:           The number of audios whose count was corrected.
+    """
+    corrected = 0
+    after = ""
+    while True:
+        ids = list(Audio.objects.filter(id__gt=after).order_by("id").values_list("id", flat=True)[:batch_size])
+        if not ids:
+            return corrected
+        drifted = list(
+            Audio.objects.filter(id__in=ids).annotate(actual=count_likes()).exclude(like_count=F("actual"))
+            .values_list("id", flat=True)
+        )
+        if drifted:
+            corrected += Audio.objects.filter(id__in=drifted).update(like_count=count_likes())
+        after = ids[-1]
+
+
+@transaction.atomic
+def apply_like_operations(user, operations) -> dict:
+    """
+    Like and unlike many audios for a user in one transaction, with a bulk insert and a bulk delete.
+
+    Operations are applied in order, so only the last operation for each audio takes effect.  Liking a liked audio
+    or unliking an audio which is not liked does nothing, as with `Audio.add_like` and `Audio.remove_like`.
+    :param user:       The user liking and unliking.
+    :param operations: A list of (audio_id, liked) tuples, liked is True to like the audio and False to unlike it.
+    :return:           A dictionary with the ids of the audios which are now 'liked' and 'unliked', and those which
+                       were 'not_found'.
+    """
+    requested = dict(operations)
+    found = set(Audio.objects.filter(id__in=list(requested)).values_list("id", flat=True))
+    liked = set(
+        Like.objects.select_for_update().filter(user=user, audio_id__in=found).values_list("audio_id", flat=True)
+    )
+    likes = [Like(user=user, audio_id=audio_id) for audio_id in found - liked if requested[audio_id]]
+    # Likes inserted concurrently are skipped, only the rows inserted here are counted.
+    Like.objects.bulk_create(likes, ignore_conflicts=True)
+    inserted = Like.objects.filter(id__in=[like.id for like in likes]).values_list("audio_id", flat=True)
+    Audio.objects.filter(id__in=list(inserted)).update(like_count=F("like_count") + 1)
+    unliked = [audio_id for audio_id in liked if not requested[audio_id]]
+    Like.objects.filter(user=user, audio_id__in=unliked).delete()
+    Audio.objects.filter(id__in=unliked).update(like_count=F("like_count") - 1)
+    return {
+        "liked": sorted(audio_id for audio_id in found if requested[audio_id]),
+        "unliked": sorted(audio_id for audio_id in found if not requested[audio_id]),
+        "not_found": sorted(set(requested) - found)
+    }
@@ -0,0 +1,152 @@
+#  Copyright (C) 2020  Mind Audio Central
+#
+#  This file is part of mac_backend_api.
+#
+#  mac_backend_api is free software: you can redistribute it and/or modify
+#  it under the terms of the GNU General Public License as published by
+#  the Free Software Foundation, either version 3 of the License, or
+#  (at your option) any later version.
+#
+#  mac_backend_api is distributed in the hope that it will be useful,
+#  but WITHOUT ANY WARRANTY; without even the implied warranty of
+#  MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+#  GNU General Public License for more details.
+#
+#  You should have received a copy of the GNU General Public License
+#  along with mac_backend_api.  If not, see <https://www.gnu.org/licenses/>.
+import atexit
+import logging
+import threading
+from collections import Counter
+
+from django.conf import settings
+from django.db import connections, transaction
+from django.db.models import F
+from django.utils import timezone
+
+from mac_backend_api.audio.models import Audio, ListenRollup
+from mac_backend_api.audio.transcoding.cache import QUERY_BATCH_SIZE
+
+logger = logging.getLogger(__name__)
+
+
+class ListenBuffer:
+    """
+    Counts listens in memory and writes them to the database in batches.
+
+    Listens are coalesced per audio and hour, and every flush applies one `F("listen_count") + n` UPDATE for each
+    distinct increment instead of one UPDATE per play, then adds them to the hourly ListenRollups the same way.  The
+    first listen after a flush schedules the next one, so no listen waits longer than `LISTEN_FLUSH_INTERVAL` seconds.
+    Pending listens are flushed when the process exits cleanly.
+    """
+
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.counts = Counter()
+        self.timer = None
+
+    def add(self, audio_id, count=1) -> None:
+        """
+        Buffer listens of an audio.  With a `LISTEN_FLUSH_INTERVAL` of 0 they are written immediately.
+        :param audio_id: The id of the Audio.
+        :param count:    The number of listens.  Default is 1.
+        """
+        hour = timezone.now().replace(minute=0, second=0, microsecond=0)
+        with self.lock:
+            self.counts[audio_id, hour] += count
+            interval = settings.LISTEN_FLUSH_INTERVAL
+            if interval and self.timer is None:
+                self.timer = threading.Timer(interval, self.flush_and_close)
+                self.timer.daemon = True
+                self.timer.start()
+        if not interval:
+            self.flush()
+
+    def flush(self) -> int:
+        """
+        Write every buffered listen to the database.  Listens which could not be written are buffered again.
+        :return: The number of listens written.
+        """
+        with self.lock:
+            if self.timer is not None:
+                self.timer.cancel()
+                self.timer = None
+            counts, self.counts = self.counts, Counter()
+        if not counts:
+            return 0
+        try:
+            apply_listens(counts)
+        except Exception:
+            with self.lock:
+                self.counts.update(counts)
+            raise
+        return sum(counts.values())
+
+    def flush_and_close(self) -> None:
+        """
+        Flush from the timer's thread or at exit, logging failures and closing the thread's database connections.
+        """
+        try:
+            self.flush()
+        except Exception:
+            logger.exception("Could not write buffered listens, they will be retried with the next flush")
+        finally:
+            connections.close_all()
+
+
+@transaction.atomic
+def apply_listens(counts) -> None:
+    """
+    Add listens to the `listen_count` of their audios and to their hourly ListenRollups.
+
+    Both are updated with one UPDATE for each distinct increment.  Rollups which do not exist yet are first inserted
+    empty with a single bulk insert which ignores those that do, so together the statements are a batched upsert.
+    :param counts: A dictionary mapping (Audio id, hour) tuples to the number of listens to add.
+    """
+    totals = Counter()
+    for (audio_id, hour), count in counts.items():
+        totals[audio_id] += count
+    for count, audio_ids in group_by_increment(totals).items():
+        for batch in in_batches(audio_ids):
+            Audio.objects.filter(id__in=batch).update(listen_count=F("listen_count") + count)
+    # Audios deleted since they were played are skipped, their rollups could not be inserted.
+    existing = set()
+    for batch in in_batches(list(totals)):
+        existing.update(Audio.objects.filter(id__in=batch).values_list("id", flat=True))
+    counts = {key: count for key, count in counts.items() if key[0] in existing}
+    ListenRollup.objects.bulk_create(
+        [ListenRollup(audio_id=audio_id, hour=hour) for audio_id, hour in counts], ignore_conflicts=True
+    )
+    by_hour = dict()
+    for count, keys in group_by_increment(counts).items():
+        for audio_id, hour in keys:
+            by_hour.setdefault((hour, count), list()).append(audio_id)
+    for (hour, count), audio_ids in by_hour.items():
+        for batch in in_batches(audio_ids):
+            ListenRollup.objects.filter(hour=hour, audio_id__in=batch).update(count=F("count") + count)
+
+
+def group_by_increment(counts) -> dict:
+    """
+    Group the keys of a dictionary of counts by their count.
+    :param counts: A dictionary mapping keys to counts.
+    :return:       A dictionary mapping counts to lists of keys.
+    """
+    groups = dict()
+    for key, count in counts.items():
+        groups.setdefault(count, list()).append(key)
+    return groups
+
+
+def in_batches(values):
+    """
+    Split a list into batches small enough to be used in an `__in` lookup.
+    :param values: The list to split.
+    :return:       A generator of lists of at most `QUERY_BATCH_SIZE` values.
+    """
+    for start in range(0, len(values), QUERY_BATCH_SIZE):
+        yield values[start:start + QUERY_BATCH_SIZE]
+
+
+listen_buffer = ListenBuffer()
+atexit.register(listen_buffer.flush_and_close)
@@ -0,0 +1,89 @@
+#  Copyright (C) 2020  Mind Audio Central
+#
+#  This file is part of mac_backend_api.
+#
+#  mac_backend_api is free software: you can redistribute it and/or modify
+#  it under the terms of the GNU General Public License as published by
+#  the Free Software Foundation, either version 3 of the License, or
+#  (at your option) any later version.
+#
+#  mac_backend_api is distributed in the hope that it will be useful,
+#  but WITHOUT ANY WARRANTY; without even the implied warranty of
+#  MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+#  GNU General Public License for more details.
+#
+#  You should have received a copy of the GNU General Public License
+#  along with mac_backend_api.  If not, see <https://www.gnu.org/licenses/>.
+
+import json
+import shutil
+import tempfile
+
+from django.core.management.base import BaseCommand, CommandError
+from django.db import transaction
+from django.test.utils import override_settings
+from django.utils import timezone
+
+from mac_backend_api.audio.benchmarks import get_environment, get_peak_rss, run_case
+
+
+class Command(BaseCommand):
+    help = ("Measure ingest throughput by uploading synthetic sources through the AudioSerializer.  Nothing is kept, "
+            "the uploads are rolled back and their files are written to a temporary directory.")
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--formats",
+            nargs="+",
+            default=["wav", "mp3"],
+            choices=["wav", "mp3"],
+            help="The formats of the synthetic sources, mp3 requires ffmpeg."
+        )
+        parser.add_argument(
+            "--durations",
+            nargs="+",
+            type=float,
+            default=[5, 60, 300],
+            help="The lengths of the synthetic sources in seconds."
+        )
+        parser.add_argument(
+            "--count",
+            type=int,
+            default=20,
+            help="The number of uploads for each format and duration."
+        )
+        parser.add_argument(
+            "--transcode",
+            action="store_true",
+            help="Also render each upload's streams in-process, which requires ffmpeg."
+        )
+        parser.add_argument(
+            "--output",
+            default="benchmark-ingest.json",
+            help="The file the JSON results are written to."
+        )
+
+    def handle(self, *args, **options):
+        if options["count"] < 1:
+            raise CommandError("--count must be at least 1")
+        if ("mp3" in options["formats"] or options["transcode"]) and not shutil.which("ffmpeg"):
+            raise CommandError("MP3 sources and --transcode require ffmpeg, use --formats wav without it")
+        results = {
+            "started_at": timezone.now().isoformat(),
+            "environment": get_environment(),
+            "cases": list(),
+        }
+        with tempfile.TemporaryDirectory() as media_root, override_settings(MEDIA_ROOT=media_root):
+            for audio_format in options["formats"]:
+                for duration in options["durations"]:
+                    with transaction.atomic():
+                        case = run_case(audio_format, duration, options["count"], options["transcode"])
+                        transaction.set_rollback(True)
+                    results["cases"].append(case)
+                    self.stdout.write(f"{audio_format} {duration:g}s: {case['uploads_per_second']:.2f} uploads/s, "
+                                      f"p50 {case['latency']['p50'] * 1000:.1f} ms, "
+                                      f"p99 {case['latency']['p99'] * 1000:.1f} ms")
+        results["peak_rss"] = get_peak_rss()
+        with open(options["output"], "w") as output:
+            json.dump(results, output, indent=2)
+        self.stdout.write(f"Wrote the results to {options['output']}")
@@ -0,0 +1,109 @@
+#  Copyright (C) 2020  Mind Audio Central
+#
+#  This file is part of mac_backend_api.
+#
+#  mac_backend_api is free software: you can redistribute it and/or modify
+#  it under the terms of the GNU General Public License as published by
+#  the Free Software Foundation, either version 3 of the License, or
+#  (at your option) any later version.
+#
+#  mac_backend_api is distributed in the hope that it will be useful,
+#  but WITHOUT ANY WARRANTY; without even the implied warranty of
+#  MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+#  GNU General Public License for more details.
+#
+#  You should have received a copy of the GNU General Public License
+#  along with mac_backend_api.  If not, see <https://www.gnu.org/licenses/>.
+from concurrent.futures import ProcessPoolExecutor
+
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connections
+
+from mac_backend_api.audio.importing import filter_imported, find_audio_files, import_batch, prepare_file
+from mac_backend_api.audio.models import TranscodeJob
+from mac_backend_api.audio.transcoding.cache import QUERY_BATCH_SIZE, evict_renditions
+from mac_backend_api.audio.transcoding.queue import run_jobs, start_jobs
+from mac_backend_api.audio.transcoding.scheduler import get_process_limit
+
+User = get_user_model()
+
+
+class Command(BaseCommand):
+    help = ("Import every audio file in a directory.  Files are hashed, probed, and stored by a pool of processes, "
+            "then inserted in batches.  Imported files are recorded, so running the command again resumes an "
+            "interrupted import.")
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "directory",
+            help="The directory to import, it is walked recursively."
+        )
+        parser.add_argument(
+            "--author",
+            action="append",
+            default=[],
+            help="The username of an author to add to every imported audio, may be given more than once."
+        )
+        parser.add_argument(
+            "--public",
+            action="store_true",
+            help="Show the imported audios on public indexes."
+        )
+        parser.add_argument(
+            "--processes",
+            type=int,
+            default=settings.TRANSCODE_WORKER_PROCESSES,
+            help="The number of processes to prepare and transcode files with."
+        )
+        parser.add_argument(
+            "--batch-size",
+            type=int,
+            default=500,
+            help="The number of files inserted in each transaction."
+        )
+        parser.add_argument(
+            "--queue",
+            action="store_true",
+            help="Leave the streams queued for `transcode_worker` at bulk priority instead of transcoding them here."
+        )
+
+    def handle(self, *args, **options):
+        authors = list(User.objects.filter(username__in=options["author"]))
+        missing = set(options["author"]) - {author.username for author in authors}
+        if missing:
+            raise CommandError(f"Unknown author(s): {', '.join(sorted(missing))}")
+        paths = list(find_audio_files(options["directory"]))
+        pending = filter_imported(paths)
+        self.stdout.write(f"Found {len(paths)} audio file(s), {len(paths) - len(pending)} already imported")
+        imported = failed = 0
+        processes = min(options["processes"], get_process_limit())
+        # Pool processes never use the database, close the connections so they are not shared with forked children.
+        connections.close_all()
+        with ProcessPoolExecutor(max_workers=processes) as executor:
+            for start in range(0, len(pending), options["batch_size"]):
+                prepared = list()
+                for result in executor.map(prepare_file, pending[start:start + options["batch_size"]]):
+                    if "error" in result:
+                        failed += 1
+                        self.stderr.write(f"Could not import {result['path']}: {result['error']}")
+                    else:
+                        prepared.append(result)
+                jobs = import_batch(prepared, authors, options["public"])
+                imported += len(prepared)
+                if not options["queue"]:
+                    self.transcode(jobs, executor)
+                self.stdout.write(f"Imported {imported} of {len(pending)} file(s), {failed} failed")
+
+    def transcode(self, jobs, executor):
+        """
+        Start and run a batch's jobs in the pool.  Jobs left queued by an interrupted import are run by
+        `transcode_worker`.
+        :param jobs:     The queued TranscodeJob instances.
+        :param executor: The process pool.
+        """
+        job_ids = [job.id for job in jobs]
+        for start in range(0, len(job_ids), QUERY_BATCH_SIZE):
+            run_jobs(start_jobs(TranscodeJob.objects.filter(id__in=job_ids[start:start + QUERY_BATCH_SIZE])), executor)
+        evict_renditions()
@@ -0,0 +1,35 @@
+#  Copyright (C) 2020  Mind Audio Central
+#
+#  This file is part of mac_backend_api.
+#
+#  mac_backend_api is free software: you can redistribute it and/or modify
+#  it under the terms of the GNU General Public License as published by
+#  the Free Software Foundation, either version 3 of the License, or
+#  (at your option) any later version.
+#
+#  mac_backend_api is distributed in the hope that it will be useful,
+#  but WITHOUT ANY WARRANTY; without even the implied warranty of
+#  MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+#  GNU General Public License for more details.
+#
+#  You should have received a copy of the GNU General Public License
+#  along with mac_backend_api.  If not, see <https://www.gnu.org/licenses/>.
+from django.core.management.base import BaseCommand
+
+from mac_backend_api.audio.likes import RECONCILE_BATCH_SIZE, reconcile_like_counts
+
+
+class Command(BaseCommand):
+    help = "Recompute every audio's stored like count from its likes."
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--batch-size",
+            type=int,
+            default=RECONCILE_BATCH_SIZE,
+            help="The number of audios checked by each query."
+        )
+
+    def handle(self, *args, **options):
+        corrected = reconcile_like_counts(options["batch_size"])
+        self.stdout.write(f"Corrected the like count of {corrected} audio(s)")
@@ -0,0 +1,125 @@
+#  Copyright (C) 2020  Mind Audio Central
+#
+#  This file is part of mac_backend_api.
+#
+#  mac_backend_api is free software: you can redistribute it and/or modify
+#  it under the terms of the GNU General Public License as published by
+#  the Free Software Foundation, either version 3 of the License, or
+#  (at your option) any later version.
+#
+#  mac_backend_api is distributed in the hope that it will be useful,
+#  but WITHOUT ANY WARRANTY; without even the implied warranty of
+#  MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+#  GNU General Public License for more details.
+#
+#  You should have received a copy of the GNU General Public License
+#  along with mac_backend_api.  If not, see <https://www.gnu.org/licenses/>.
+import os
+import time
+from concurrent.futures import ProcessPoolExecutor
+
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connections
+from django.utils import timezone
+from django.utils.dateparse import parse_datetime
+
+from mac_backend_api.audio.models import Stream
+from mac_backend_api.audio.transcoding.cache import QUERY_BATCH_SIZE, evict_renditions
+from mac_backend_api.audio.transcoding.retranscode import iterate_batches, rerender_streams, select_streams
+from mac_backend_api.audio.transcoding.scheduler import get_process_limit
+
+
+class Command(BaseCommand):
+    help = ("Render ready streams again with their own settings, after the encoder changed.  Streams keep serving "
+            "their current files until their new renditions replace them.  Rendered streams are not selected again, so "
+            "an interrupted run resumes when it is started again with the same --rendered-before.")
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--format",
+            action="append",
+            default=[],
+            choices=Stream.AudioFormat.values,
+            help="Only render streams in this format, may be given more than once."
+        )
+        parser.add_argument(
+            "--bit-rate",
+            action="append",
+            type=int,
+            default=[],
+            choices=Stream.AudioBitRate.values,
+            help="Only render streams with this bit-rate, may be given more than once."
+        )
+        parser.add_argument(
+            "--sample-rate",
+            action="append",
+            type=int,
+            default=[],
+            choices=Stream.AudioSampleRate.values,
+            help="Only render streams with this sample-rate, may be given more than once."
+        )
+        parser.add_argument(
+            "--rendered-before",
+            help="Only render streams last rendered before this ISO 8601 date and time.  Default is now."
+        )
+        parser.add_argument(
+            "--after",
+            default="",
+            help="Start after the stream with this id, as printed with the progress."
+        )
+        parser.add_argument(
+            "--batch-size",
+            type=int,
+            default=100,
+            help=f"The number of streams rendered in each batch, at most {QUERY_BATCH_SIZE}."
+        )
+        parser.add_argument(
+            "--no-cache",
+            action="store_true",
+            help="Encode every stream again instead of reusing the renditions cached by the current ENCODER_VERSION."
+        )
+        parser.add_argument(
+            "--processes",
+            type=int,
+            default=settings.TRANSCODE_WORKER_PROCESSES,
+            help="The number of transcoding processes to run, at most one per CPU not reserved for the API."
+        )
+
+    def handle(self, *args, **options):
+        if not 0 < options["batch_size"] <= QUERY_BATCH_SIZE:
+            raise CommandError(f"The batch size must be between 1 and {QUERY_BATCH_SIZE}")
+        rendered_before = self.parse_rendered_before(options["rendered_before"])
+        streams = select_streams(rendered_before, options["format"], options["bit_rate"], options["sample_rate"])
+        total = streams.filter(id__gt=options["after"]).count()
+        self.stdout.write(f"Rendering {total} stream(s) last rendered before {rendered_before.isoformat()}")
+        processes = min(options["processes"], get_process_limit())
+        if hasattr(os, "nice"):
+            os.nice(settings.TRANSCODE_WORKER_NICENESS)
+        connections.close_all()
+        rendered = failed = 0
+        started = time.monotonic()
+        with ProcessPoolExecutor(max_workers=processes) as executor:
+            for batch in iterate_batches(streams, options["batch_size"], options["after"]):
+                batch_rendered = rerender_streams(batch, executor, use_cache=not options["no_cache"])
+                rendered += batch_rendered
+                failed += len(batch) - batch_rendered
+                evict_renditions()
+                rate = (rendered + failed) / (time.monotonic() - started)
+                self.stdout.write(f"Rendered {rendered} of {total} stream(s), {failed} failed, {rate:.1f} per second.  "
+                                  f"Resume with --rendered-before {rendered_before.isoformat()} --after {batch[-1].id}")
+
+    def parse_rendered_before(self, value):
+        """
+        Parse the --rendered-before option.
+        :param value: The option's value, or None.
+        :return:      An aware datetime, now if the value is None.
+        """
+        if value is None:
+            return timezone.now()
+        rendered_before = parse_datetime(value)
+        if rendered_before is None:
+            raise CommandError(f"{value} is not an ISO 8601 date and time")
+        if timezone.is_naive(rendered_before):
+            rendered_before = timezone.make_aware(rendered_before)
+        return rendered_before
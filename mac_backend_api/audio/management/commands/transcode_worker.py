@@ -0,0 +1,76 @@
+#  Copyright (C) 2020  Mind Audio Central
+#
+#  This file is part of mac_backend_api.
+#
+#  mac_backend_api is free software: you can redistribute it and/or modify
+#  it under the terms of the GNU General Public License as published by
+#  the Free Software Foundation, either version 3 of the License, or
+#  (at your option) any later version.
+#
+#  mac_backend_api is distributed in the hope that it will be useful,
+#  but WITHOUT ANY WARRANTY; without even the implied warranty of
+#  MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+#  GNU General Public License for more details.
+#
+#  You should have received a copy of the GNU General Public License
+#  along with mac_backend_api.  If not, see <https://www.gnu.org/licenses/>.
+
+import os
+import time
+from concurrent.futures import ProcessPoolExecutor
+
+from django.conf import settings
+from django.core.management.base import BaseCommand
+from django.db import connections
+
+from mac_backend_api.audio.transcoding.cache import evict_renditions
+from mac_backend_api.audio.transcoding.queue import claim_jobs, run_jobs
+from mac_backend_api.audio.transcoding.scheduler import get_process_limit, get_queue_metrics
+
+
+class Command(BaseCommand):
+    help = "Render queued streams using a pool of transcoding processes."
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--processes",
+            type=int,
+            default=settings.TRANSCODE_WORKER_PROCESSES,
+            help="The number of transcoding processes to run, at most one per CPU not reserved for the API."
+        )
+        parser.add_argument(
+            "--poll-interval",
+            type=float,
+            default=settings.TRANSCODE_POLL_INTERVAL,
+            help="The number of seconds to wait before checking an empty queue again."
+        )
+        parser.add_argument(
+            "--once",
+            action="store_true",
+            help="Exit once the queue is empty instead of waiting for new jobs."
+        )
+
+    def handle(self, *args, **options):
+        processes = min(options["processes"], get_process_limit())
+        if processes < options["processes"]:
+            self.stderr.write(f"Limiting the worker to {processes} process(es), "
+                              f"{settings.TRANSCODE_RESERVED_CPUS} CPU(s) are reserved for the API")
+        if hasattr(os, "nice"):
+            # The pool's processes inherit the lowered priority.
+            os.nice(settings.TRANSCODE_WORKER_NICENESS)
+        # Worker processes never use the database, close the connections so they are not shared with forked children.
+        connections.close_all()
+        with ProcessPoolExecutor(max_workers=processes) as executor:
+            while True:
+                jobs = claim_jobs(limit=processes)
+                if jobs:
+                    run_jobs(jobs, executor)
+                    evict_renditions()
+                    metrics = get_queue_metrics()
+                    self.stdout.write(f"Processed {len(jobs)} transcode job(s), "
+                                      f"{metrics['queued']['interactive']} interactive and "
+                                      f"{metrics['queued']['bulk']} bulk job(s) queued")
+                elif options["once"]:
+                    break
+                else:
+                    time.sleep(options["poll_interval"])
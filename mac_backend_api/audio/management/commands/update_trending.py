@@ -0,0 +1,36 @@
+#  Copyright (C) 2020  Mind Audio Central
+#
+#  This file is part of mac_backend_api.
+#
+#  mac_backend_api is free software: you can redistribute it and/or modify
+#  it under the terms of the GNU General Public License as published by
+#  the Free Software Foundation, either version 3 of the License, or
+#  (at your option) any later version.
+#
+#  mac_backend_api is distributed in the hope that it will be useful,
+#  but WITHOUT ANY WARRANTY; without even the implied warranty of
+#  MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+#  GNU General Public License for more details.
+#
+#  You should have received a copy of the GNU General Public License
+#  along with mac_backend_api.  If not, see <https://www.gnu.org/licenses/>.
+from django.core.management.base import BaseCommand
+
+from mac_backend_api.audio.trending import get_complete_hour, update_trending
+
+
+class Command(BaseCommand):
+    help = ("Update the trending scores with the listens and likes since they were last computed.  Run it hourly, "
+            "for example from cron.")
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--full",
+            action="store_true",
+            help="Discard the stored scores and compute them again from every listen and like in the trending window."
+        )
+
+    def handle(self, *args, **options):
+        updated = update_trending(full=options["full"])
+        through = get_complete_hour().isoformat()
+        self.stdout.write(f"Updated the trending scores of {updated} audio(s) through {through}")
@@ -0,0 +1,79 @@
+#  Copyright (C) 2020  Mind Audio Central
+#
+#  This file is part of mac_backend_api.
+#
+#  mac_backend_api is free software: you can redistribute it and/or modify
+#  it under the terms of the GNU General Public License as published by
+#  the Free Software Foundation, either version 3 of the License, or
+#  (at your option) any later version.
+#
+#  mac_backend_api is distributed in the hope that it will be useful,
+#  but WITHOUT ANY WARRANTY; without even the implied warranty of
+#  MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+#  GNU General Public License for more details.
+#
+#  You should have received a copy of the GNU General Public License
+#  along with mac_backend_api.  If not, see <https://www.gnu.org/licenses/>.
+
+import os
+from urllib.parse import unquote
+
+from django.conf import settings
+from django.core.files.storage import default_storage
+from django.http import Http404
+
+from mac_backend_api.audio.streaming import OFFLOAD_HEADERS, serve_stored_file
+
+
+class MediaOffloadStandInMiddleware:
+    """
+    Stands in for the web server when `MEDIA_OFFLOAD` is enabled without nginx or Apache in front of Django.
+
+    Responses carrying an X-Accel-Redirect or X-Sendfile header are replaced with the file they point to, served with
+    the same Range support the web server would provide.  Only meant for development and tests.
+    """
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+
+    def __call__(self, request):
+        response = self.get_response(request)
+        for header in OFFLOAD_HEADERS.values():
+            if response.has_header(header):
+                return self.serve_offloaded(request, response, header)
+        return response
+
+    @staticmethod
+    def get_name(response, header) -> str:
+        """
+        Find the name of the offloaded file in the default storage.
+        :param response: The response carrying the offload header.
+        :param header:   The name of the offload header.
+        :return:         The file's name.
+        """
+        if header == OFFLOAD_HEADERS["x-accel-redirect"]:
+            prefix = settings.MEDIA_OFFLOAD_PREFIX.rstrip("/") + "/"
+            location = unquote(response[header])
+            if not location.startswith(prefix):
+                raise Http404
+            return location[len(prefix):]
+        name = os.path.relpath(response[header], settings.MEDIA_ROOT)
+        if name.startswith(os.pardir):
+            raise Http404
+        return name
+
+    def serve_offloaded(self, request, response, header):
+        """
+        Serve the file an offloaded response points to.
+        :param request:  The request.
+        :param response: The response carrying the offload header.
+        :param header:   The name of the offload header.
+        :return:         The response containing the file.
+        """
+        name = self.get_name(response, header)
+        if not default_storage.exists(name):
+            raise Http404
+        file_response = serve_stored_file(request, default_storage, name, response["Content-Type"])
+        if response.has_header("Content-Disposition"):
+            file_response["Content-Disposition"] = response["Content-Disposition"]
+        return file_response
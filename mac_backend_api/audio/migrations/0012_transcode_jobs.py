@@ -0,0 +1,52 @@
+# Generated by Django 3.0.7 on 2026-10-18 13:26
+
+from django.db import migrations, models
+import django.db.models.deletion
+import django.utils.timezone
+import mac_backend_api.audio.models
+import mac_backend_api.utils.random_id.random_id
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('audio', '0011_auto_20200825_1053'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='audio',
+            name='source',
+            field=models.FileField(blank=True, editable=False, help_text="The original uploaded file, the audio's streams are transcoded from it", upload_to=mac_backend_api.audio.models.get_audio_source_upload_path),
+        ),
+        migrations.AddField(
+            model_name='stream',
+            name='status',
+            field=models.CharField(choices=[('pending', 'Pending'), ('processing', 'Processing'), ('ready', 'Ready'), ('failed', 'Failed')], default='ready', editable=False, help_text='The processing state of the stream, the file is only available once the stream is ready', max_length=10),
+        ),
+        migrations.AlterField(
+            model_name='stream',
+            name='file',
+            field=models.FileField(blank=True, help_text="The stream's audio file, it will be processed to match the format and bit_rate values", upload_to=mac_backend_api.audio.models.get_audio_stream_upload_path),
+        ),
+        migrations.CreateModel(
+            name='TranscodeJob',
+            fields=[
+                ('id', models.CharField(default=mac_backend_api.utils.random_id.random_id.random_id, editable=False, help_text='The unique ID of the job', max_length=14, primary_key=True, serialize=False)),
+                ('status', models.CharField(choices=[('queued', 'Queued'), ('running', 'Running'), ('done', 'Done'), ('failed', 'Failed')], default='queued', help_text='The state of the job', max_length=10)),
+                ('attempts', models.PositiveSmallIntegerField(default=0, help_text='The number of times a worker has claimed the job')),
+                ('error', models.TextField(blank=True, help_text='The error raised by the last failed attempt, if any')),
+                ('created_at', models.DateTimeField(default=django.utils.timezone.now, editable=False, help_text='The date and time the job was queued')),
+                ('started_at', models.DateTimeField(blank=True, help_text='The date and time the last attempt started', null=True)),
+                ('finished_at', models.DateTimeField(blank=True, help_text='The date and time the job finished or failed for good', null=True)),
+                ('stream', models.ForeignKey(help_text='A reference to the Stream to render', on_delete=django.db.models.deletion.CASCADE, related_name='transcode_jobs', to='audio.Stream')),
+            ],
+            options={
+                'ordering': ['created_at'],
+            },
+        ),
+        migrations.AddIndex(
+            model_name='transcodejob',
+            index=models.Index(fields=['status', 'created_at'], name='audio_trans_status_4d9550_idx'),
+        ),
+    ]
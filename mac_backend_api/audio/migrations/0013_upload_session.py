@@ -0,0 +1,36 @@
+# Generated by Django 3.0.7 on 2026-10-18 13:29
+
+from django.conf import settings
+from django.db import migrations, models
+import django.db.models.deletion
+import django.utils.timezone
+import mac_backend_api.audio.models
+import mac_backend_api.utils.random_id.random_id
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+        ('audio', '0012_transcode_jobs'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='UploadSession',
+            fields=[
+                ('id', models.CharField(default=mac_backend_api.utils.random_id.random_id.random_id, editable=False, help_text='The unique ID of the upload session', max_length=14, primary_key=True, serialize=False)),
+                ('title', models.CharField(help_text='Title of the audio to create', max_length=100)),
+                ('description', models.TextField(blank=True, help_text='A short description for the audio to create', max_length=2000)),
+                ('is_public', models.BooleanField(default=False, help_text='Indicates if the audio to create should be shown on public indexes')),
+                ('filename', models.CharField(help_text='The name of the file being uploaded', max_length=255)),
+                ('size', models.BigIntegerField(help_text='The total size of the file in bytes')),
+                ('received', models.BigIntegerField(default=0, editable=False, help_text='The number of bytes received so far, the next chunk must start at this offset')),
+                ('file', models.FileField(editable=False, help_text='The partially uploaded file', upload_to=mac_backend_api.audio.models.get_upload_session_path)),
+                ('created_at', models.DateTimeField(default=django.utils.timezone.now, editable=False, help_text='The date and time the upload started')),
+                ('updated_at', models.DateTimeField(auto_now=True, help_text='The date and time a chunk was last received')),
+                ('audio', models.OneToOneField(blank=True, editable=False, help_text='A reference to the Audio created when the session was finalized', null=True, on_delete=django.db.models.deletion.SET_NULL, to='audio.Audio')),
+                ('user', models.ForeignKey(help_text='A reference to the User uploading the file', on_delete=django.db.models.deletion.CASCADE, related_name='upload_sessions', to=settings.AUTH_USER_MODEL)),
+            ],
+        ),
+    ]
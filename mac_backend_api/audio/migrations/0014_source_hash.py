@@ -0,0 +1,18 @@
+# Generated by Django 3.0.7 on 2026-10-18 13:30
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('audio', '0013_upload_session'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='audio',
+            name='source_hash',
+            field=models.CharField(blank=True, db_index=True, editable=False, help_text='The SHA-256 hex digest of the source file', max_length=64),
+        ),
+    ]
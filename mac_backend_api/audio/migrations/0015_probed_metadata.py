@@ -0,0 +1,63 @@
+# Generated by Django 3.0.7 on 2026-10-18 13:32
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('audio', '0014_source_hash'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='audio',
+            name='channels',
+            field=models.PositiveSmallIntegerField(blank=True, editable=False, help_text='The number of channels in the source file', null=True),
+        ),
+        migrations.AddField(
+            model_name='audio',
+            name='duration',
+            field=models.FloatField(blank=True, db_index=True, editable=False, help_text='The length of the audio in seconds', null=True),
+        ),
+        migrations.AddField(
+            model_name='audio',
+            name='source_bit_rate',
+            field=models.IntegerField(blank=True, editable=False, help_text='The bit-rate of the source file in bits per second', null=True),
+        ),
+        migrations.AddField(
+            model_name='audio',
+            name='source_sample_rate',
+            field=models.IntegerField(blank=True, editable=False, help_text='The sample-rate of the source file in hz', null=True),
+        ),
+        migrations.AddField(
+            model_name='audio',
+            name='source_size',
+            field=models.BigIntegerField(blank=True, editable=False, help_text='The size of the source file in bytes', null=True),
+        ),
+        migrations.AddField(
+            model_name='stream',
+            name='actual_bit_rate',
+            field=models.IntegerField(blank=True, editable=False, help_text="The bit-rate read from the stream's file in bits per second", null=True),
+        ),
+        migrations.AddField(
+            model_name='stream',
+            name='actual_sample_rate',
+            field=models.IntegerField(blank=True, editable=False, help_text="The sample-rate read from the stream's file in hz", null=True),
+        ),
+        migrations.AddField(
+            model_name='stream',
+            name='channels',
+            field=models.PositiveSmallIntegerField(blank=True, editable=False, help_text="The number of channels in the stream's file", null=True),
+        ),
+        migrations.AddField(
+            model_name='stream',
+            name='duration',
+            field=models.FloatField(blank=True, editable=False, help_text='The length of the stream in seconds', null=True),
+        ),
+        migrations.AddField(
+            model_name='stream',
+            name='size',
+            field=models.BigIntegerField(blank=True, editable=False, help_text="The size of the stream's file in bytes", null=True),
+        ),
+    ]
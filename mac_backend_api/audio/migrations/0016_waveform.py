@@ -0,0 +1,32 @@
+# Generated by Django 3.0.7 on 2026-10-18 13:34
+
+from django.db import migrations, models
+import django.db.models.deletion
+import mac_backend_api.audio.models
+import mac_backend_api.utils.random_id.random_id
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('audio', '0015_probed_metadata'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='Waveform',
+            fields=[
+                ('id', models.CharField(default=mac_backend_api.utils.random_id.random_id.random_id, editable=False, help_text='The unique ID of the waveform', max_length=14, primary_key=True, serialize=False)),
+                ('samples_per_pixel', models.PositiveIntegerField(help_text='The number of samples each pair of peaks covers')),
+                ('file', models.FileField(help_text='The encoded peaks', upload_to=mac_backend_api.audio.models.get_waveform_upload_path)),
+                ('audio', models.ForeignKey(help_text='A reference to the Audio instance', on_delete=django.db.models.deletion.CASCADE, related_name='waveforms', to='audio.Audio')),
+            ],
+            options={
+                'ordering': ['samples_per_pixel'],
+            },
+        ),
+        migrations.AddConstraint(
+            model_name='waveform',
+            constraint=models.UniqueConstraint(fields=('audio', 'samples_per_pixel'), name='unique_waveform_resolution'),
+        ),
+    ]
@@ -0,0 +1,48 @@
+# Generated by Django 3.0.7 on 2026-10-18 13:37
+
+from django.db import migrations, models
+import django.db.models.deletion
+import mac_backend_api.audio.models
+import mac_backend_api.utils.random_id.random_id
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('audio', '0016_waveform'),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name='audio',
+            name='source',
+            field=models.FileField(blank=True, editable=False, help_text="The original uploaded file, the audio's streams are transcoded from it", max_length=255, upload_to=mac_backend_api.audio.models.get_audio_source_upload_path),
+        ),
+        migrations.AlterField(
+            model_name='stream',
+            name='file',
+            field=models.FileField(blank=True, help_text="The stream's audio file, it will be processed to match the format and bit_rate values", max_length=255, upload_to=mac_backend_api.audio.models.get_audio_stream_upload_path),
+        ),
+        migrations.AlterField(
+            model_name='waveform',
+            name='file',
+            field=models.FileField(help_text='The encoded peaks', max_length=255, upload_to=mac_backend_api.audio.models.get_waveform_upload_path),
+        ),
+        migrations.CreateModel(
+            name='Segment',
+            fields=[
+                ('id', models.CharField(default=mac_backend_api.utils.random_id.random_id.random_id, editable=False, help_text='The unique ID of the segment', max_length=14, primary_key=True, serialize=False)),
+                ('index', models.PositiveIntegerField(help_text='The position of the segment within the stream, starting at 0')),
+                ('duration', models.FloatField(help_text='The length of the segment in seconds')),
+                ('file', models.FileField(help_text="The segment's audio file", max_length=255, upload_to=mac_backend_api.audio.models.get_segment_upload_path)),
+                ('stream', models.ForeignKey(help_text='A reference to the Stream instance', on_delete=django.db.models.deletion.CASCADE, related_name='segments', to='audio.Stream')),
+            ],
+            options={
+                'ordering': ['stream', 'index'],
+            },
+        ),
+        migrations.AddConstraint(
+            model_name='segment',
+            constraint=models.UniqueConstraint(fields=('stream', 'index'), name='unique_segment_index'),
+        ),
+    ]
@@ -0,0 +1,25 @@
+# Generated by Django 3.0.7 on 2026-10-18 13:43
+
+from django.db import migrations, models
+import mac_backend_api.audio.models
+import mac_backend_api.audio.storage
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('audio', '0017_segment'),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name='segment',
+            name='file',
+            field=models.FileField(help_text="The segment's audio file", max_length=255, storage=mac_backend_api.audio.storage.ShardedContentStorage(), upload_to=mac_backend_api.audio.models.get_segment_upload_path),
+        ),
+        migrations.AlterField(
+            model_name='stream',
+            name='file',
+            field=models.FileField(blank=True, help_text="The stream's audio file, it will be processed to match the format and bit_rate values", max_length=255, storage=mac_backend_api.audio.storage.ShardedContentStorage(), upload_to=mac_backend_api.audio.models.get_audio_stream_upload_path),
+        ),
+    ]
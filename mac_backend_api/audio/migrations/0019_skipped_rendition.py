@@ -0,0 +1,29 @@
+# Generated by Django 3.0.7 on 2026-10-18 13:44
+
+from django.db import migrations, models
+import django.db.models.deletion
+import mac_backend_api.utils.random_id.random_id
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('audio', '0018_sharded_stream_storage'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='SkippedRendition',
+            fields=[
+                ('id', models.CharField(default=mac_backend_api.utils.random_id.random_id.random_id, editable=False, help_text='The unique ID of the skipped rendition', max_length=14, primary_key=True, serialize=False)),
+                ('format', models.CharField(choices=[('mp3', 'Mp3'), ('aac', 'Aac'), ('ogg', 'Ogg'), ('wav', 'Wav')], help_text='The format of the skipped preset', max_length=10)),
+                ('bit_rate', models.IntegerField(choices=[(32000, 'Minimum'), (64000, 'Low'), (96000, 'Average'), (128000, 'High'), (192000, 'Very High'), (256000, 'Maximum')], help_text='The bit-rate of the skipped preset')),
+                ('sample_rate', models.IntegerField(choices=[(44100, 'Low'), (48000, 'Average'), (96000, 'High')], help_text='The sample-rate of the skipped preset')),
+                ('reason', models.CharField(help_text='Why the preset was not rendered', max_length=255)),
+                ('audio', models.ForeignKey(help_text='A reference to the Audio instance', on_delete=django.db.models.deletion.CASCADE, related_name='skipped_renditions', to='audio.Audio')),
+            ],
+            options={
+                'ordering': ['-sample_rate', '-bit_rate'],
+            },
+        ),
+    ]
@@ -0,0 +1,30 @@
+# Generated by Django 3.0.7 on 2026-10-18 13:45
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('audio', '0019_skipped_rendition'),
+    ]
+
+    operations = [
+        migrations.AlterModelOptions(
+            name='transcodejob',
+            options={'ordering': ['priority', 'created_at']},
+        ),
+        migrations.RemoveIndex(
+            model_name='transcodejob',
+            name='audio_trans_status_4d9550_idx',
+        ),
+        migrations.AddField(
+            model_name='transcodejob',
+            name='priority',
+            field=models.PositiveSmallIntegerField(choices=[(0, 'Interactive'), (10, 'Bulk')], default=0, help_text='Jobs with a lower priority value are claimed first, uploads are interactive and re-encodes are bulk'),
+        ),
+        migrations.AddIndex(
+            model_name='transcodejob',
+            index=models.Index(fields=['status', 'priority', 'created_at'], name='audio_trans_status_160f27_idx'),
+        ),
+    ]
@@ -0,0 +1,18 @@
+# Generated by Django 3.0.7 on 2026-10-18 13:48
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('audio', '0020_transcode_priority'),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name='stream',
+            name='status',
+            field=models.CharField(choices=[('deferred', 'Deferred'), ('pending', 'Pending'), ('processing', 'Processing'), ('ready', 'Ready'), ('failed', 'Failed')], default='ready', editable=False, help_text='The processing state of the stream, the file is only available once the stream is ready', max_length=10),
+        ),
+    ]
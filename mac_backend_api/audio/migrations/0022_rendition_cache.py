@@ -0,0 +1,65 @@
+# Generated by Django 3.0.7 on 2026-10-18 13:50
+
+from django.db import migrations, models
+import django.db.models.deletion
+import django.utils.timezone
+import mac_backend_api.audio.models
+import mac_backend_api.audio.storage
+import mac_backend_api.utils.random_id.random_id
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('audio', '0021_deferred_stream'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='CachedRendition',
+            fields=[
+                ('id', models.CharField(default=mac_backend_api.utils.random_id.random_id.random_id, editable=False, help_text='The unique ID of the cached rendition', max_length=14, primary_key=True, serialize=False)),
+                ('source_hash', models.CharField(help_text='The SHA-256 hex digest of the source the rendition was encoded from', max_length=64)),
+                ('format', models.CharField(choices=[('mp3', 'Mp3'), ('aac', 'Aac'), ('ogg', 'Ogg'), ('wav', 'Wav')], help_text='The format of the rendition', max_length=10)),
+                ('bit_rate', models.IntegerField(choices=[(32000, 'Minimum'), (64000, 'Low'), (96000, 'Average'), (128000, 'High'), (192000, 'Very High'), (256000, 'Maximum')], help_text='The bit-rate the rendition was encoded with')),
+                ('sample_rate', models.IntegerField(choices=[(44100, 'Low'), (48000, 'Average'), (96000, 'High')], help_text='The sample-rate the rendition was encoded with')),
+                ('encoder_version', models.CharField(help_text='The version of the encoder which rendered the file', max_length=32)),
+                ('file', models.FileField(db_index=True, help_text='The rendered file', max_length=255, storage=mac_backend_api.audio.storage.ShardedContentStorage(), upload_to='')),
+                ('duration', models.FloatField(blank=True, help_text='The length of the rendition in seconds', null=True)),
+                ('channels', models.PositiveSmallIntegerField(blank=True, help_text='The number of channels in the rendered file', null=True)),
+                ('actual_bit_rate', models.IntegerField(blank=True, help_text='The bit-rate read from the rendered file in bits per second', null=True)),
+                ('actual_sample_rate', models.IntegerField(blank=True, help_text='The sample-rate read from the rendered file in hz', null=True)),
+                ('size', models.BigIntegerField(blank=True, help_text='The size of the rendered file in bytes', null=True)),
+                ('total_size', models.BigIntegerField(default=0, help_text="The size of the file and its segments in bytes, counted against the cache's budget")),
+                ('created_at', models.DateTimeField(default=django.utils.timezone.now, editable=False, help_text='The date and time the rendition was cached')),
+                ('last_used_at', models.DateTimeField(db_index=True, default=django.utils.timezone.now, help_text='The date and time the rendition was last cached or reused')),
+            ],
+        ),
+        migrations.AlterField(
+            model_name='segment',
+            name='file',
+            field=models.FileField(db_index=True, help_text="The segment's audio file", max_length=255, storage=mac_backend_api.audio.storage.ShardedContentStorage(), upload_to=mac_backend_api.audio.models.get_segment_upload_path),
+        ),
+        migrations.AlterField(
+            model_name='stream',
+            name='file',
+            field=models.FileField(blank=True, db_index=True, help_text="The stream's audio file, it will be processed to match the format and bit_rate values", max_length=255, storage=mac_backend_api.audio.storage.ShardedContentStorage(), upload_to=mac_backend_api.audio.models.get_audio_stream_upload_path),
+        ),
+        migrations.CreateModel(
+            name='CachedSegment',
+            fields=[
+                ('id', models.CharField(default=mac_backend_api.utils.random_id.random_id.random_id, editable=False, help_text='The unique ID of the cached segment', max_length=14, primary_key=True, serialize=False)),
+                ('index', models.PositiveIntegerField(help_text='The position of the segment within the rendition, starting at 0')),
+                ('duration', models.FloatField(help_text='The length of the segment in seconds')),
+                ('file', models.FileField(db_index=True, help_text="The segment's audio file", max_length=255, storage=mac_backend_api.audio.storage.ShardedContentStorage(), upload_to='')),
+                ('rendition', models.ForeignKey(help_text='A reference to the CachedRendition instance', on_delete=django.db.models.deletion.CASCADE, related_name='segments', to='audio.CachedRendition')),
+            ],
+            options={
+                'ordering': ['rendition', 'index'],
+            },
+        ),
+        migrations.AddConstraint(
+            model_name='cachedrendition',
+            constraint=models.UniqueConstraint(fields=('source_hash', 'format', 'bit_rate', 'sample_rate', 'encoder_version'), name='unique_cached_rendition'),
+        ),
+    ]
@@ -0,0 +1,28 @@
+# Generated by Django 3.0.7 on 2026-10-18 13:53
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('audio', '0022_rendition_cache'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='audio',
+            name='loudness',
+            field=models.FloatField(blank=True, editable=False, help_text='The integrated loudness of the source in LUFS, gated as in ITU-R BS.1770 but without K-weighting', null=True),
+        ),
+        migrations.AddField(
+            model_name='audio',
+            name='peak',
+            field=models.FloatField(blank=True, editable=False, help_text='The highest sample of the source in dBFS', null=True),
+        ),
+        migrations.AddField(
+            model_name='audio',
+            name='rms',
+            field=models.FloatField(blank=True, editable=False, help_text='The RMS level of the whole source in dBFS', null=True),
+        ),
+    ]
@@ -0,0 +1,26 @@
+# Generated by Django 3.0.7 on 2026-10-18 13:56
+
+from django.db import migrations, models
+import django.db.models.deletion
+import django.utils.timezone
+import mac_backend_api.utils.random_id.random_id
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('audio', '0023_loudness'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ImportedFile',
+            fields=[
+                ('id', models.CharField(default=mac_backend_api.utils.random_id.random_id.random_id, editable=False, help_text='The unique ID of the imported file', max_length=14, primary_key=True, serialize=False)),
+                ('path', models.TextField(help_text='The absolute path the file was imported from')),
+                ('path_hash', models.CharField(help_text='The SHA-256 hex digest of the path, paths may be too long to index directly', max_length=64, unique=True)),
+                ('imported_at', models.DateTimeField(default=django.utils.timezone.now, editable=False, help_text='The date and time the file was imported')),
+                ('audio', models.ForeignKey(blank=True, help_text='A reference to the Audio created from the file, deleting it does not import the file again', null=True, on_delete=django.db.models.deletion.SET_NULL, to='audio.Audio')),
+            ],
+        ),
+    ]
@@ -0,0 +1,23 @@
+# Generated by Django 3.0.7 on 2026-10-18 13:58
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('audio', '0024_imported_file'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='stream',
+            name='rendered_at',
+            field=models.DateTimeField(blank=True, db_index=True, editable=False, help_text="The date and time the stream's file was last rendered, `retranscode` selects streams by it", null=True),
+        ),
+        migrations.AddField(
+            model_name='transcodejob',
+            name='is_rerender',
+            field=models.BooleanField(default=False, help_text='The stream keeps serving its current file while the job runs, and if it fails'),
+        ),
+    ]
@@ -0,0 +1,28 @@
+# Generated by Django 3.0.7 on 2026-10-18 14:00
+
+from django.db import migrations, models
+from django.db.models import Count, OuterRef, Subquery
+from django.db.models.functions import Coalesce
+
+
+def count_existing_likes(apps, schema_editor):
+    Audio = apps.get_model("audio", "Audio")
+    Like = apps.get_model("audio", "Like")
+    counts = Like.objects.filter(audio=OuterRef("pk")).order_by().values("audio").annotate(count=Count("pk"))
+    Audio.objects.update(like_count=Coalesce(Subquery(counts.values("count")), 0))
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('audio', '0025_retranscode'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='audio',
+            name='like_count',
+            field=models.IntegerField(db_index=True, default=0, editable=False, help_text='The number of people who have liked the audio, kept in step with its Like objects'),
+        ),
+        migrations.RunPython(count_existing_likes, migrations.RunPython.noop),
+    ]
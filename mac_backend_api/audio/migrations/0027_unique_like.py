@@ -0,0 +1,33 @@
+# Generated by Django 3.0.7 on 2026-10-18 14:02
+
+from django.db import migrations, models
+from django.db.models import Count, Min, OuterRef, Subquery
+from django.db.models.functions import Coalesce
+
+
+def remove_duplicate_likes(apps, schema_editor):
+    Audio = apps.get_model("audio", "Audio")
+    Like = apps.get_model("audio", "Like")
+    duplicates = Like.objects.values("user", "audio").annotate(count=Count("id"), kept=Min("id")).filter(count__gt=1)
+    audio_ids = set()
+    for duplicate in duplicates:
+        Like.objects.filter(user=duplicate["user"], audio=duplicate["audio"]).exclude(id=duplicate["kept"]).delete()
+        audio_ids.add(duplicate["audio"])
+    counts = Like.objects.filter(audio=OuterRef("pk")).order_by().values("audio").annotate(count=Count("pk"))
+    for audio_id in audio_ids:
+        Audio.objects.filter(id=audio_id).update(like_count=Coalesce(Subquery(counts.values("count")), 0))
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('audio', '0026_like_count'),
+    ]
+
+    operations = [
+        migrations.RunPython(remove_duplicate_likes, migrations.RunPython.noop),
+        migrations.AddConstraint(
+            model_name='like',
+            constraint=models.UniqueConstraint(fields=('user', 'audio'), name='unique_like'),
+        ),
+    ]
@@ -0,0 +1,35 @@
+# Generated by Django 3.0.7 on 2026-10-18 14:06
+
+from django.db import migrations, models
+import django.db.models.deletion
+import mac_backend_api.utils.random_id.random_id
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('audio', '0027_unique_like'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ListenRollup',
+            fields=[
+                ('id', models.CharField(default=mac_backend_api.utils.random_id.random_id.random_id, editable=False, help_text='The unique ID of the rollup', max_length=14, primary_key=True, serialize=False)),
+                ('hour', models.DateTimeField(help_text='The start of the hour the listens were counted in')),
+                ('count', models.PositiveIntegerField(default=0, help_text='The number of listens within the hour')),
+                ('audio', models.ForeignKey(help_text='A reference to the Audio instance', on_delete=django.db.models.deletion.CASCADE, related_name='listen_rollups', to='audio.Audio')),
+            ],
+            options={
+                'ordering': ['audio', 'hour'],
+            },
+        ),
+        migrations.AddIndex(
+            model_name='listenrollup',
+            index=models.Index(fields=['hour'], name='audio_liste_hour_6c4dec_idx'),
+        ),
+        migrations.AddConstraint(
+            model_name='listenrollup',
+            constraint=models.UniqueConstraint(fields=('audio', 'hour'), name='unique_listen_rollup'),
+        ),
+    ]
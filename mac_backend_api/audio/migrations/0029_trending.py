@@ -0,0 +1,33 @@
+# Generated by Django 3.0.7 on 2026-10-18 14:08
+
+from django.db import migrations, models
+import django.db.models.deletion
+import django.utils.timezone
+import mac_backend_api.utils.random_id.random_id
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('audio', '0028_listen_rollup'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='like',
+            name='created_at',
+            field=models.DateTimeField(db_index=True, default=django.utils.timezone.now, editable=False, help_text='The date and time the audio was liked'),
+        ),
+        migrations.CreateModel(
+            name='TrendingScore',
+            fields=[
+                ('id', models.CharField(default=mac_backend_api.utils.random_id.random_id.random_id, editable=False, help_text='The unique ID of the score', max_length=14, primary_key=True, serialize=False)),
+                ('score', models.FloatField(db_index=True, default=0, help_text="The decayed sum of the audio's listens and weighted likes, as of `computed_through`")),
+                ('computed_through', models.DateTimeField(help_text='The end of the last hour of listens and likes included in the score')),
+                ('audio', models.OneToOneField(help_text='A reference to the Audio instance', on_delete=django.db.models.deletion.CASCADE, related_name='trending_score', to='audio.Audio')),
+            ],
+            options={
+                'ordering': ['-score'],
+            },
+        ),
+    ]
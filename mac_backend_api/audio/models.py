@@ -15,18 +15,55 @@
 #  You should have received a copy of the GNU General Public License
 #  along with mac_backend_api.  If not, see <https://www.gnu.org/licenses/>.
 
+import fcntl
+import os
+
 from django.contrib.auth import get_user_model
-from django.core.exceptions import ObjectDoesNotExist
-from django.db import models
+from django.core.files import File
+from django.db import IntegrityError, models, transaction
+from django.db.models import F
 from django.urls import reverse
 from django.utils import timezone
 
-from mac_backend_api.audio.exceptions import UserAlreadyLikesException
+from mac_backend_api.audio.exceptions import UploadConflictException, UserAlreadyLikesException
+from mac_backend_api.audio.storage import stream_storage
 from mac_backend_api.utils.random_id.random_id import random_id
 
 User = get_user_model()
 
 
+def get_audio_source_upload_path(audio, filename) -> str:
+    """
+    Generates the file path to which an audio's original upload will be stored.
+
+    Sources with a known hash are stored by their content, so identical uploads share a single file.
+    :param audio:    The audio instance
+    :param filename: The name of the uploaded file, only its extension is kept
+    :return:         The path for the file upload
+    """
+    extension = os.path.splitext(filename)[1].lower()
+    if audio.source_hash:
+        return f"audio/sources/{audio.source_hash}{extension}"
+    return f"audio/{audio.id}/source{extension}"
+
+
+def set_metadata(instance, fields, metadata, save) -> None:
+    """
+    Store probed metadata on a model instance.
+    :param instance: The model instance.
+    :param fields:   A dictionary mapping metadata keys to field names.
+    :param metadata: A dictionary of metadata, values which are None are skipped.
+    :param save:     Save the changed fields.
+    """
+    changed = list()
+    for key, field in fields.items():
+        if metadata.get(key) is not None:
+            setattr(instance, field, metadata[key])
+            changed.append(field)
+    if save and changed:
+        instance.save(update_fields=changed)
+
+
 class Audio(models.Model):
     """
     Provides information storage for an uploaded audio.  The file information is stored on `Stream` objects.
@@ -66,6 +103,12 @@ class Audio(models.Model):
         editable=False,
         help_text="The number of times the audio has been played"
     )
+    like_count = models.IntegerField(
+        default=0,
+        db_index=True,
+        editable=False,
+        help_text="The number of people who have liked the audio, kept in step with its Like objects"
+    )
     uploaded_at = models.DateTimeField(
         default=timezone.now,
         editable=False,
@@ -76,17 +119,86 @@ class Audio(models.Model):
         help_text="Indicates if the audio should be shown on public indexes, "
                   "it can only be viewed by those with its link"
     )
+    source = models.FileField(
+        upload_to=get_audio_source_upload_path,
+        max_length=255,
+        blank=True,
+        editable=False,
+        help_text="The original uploaded file, the audio's streams are transcoded from it"
+    )
+    source_hash = models.CharField(
+        max_length=64,
+        blank=True,
+        db_index=True,
+        editable=False,
+        help_text="The SHA-256 hex digest of the source file"
+    )
+    duration = models.FloatField(
+        null=True,
+        blank=True,
+        db_index=True,
+        editable=False,
+        help_text="The length of the audio in seconds"
+    )
+    channels = models.PositiveSmallIntegerField(
+        null=True,
+        blank=True,
+        editable=False,
+        help_text="The number of channels in the source file"
+    )
+    source_bit_rate = models.IntegerField(
+        null=True,
+        blank=True,
+        editable=False,
+        help_text="The bit-rate of the source file in bits per second"
+    )
+    source_sample_rate = models.IntegerField(
+        null=True,
+        blank=True,
+        editable=False,
+        help_text="The sample-rate of the source file in hz"
+    )
+    source_size = models.BigIntegerField(
+        null=True,
+        blank=True,
+        editable=False,
+        help_text="The size of the source file in bytes"
+    )
+    loudness = models.FloatField(
+        null=True,
+        blank=True,
+        editable=False,
+        help_text="The integrated loudness of the source in LUFS, gated as in ITU-R BS.1770 but without K-weighting"
+    )
+    peak = models.FloatField(
+        null=True,
+        blank=True,
+        editable=False,
+        help_text="The highest sample of the source in dBFS"
+    )
+    rms = models.FloatField(
+        null=True,
+        blank=True,
+        editable=False,
+        help_text="The RMS level of the whole source in dBFS"
+    )
 
-    @property
-    def like_count(self) -> int:
-        """
-        A property referring to the number of people who have liked the audio.
-
-        `like_count` is calculated on-the-fly based on the number of Like objects with audio=self.
+    METADATA_FIELDS = {
+        "duration": "duration",
+        "channels": "channels",
+        "bit_rate": "source_bit_rate",
+        "sample_rate": "source_sample_rate",
+        "size": "source_size"
+    }
+    LOUDNESS_FIELDS = ("loudness", "peak", "rms")
 
-        :return: The number of people who have liked the audio
+    def set_metadata(self, metadata, save=True) -> None:
         """
-        return Like.objects.filter(audio=self).count()
+        Store probed information about the source file.  Values which are None do not replace known values.
+        :param metadata: A dictionary as returned by `probe_file`.
+        :param save:     Save the changed fields.  Default is True.
+        """
+        set_metadata(self, self.METADATA_FIELDS, metadata, save)
 
     def get_absolute_url(self) -> str:
         """
@@ -99,15 +211,22 @@ class Audio(models.Model):
     def add_listen(self) -> None:
         """
         A convenience method which adds 1 to the `listen_count`.
+
+        The listen is written to the database by the `listen_buffer` within `LISTEN_FLUSH_INTERVAL` seconds, only the
+        instance's value is updated immediately.
         """
+        # Imported here because the listens module depends on this one.
+        from mac_backend_api.audio.listens import listen_buffer
+
+        listen_buffer.add(self.id)
         self.listen_count += 1
-        self.save()
 
     def add_like(self, user) -> None:
         """
         Add a like to the audio for a given user.
 
-        If the user has already liked the audio, this method will fail silently.
+        If the user has already liked the audio, this method will fail silently.  `like_count` is incremented by
+        `Like.save`, call `refresh_from_db` to read it.
 
         :param  user: The user liking the audio
         """
@@ -121,24 +240,28 @@ class Audio(models.Model):
         """
         Remove a like from the audio for a given user.
 
-        If the user has not liked the audio already, this method will fail silently.
+        If the user has not liked the audio already, this method will fail silently.  `like_count` is decremented in the
+        same transaction, call `refresh_from_db` to read it.
 
         :param user: The user unliking the audio
         """
-        try:
-            self.like_set.get(user=user, audio=self).delete()
-        except ObjectDoesNotExist:
-            pass
+        with transaction.atomic():
+            deleted, _ = Like.objects.filter(user=user, audio=self).delete()
+            if deleted:
+                Audio.objects.filter(id=self.id).update(like_count=F("like_count") - deleted)
 
 
 def get_audio_stream_upload_path(stream, filename) -> str:
     """
-    Generates the file path to which an audio stream's file will be stored.
+    Generates the name of an audio stream's file.
+
+    The stream storage picks the real path from the file's contents and only keeps this name's extension, so identical
+    renditions share a single file.
     :param stream:   The audio stream instance
     :param filename: The name of the file (this value is ignored, but is necessary to be used as the upload_to value)
-    :return:         The path for the file upload
+    :return:         The name for the file upload
     """
-    return f"audio/{stream.audio.id}/{stream.id}.{stream.format}"
+    return f"{stream.id}.{stream.format}"
 
 
 class Stream(models.Model):
@@ -173,6 +296,13 @@ class Stream(models.Model):
         AVERAGE = 48000
         HIGH = 96000
 
+    class StreamStatus(models.TextChoices):
+        DEFERRED = "deferred"
+        PENDING = "pending"
+        PROCESSING = "processing"
+        READY = "ready"
+        FAILED = "failed"
+
     id = models.CharField(
         primary_key=True,
         max_length=14,
@@ -205,10 +335,94 @@ class Stream(models.Model):
         default=False,
         help_text="Indicates if file should offer a direct download link.",
     )
+    status = models.CharField(
+        max_length=10,
+        choices=StreamStatus.choices,
+        default=StreamStatus.READY,
+        editable=False,
+        help_text="The processing state of the stream, the file is only available once the stream is ready"
+    )
     file = models.FileField(
         upload_to=get_audio_stream_upload_path,
+        storage=stream_storage,
+        max_length=255,
+        db_index=True,
+        blank=True,
         help_text="The stream's audio file, it will be processed to match the format and bit_rate values"
     )
+    duration = models.FloatField(
+        null=True,
+        blank=True,
+        editable=False,
+        help_text="The length of the stream in seconds"
+    )
+    channels = models.PositiveSmallIntegerField(
+        null=True,
+        blank=True,
+        editable=False,
+        help_text="The number of channels in the stream's file"
+    )
+    actual_bit_rate = models.IntegerField(
+        null=True,
+        blank=True,
+        editable=False,
+        help_text="The bit-rate read from the stream's file in bits per second"
+    )
+    actual_sample_rate = models.IntegerField(
+        null=True,
+        blank=True,
+        editable=False,
+        help_text="The sample-rate read from the stream's file in hz"
+    )
+    size = models.BigIntegerField(
+        null=True,
+        blank=True,
+        editable=False,
+        help_text="The size of the stream's file in bytes"
+    )
+    rendered_at = models.DateTimeField(
+        null=True,
+        blank=True,
+        db_index=True,
+        editable=False,
+        help_text="The date and time the stream's file was last rendered, `retranscode` selects streams by it"
+    )
+
+    METADATA_FIELDS = {
+        "duration": "duration",
+        "channels": "channels",
+        "bit_rate": "actual_bit_rate",
+        "sample_rate": "actual_sample_rate",
+        "size": "size"
+    }
+
+    def set_metadata(self, metadata, save=True) -> None:
+        """
+        Store probed information about the stream's file.  Values which are None do not replace known values.
+        :param metadata: A dictionary as returned by `probe_file`.
+        :param save:     Save the changed fields.  Default is True.
+        """
+        set_metadata(self, self.METADATA_FIELDS, metadata, save)
+
+    def copy_metadata(self, stream) -> None:
+        """
+        Copy the probed information of another stream or CachedRendition rendering the same file, without saving.
+        :param stream: The Stream or CachedRendition to copy from.
+        """
+        for field in self.METADATA_FIELDS.values():
+            setattr(self, field, getattr(stream, field))
+
+    def copy_segments(self, stream) -> None:
+        """
+        Replace the stream's segments with references to the segment files of another stream or CachedRendition
+        rendering the same file.
+        :param stream: The Stream or CachedRendition to copy from.
+        """
+        self.segments.all().delete()
+        Segment.objects.bulk_create([
+            Segment(stream=self, index=segment.index, duration=segment.duration, file=segment.file.name)
+            for segment in stream.segments.all()
+        ])
 
     def get_absolute_url(self) -> str:
         """
@@ -228,12 +442,360 @@ class Stream(models.Model):
         return extension.lower() in [extension[0] for extension in Stream.AudioFormat.choices]
 
 
+def get_segment_upload_path(segment, filename) -> str:
+    """
+    Generates the name of a stream segment's file.
+
+    The stream storage picks the real path from the file's contents and only keeps this name's extension.
+    :param segment:  The segment instance
+    :param filename: The name of the file (this value is ignored, but is necessary to be used as the upload_to value)
+    :return:         The name for the file upload
+    """
+    return f"{segment.index}.{segment.stream.format}"
+
+
+class Segment(models.Model):
+    """
+    A fixed-length piece of a Stream, used to play the stream progressively through an HLS style playlist.
+    """
+
+    class Meta:
+        ordering = ["stream", "index"]
+        constraints = [
+            models.UniqueConstraint(fields=["stream", "index"], name="unique_segment_index"),
+        ]
+
+    id = models.CharField(
+        primary_key=True,
+        max_length=14,
+        default=random_id,
+        editable=False,
+        help_text="The unique ID of the segment"
+    )
+    stream = models.ForeignKey(
+        to=Stream,
+        on_delete=models.CASCADE,
+        related_name="segments",
+        help_text="A reference to the Stream instance"
+    )
+    index = models.PositiveIntegerField(
+        help_text="The position of the segment within the stream, starting at 0"
+    )
+    duration = models.FloatField(
+        help_text="The length of the segment in seconds"
+    )
+    file = models.FileField(
+        upload_to=get_segment_upload_path,
+        storage=stream_storage,
+        max_length=255,
+        db_index=True,
+        help_text="The segment's audio file"
+    )
+
+
+class CachedRendition(models.Model):
+    """
+    A rendered stream file and its segments, kept so the same rendition of the same source is never encoded twice.
+
+    Entries are keyed by the source's hash, the stream settings, and the encoder version, so changing the encoder
+    invalidates them.  They outlive the streams they were rendered for and are evicted least recently used first once
+    their total size exceeds `TRANSCODE_CACHE_MAX_SIZE`.  The files are shared with the streams using them.
+    """
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(fields=["source_hash", "format", "bit_rate", "sample_rate", "encoder_version"],
+                                    name="unique_cached_rendition"),
+        ]
+
+    id = models.CharField(
+        primary_key=True,
+        max_length=14,
+        default=random_id,
+        editable=False,
+        help_text="The unique ID of the cached rendition"
+    )
+    source_hash = models.CharField(
+        max_length=64,
+        help_text="The SHA-256 hex digest of the source the rendition was encoded from"
+    )
+    format = models.CharField(
+        max_length=10,
+        choices=Stream.AudioFormat.choices,
+        help_text="The format of the rendition"
+    )
+    bit_rate = models.IntegerField(
+        choices=Stream.AudioBitRate.choices,
+        help_text="The bit-rate the rendition was encoded with"
+    )
+    sample_rate = models.IntegerField(
+        choices=Stream.AudioSampleRate.choices,
+        help_text="The sample-rate the rendition was encoded with"
+    )
+    encoder_version = models.CharField(
+        max_length=32,
+        help_text="The version of the encoder which rendered the file"
+    )
+    file = models.FileField(
+        storage=stream_storage,
+        max_length=255,
+        db_index=True,
+        help_text="The rendered file"
+    )
+    duration = models.FloatField(
+        null=True,
+        blank=True,
+        help_text="The length of the rendition in seconds"
+    )
+    channels = models.PositiveSmallIntegerField(
+        null=True,
+        blank=True,
+        help_text="The number of channels in the rendered file"
+    )
+    actual_bit_rate = models.IntegerField(
+        null=True,
+        blank=True,
+        help_text="The bit-rate read from the rendered file in bits per second"
+    )
+    actual_sample_rate = models.IntegerField(
+        null=True,
+        blank=True,
+        help_text="The sample-rate read from the rendered file in hz"
+    )
+    size = models.BigIntegerField(
+        null=True,
+        blank=True,
+        help_text="The size of the rendered file in bytes"
+    )
+    total_size = models.BigIntegerField(
+        default=0,
+        help_text="The size of the file and its segments in bytes, counted against the cache's budget"
+    )
+    created_at = models.DateTimeField(
+        default=timezone.now,
+        editable=False,
+        help_text="The date and time the rendition was cached"
+    )
+    last_used_at = models.DateTimeField(
+        default=timezone.now,
+        db_index=True,
+        help_text="The date and time the rendition was last cached or reused"
+    )
+
+    METADATA_FIELDS = Stream.METADATA_FIELDS
+
+
+class CachedSegment(models.Model):
+    """
+    A segment of a CachedRendition.
+    """
+
+    class Meta:
+        ordering = ["rendition", "index"]
+
+    id = models.CharField(
+        primary_key=True,
+        max_length=14,
+        default=random_id,
+        editable=False,
+        help_text="The unique ID of the cached segment"
+    )
+    rendition = models.ForeignKey(
+        to=CachedRendition,
+        on_delete=models.CASCADE,
+        related_name="segments",
+        help_text="A reference to the CachedRendition instance"
+    )
+    index = models.PositiveIntegerField(
+        help_text="The position of the segment within the rendition, starting at 0"
+    )
+    duration = models.FloatField(
+        help_text="The length of the segment in seconds"
+    )
+    file = models.FileField(
+        storage=stream_storage,
+        max_length=255,
+        db_index=True,
+        help_text="The segment's audio file"
+    )
+
+
+def get_waveform_upload_path(waveform, filename) -> str:
+    """
+    Generates the file path to which a waveform will be stored, alongside the streams of the same source.
+    :param waveform: The waveform instance
+    :param filename: The name of the file (this value is ignored, but is necessary to be used as the upload_to value)
+    :return:         The path for the file upload
+    """
+    source_hash = waveform.audio.source_hash
+    if source_hash:
+        return f"audio/streams/{source_hash}/waveform-{waveform.samples_per_pixel}.dat"
+    return f"audio/{waveform.audio.id}/waveform-{waveform.samples_per_pixel}.dat"
+
+
+class Waveform(models.Model):
+    """
+    Precomputed min/max peaks of an Audio's source at one resolution, stored in the audiowaveform "dat" format.
+    """
+
+    class Meta:
+        ordering = ["samples_per_pixel"]
+        constraints = [
+            models.UniqueConstraint(fields=["audio", "samples_per_pixel"], name="unique_waveform_resolution"),
+        ]
+
+    id = models.CharField(
+        primary_key=True,
+        max_length=14,
+        default=random_id,
+        editable=False,
+        help_text="The unique ID of the waveform"
+    )
+    audio = models.ForeignKey(
+        to=Audio,
+        on_delete=models.CASCADE,
+        related_name="waveforms",
+        help_text="A reference to the Audio instance"
+    )
+    samples_per_pixel = models.PositiveIntegerField(
+        help_text="The number of samples each pair of peaks covers"
+    )
+    file = models.FileField(
+        upload_to=get_waveform_upload_path,
+        max_length=255,
+        help_text="The encoded peaks"
+    )
+
+
+class SkippedRendition(models.Model):
+    """
+    A stream preset which was not rendered for an Audio because its source could not fill it, and the reason why.
+    """
+
+    class Meta:
+        ordering = ["-sample_rate", "-bit_rate"]
+
+    id = models.CharField(
+        primary_key=True,
+        max_length=14,
+        default=random_id,
+        editable=False,
+        help_text="The unique ID of the skipped rendition"
+    )
+    audio = models.ForeignKey(
+        to=Audio,
+        on_delete=models.CASCADE,
+        related_name="skipped_renditions",
+        help_text="A reference to the Audio instance"
+    )
+    format = models.CharField(
+        max_length=10,
+        choices=Stream.AudioFormat.choices,
+        help_text="The format of the skipped preset"
+    )
+    bit_rate = models.IntegerField(
+        choices=Stream.AudioBitRate.choices,
+        help_text="The bit-rate of the skipped preset"
+    )
+    sample_rate = models.IntegerField(
+        choices=Stream.AudioSampleRate.choices,
+        help_text="The sample-rate of the skipped preset"
+    )
+    reason = models.CharField(
+        max_length=255,
+        help_text="Why the preset was not rendered"
+    )
+
+
+class TranscodeJob(models.Model):
+    """
+    A queued request to render a `Stream`'s file from its Audio's source.
+
+    Jobs are stored in the database so the queue survives restarts and can be shared by any number of
+    `transcode_worker` processes.  Workers claim jobs by priority, then in the order they were created.
+    """
+
+    class Meta:
+        ordering = ["priority", "created_at"]
+        indexes = [
+            models.Index(fields=["status", "priority", "created_at"]),
+        ]
+
+    class JobStatus(models.TextChoices):
+        QUEUED = "queued"
+        RUNNING = "running"
+        DONE = "done"
+        FAILED = "failed"
+
+    class JobPriority(models.IntegerChoices):
+        INTERACTIVE = 0
+        BULK = 10
+
+    id = models.CharField(
+        primary_key=True,
+        max_length=14,
+        default=random_id,
+        editable=False,
+        help_text="The unique ID of the job"
+    )
+    stream = models.ForeignKey(
+        to=Stream,
+        on_delete=models.CASCADE,
+        related_name="transcode_jobs",
+        help_text="A reference to the Stream to render"
+    )
+    status = models.CharField(
+        max_length=10,
+        choices=JobStatus.choices,
+        default=JobStatus.QUEUED,
+        help_text="The state of the job"
+    )
+    priority = models.PositiveSmallIntegerField(
+        choices=JobPriority.choices,
+        default=JobPriority.INTERACTIVE,
+        help_text="Jobs with a lower priority value are claimed first, uploads are interactive and re-encodes are bulk"
+    )
+    is_rerender = models.BooleanField(
+        default=False,
+        help_text="The stream keeps serving its current file while the job runs, and if it fails"
+    )
+    attempts = models.PositiveSmallIntegerField(
+        default=0,
+        help_text="The number of times a worker has claimed the job"
+    )
+    error = models.TextField(
+        blank=True,
+        help_text="The error raised by the last failed attempt, if any"
+    )
+    created_at = models.DateTimeField(
+        default=timezone.now,
+        editable=False,
+        help_text="The date and time the job was queued"
+    )
+    started_at = models.DateTimeField(
+        null=True,
+        blank=True,
+        help_text="The date and time the last attempt started"
+    )
+    finished_at = models.DateTimeField(
+        null=True,
+        blank=True,
+        help_text="The date and time the job finished or failed for good"
+    )
+
+
 class Like(models.Model):
     """
     Represents a like (or up-vote.)
 
     Unlike views, likes must be from a registered user, and each user is allowed to create 1 like per audio.
     """
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(fields=["user", "audio"], name="unique_like"),
+        ]
+
     id = models.CharField(
         primary_key=True,
         max_length=14,
@@ -252,15 +814,295 @@ class Like(models.Model):
         on_delete=models.CASCADE,
         help_text="A reference to the Audio instance"
     )
+    created_at = models.DateTimeField(
+        default=timezone.now,
+        db_index=True,
+        editable=False,
+        help_text="The date and time the audio was liked"
+    )
 
     def save(self, force_insert=False, force_update=False, using=None, update_fields=None) -> None:
-        if self.__is_new_like(self):
-            super().save(force_insert, force_update, using, update_fields)
-        else:
+        """
+        Save the like, adding it to its audio's `like_count` in the same transaction when it is new.
+
+        Uniqueness is enforced by the `unique_like` constraint, so a new like is a single INSERT and concurrent likes
+        cannot both succeed.
+        """
+        adding = self._state.adding
+        try:
+            with transaction.atomic():
+                super().save(force_insert, force_update, using, update_fields)
+                if adding:
+                    Audio.objects.filter(id=self.audio_id).update(like_count=F("like_count") + 1)
+        except IntegrityError:
             raise UserAlreadyLikesException()
 
-    @classmethod
-    def __is_new_like(cls, like) -> bool:
-        return len(cls.objects.filter(user=like.user, audio=like.audio)) == 0
+    def delete(self, using=None, keep_parents=False):
+        """
+        Delete the like, removing it from its audio's `like_count` in the same transaction.  A like which was already
+        deleted is not counted again.
+        """
+        with transaction.atomic():
+            deleted = super().delete(using, keep_parents)
+            if deleted[0]:
+                Audio.objects.filter(id=self.audio_id).update(like_count=F("like_count") - deleted[0])
+        return deleted
+
 
+def get_upload_session_path(session, filename) -> str:
+    """
+    Generates the file path to which an upload session's data will be written.
+    :param session:  The upload session instance
+    :param filename: The name of the file (this value is ignored, but is necessary to be used as the upload_to value)
+    :return:         The path for the partial upload
+    """
+    return f"uploads/{session.id}.part"
+
+
+class UploadSessionFile(File):
+    """
+    A finished upload session's data presented as a temporary upload, so storages move it into place instead of copying
+    it.
+    """
+
+    def temporary_file_path(self) -> str:
+        return self.file.name
+
+
+class UploadSession(models.Model):
+    """
+    A resumable upload of a single audio file.
+
+    The file is sent as a series of byte ranges which are written straight to disk.  An interrupted upload can be
+    resumed from `received`, and once every byte has arrived the session is finalized into an `Audio`.
+    """
+    CHUNK_SIZE = 64 * 1024
 
+    id = models.CharField(
+        primary_key=True,
+        max_length=14,
+        default=random_id,
+        editable=False,
+        help_text="The unique ID of the upload session"
+    )
+    user = models.ForeignKey(
+        to=User,
+        on_delete=models.CASCADE,
+        related_name="upload_sessions",
+        help_text="A reference to the User uploading the file"
+    )
+    title = models.CharField(
+        max_length=100,
+        help_text="Title of the audio to create"
+    )
+    description = models.TextField(
+        max_length=2000,
+        blank=True,
+        help_text="A short description for the audio to create"
+    )
+    is_public = models.BooleanField(
+        default=False,
+        help_text="Indicates if the audio to create should be shown on public indexes"
+    )
+    filename = models.CharField(
+        max_length=255,
+        help_text="The name of the file being uploaded"
+    )
+    size = models.BigIntegerField(
+        help_text="The total size of the file in bytes"
+    )
+    received = models.BigIntegerField(
+        default=0,
+        editable=False,
+        help_text="The number of bytes received so far, the next chunk must start at this offset"
+    )
+    file = models.FileField(
+        upload_to=get_upload_session_path,
+        editable=False,
+        help_text="The partially uploaded file"
+    )
+    audio = models.OneToOneField(
+        to=Audio,
+        null=True,
+        blank=True,
+        editable=False,
+        on_delete=models.SET_NULL,
+        help_text="A reference to the Audio created when the session was finalized"
+    )
+    created_at = models.DateTimeField(
+        default=timezone.now,
+        editable=False,
+        help_text="The date and time the upload started"
+    )
+    updated_at = models.DateTimeField(
+        auto_now=True,
+        help_text="The date and time a chunk was last received"
+    )
+
+    @property
+    def is_complete(self) -> bool:
+        """
+        A property which is True once every byte of the file has been received.
+
+        :return: True if the upload is complete
+        """
+        return self.received >= self.size
+
+    def write_chunk(self, stream, start, length=None) -> int:
+        """
+        Append data from a stream to the partial file, reading it in `CHUNK_SIZE` pieces.
+
+        Data before `received` was already stored by an earlier request and is skipped, so a client may safely resend
+        a chunk it is unsure about.  Anything after `length` bytes, or after `size`, is neither read nor written.
+
+        No database transaction is held while the body is read, the partial file is locked instead so concurrent chunks
+        of the same upload cannot interleave.  `received` is then advanced only if it has not changed since it was read.
+        :param stream: A file-like object containing the chunk.
+        :param start:  The offset of the chunk's first byte within the file.
+        :param length: The length of the chunk in bytes.  Default is None, which reads up to the end of the file.
+        :raises UploadConflictException: If another chunk is being written, or was written since the session was read.
+        :return:       The number of new bytes written.
+        """
+        end = self.size if length is None else min(start + length, self.size)
+        position = start
+        written = 0
+        with open(self.file.path, "r+b") as partial:
+            try:
+                fcntl.flock(partial, fcntl.LOCK_EX | fcntl.LOCK_NB)
+            except BlockingIOError:
+                raise UploadConflictException()
+            received = UploadSession.objects.values_list("received", flat=True).get(id=self.id)
+            if received != self.received:
+                raise UploadConflictException()
+            partial.seek(self.received)
+            while position < end:
+                data = stream.read(min(self.CHUNK_SIZE, end - position))
+                if not data:
+                    break
+                new = data[max(self.received + written - position, 0):]
+                partial.write(new)
+                written += len(new)
+                position += len(data)
+            partial.truncate()
+            self.updated_at = timezone.now()
+            updated = UploadSession.objects.filter(id=self.id, received=self.received).update(
+                received=F("received") + written,
+                updated_at=self.updated_at
+            )
+            if not updated:
+                raise UploadConflictException()
+        self.received += written
+        return written
+
+    def as_upload(self) -> UploadSessionFile:
+        """
+        Open the completed file as an uploaded file named after the original.
+        :return: The file, it should be closed by the caller.
+        """
+        return UploadSessionFile(open(self.file.path, "rb"), name=self.filename)
+
+
+class ImportedFile(models.Model):
+    """
+    Records a file imported by the `import_audio` management command.
+
+    Rows are inserted in the same transaction as the Audio they created, so an interrupted import can resume by skipping
+    every file which has a record.
+    """
+    id = models.CharField(
+        primary_key=True,
+        max_length=14,
+        default=random_id,
+        editable=False,
+        help_text="The unique ID of the imported file"
+    )
+    path = models.TextField(
+        help_text="The absolute path the file was imported from"
+    )
+    path_hash = models.CharField(
+        max_length=64,
+        unique=True,
+        help_text="The SHA-256 hex digest of the path, paths may be too long to index directly"
+    )
+    audio = models.ForeignKey(
+        to=Audio,
+        null=True,
+        blank=True,
+        on_delete=models.SET_NULL,
+        help_text="A reference to the Audio created from the file, deleting it does not import the file again"
+    )
+    imported_at = models.DateTimeField(
+        default=timezone.now,
+        editable=False,
+        help_text="The date and time the file was imported"
+    )
+
+
+class ListenRollup(models.Model):
+    """
+    The number of times an audio was played within an hour, analytics are read from these rows instead of raw events.
+    """
+
+    class Meta:
+        ordering = ["audio", "hour"]
+        constraints = [
+            models.UniqueConstraint(fields=["audio", "hour"], name="unique_listen_rollup"),
+        ]
+        indexes = [
+            models.Index(fields=["hour"]),
+        ]
+
+    id = models.CharField(
+        primary_key=True,
+        max_length=14,
+        default=random_id,
+        editable=False,
+        help_text="The unique ID of the rollup"
+    )
+    audio = models.ForeignKey(
+        to=Audio,
+        on_delete=models.CASCADE,
+        related_name="listen_rollups",
+        help_text="A reference to the Audio instance"
+    )
+    hour = models.DateTimeField(
+        help_text="The start of the hour the listens were counted in"
+    )
+    count = models.PositiveIntegerField(
+        default=0,
+        help_text="The number of listens within the hour"
+    )
+
+
+class TrendingScore(models.Model):
+    """
+    The materialized trending score of a public Audio, combining its recent listens and likes with exponential decay.
+
+    Scores are recomputed by the `update_trending` management command, reading the trending feed is a scan of the
+    `score` index.
+    """
+
+    class Meta:
+        ordering = ["-score"]
+
+    id = models.CharField(
+        primary_key=True,
+        max_length=14,
+        default=random_id,
+        editable=False,
+        help_text="The unique ID of the score"
+    )
+    audio = models.OneToOneField(
+        to=Audio,
+        on_delete=models.CASCADE,
+        related_name="trending_score",
+        help_text="A reference to the Audio instance"
+    )
+    score = models.FloatField(
+        default=0,
+        db_index=True,
+        help_text="The decayed sum of the audio's listens and weighted likes, as of `computed_through`"
+    )
+    computed_through = models.DateTimeField(
+        help_text="The end of the last hour of listens and likes included in the score"
+    )
@@ -51,3 +51,12 @@ class IsOwnerOrReadOnly(BasePermission):
         except Exception:
             is_owner = False
         return is_owner
+
+
+class CanAddAudio(BasePermission):
+    """
+    Allows access to users with the "add_audio" permission, for views creating Audio without the Audio model's viewset.
+    """
+
+    def has_permission(self, request, view):
+        return request.user.has_perm("audio.add_audio")
@@ -0,0 +1,64 @@
+#  Copyright (C) 2020  Mind Audio Central
+#
+#  This file is part of mac_backend_api.
+#
+#  mac_backend_api is free software: you can redistribute it and/or modify
+#  it under the terms of the GNU General Public License as published by
+#  the Free Software Foundation, either version 3 of the License, or
+#  (at your option) any later version.
+#
+#  mac_backend_api is distributed in the hope that it will be useful,
+#  but WITHOUT ANY WARRANTY; without even the implied warranty of
+#  MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+#  GNU General Public License for more details.
+#
+#  You should have received a copy of the GNU General Public License
+#  along with mac_backend_api.  If not, see <https://www.gnu.org/licenses/>.
+
+import math
+
+PLAYLIST_CONTENT_TYPE = "application/vnd.apple.mpegurl"
+
+CODECS = {
+    "mp3": "mp4a.40.34",
+    "aac": "mp4a.40.2",
+}
+
+
+def render_master_playlist(streams, get_url) -> str:
+    """
+    Render an HLS master playlist listing one variant per stream.
+    :param streams: The Stream instances to list, each must have segments.
+    :param get_url: A function returning the variant playlist URL of a stream.
+    :return:        The playlist.
+    """
+    lines = ["#EXTM3U", "#EXT-X-VERSION:3"]
+    for stream in streams:
+        attributes = [f"BANDWIDTH={stream.actual_bit_rate or stream.bit_rate}"]
+        if stream.format in CODECS:
+            attributes.append(f'CODECS="{CODECS[stream.format]}"')
+        lines.append(f"#EXT-X-STREAM-INF:{','.join(attributes)}")
+        lines.append(get_url(stream))
+    return "\n".join(lines) + "\n"
+
+
+def render_variant_playlist(segments, get_url) -> str:
+    """
+    Render an HLS media playlist of a stream's segments.
+    :param segments: The stream's Segment instances, in order.
+    :param get_url:  A function returning the URL a segment is served from.
+    :return:         The playlist.
+    """
+    target_duration = math.ceil(max((segment.duration for segment in segments), default=0))
+    lines = [
+        "#EXTM3U",
+        "#EXT-X-VERSION:3",
+        f"#EXT-X-TARGETDURATION:{target_duration}",
+        "#EXT-X-MEDIA-SEQUENCE:0",
+        "#EXT-X-PLAYLIST-TYPE:VOD",
+    ]
+    for segment in segments:
+        lines.append(f"#EXTINF:{segment.duration:.3f},")
+        lines.append(get_url(segment))
+    lines.append("#EXT-X-ENDLIST")
+    return "\n".join(lines) + "\n"
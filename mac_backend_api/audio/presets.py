@@ -0,0 +1,81 @@
+#  Copyright (C) 2020  Mind Audio Central
+#
+#  This file is part of mac_backend_api.
+#
+#  mac_backend_api is free software: you can redistribute it and/or modify
+#  it under the terms of the GNU General Public License as published by
+#  the Free Software Foundation, either version 3 of the License, or
+#  (at your option) any later version.
+#
+#  mac_backend_api is distributed in the hope that it will be useful,
+#  but WITHOUT ANY WARRANTY; without even the implied warranty of
+#  MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+#  GNU General Public License for more details.
+#
+#  You should have received a copy of the GNU General Public License
+#  along with mac_backend_api.  If not, see <https://www.gnu.org/licenses/>.
+
+from mac_backend_api.audio.models import Stream
+
+
+def fit_to_source(value, source_value, choices) -> int:
+    """
+    Lower a setting to the highest choice which does not exceed the source's value.
+    :param value:        The preset's value.
+    :param source_value: The source's value, or None if it is unknown.
+    :param choices:      The values a stream may use.
+    :return:             The value to render, the lowest choice if every choice exceeds the source.
+    """
+    if source_value is None or value <= source_value:
+        return value
+    fitting = [choice for choice in choices if choice <= source_value]
+    return max(fitting) if fitting else min(choices)
+
+
+def describe_excess(preset, audio) -> str:
+    """
+    Describe how a preset exceeds an Audio's source.
+    :param preset: A dictionary containing the 'sample_rate' and 'bit_rate' of the preset.
+    :param audio:  The Audio instance.
+    :return:       A phrase such as "upsample the 44100 Hz source to 96000 Hz".
+    """
+    excess = list()
+    if audio.source_sample_rate is not None and preset["sample_rate"] > audio.source_sample_rate:
+        excess.append(f"upsample the {audio.source_sample_rate} Hz source to {preset['sample_rate']} Hz")
+    if audio.source_bit_rate is not None and preset["bit_rate"] > audio.source_bit_rate:
+        excess.append(f"inflate the {audio.source_bit_rate} bps source to {preset['bit_rate']} bps")
+    return " and ".join(excess)
+
+
+def plan_renditions(audio, presets) -> tuple:
+    """
+    Fit stream presets to an Audio's probed source so no rendition upsamples it or inflates its bit rate.
+
+    Presets the source can fill are rendered as they are.  Presets exceeding the source are lowered to the best
+    settings the source can fill, and a lowered preset which duplicates another rendition is skipped, so a preset
+    which fits exactly always wins over one lowered onto it.  Sources without probed metadata render every preset.
+    :param audio:   The Audio instance, its source metadata must already be set.
+    :param presets: A list of dictionaries containing the 'format', 'sample_rate', and 'bit_rate' of the streams.
+    :return:        A tuple of the list of presets to render, and a list of (preset, reason) tuples for the skipped
+                    presets.
+    """
+    sample_rates = [choice for choice, _ in Stream.AudioSampleRate.choices]
+    bit_rates = [choice for choice, _ in Stream.AudioBitRate.choices]
+    fitted = [
+        (preset, dict(
+            preset,
+            sample_rate=fit_to_source(preset["sample_rate"], audio.source_sample_rate, sample_rates),
+            bit_rate=fit_to_source(preset["bit_rate"], audio.source_bit_rate, bit_rates),
+        ))
+        for preset in presets
+    ]
+    exact = [lowered for preset, lowered in fitted if lowered == preset]
+    planned, skipped = [], []
+    for preset, lowered in fitted:
+        if lowered in planned or (lowered != preset and lowered in exact):
+            reason = describe_excess(preset, audio) or "duplicate the preset"
+            skipped.append((preset, f"Would {reason}, merged into the {lowered['sample_rate']} Hz "
+                                    f"{lowered['bit_rate']} bps rendition"))
+        else:
+            planned.append(lowered)
+    return planned, skipped
@@ -0,0 +1,60 @@
+#  Copyright (C) 2020  Mind Audio Central
+#
+#  This file is part of mac_backend_api.
+#
+#  mac_backend_api is free software: you can redistribute it and/or modify
+#  it under the terms of the GNU General Public License as published by
+#  the Free Software Foundation, either version 3 of the License, or
+#  (at your option) any later version.
+#
+#  mac_backend_api is distributed in the hope that it will be useful,
+#  but WITHOUT ANY WARRANTY; without even the implied warranty of
+#  MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+#  GNU General Public License for more details.
+#
+#  You should have received a copy of the GNU General Public License
+#  along with mac_backend_api.  If not, see <https://www.gnu.org/licenses/>.
+
+import os
+
+import audio_metadata
+
+PROBED_FIELDS = ("duration", "channels", "bit_rate", "sample_rate", "size")
+
+
+def probe_file(path) -> dict:
+    """
+    Read an audio file's stream information from its headers, without decoding it.
+    :param path: The path of the file to probe.
+    :return:     A dictionary containing the 'duration' in seconds, 'channels', 'bit_rate', 'sample_rate', and 'size' in
+                 bytes of the file.  Values which could not be read are None.
+    """
+    metadata = dict.fromkeys(PROBED_FIELDS)
+    metadata["size"] = os.path.getsize(path)
+    try:
+        info = audio_metadata.load(path).streaminfo
+    except Exception:
+        # Formats audio-metadata cannot parse are still valid sources, they are left without metadata.
+        return metadata
+    for field, attribute, cast in (("duration", "duration", float), ("channels", "channels", int),
+                                   ("bit_rate", "bitrate", int), ("sample_rate", "sample_rate", int)):
+        value = getattr(info, attribute, None)
+        if value is not None:
+            metadata[field] = cast(value)
+    return metadata
+
+
+def pcm_metadata(pcm_path, parameters) -> dict:
+    """
+    Describe a PCM file written by `decode_to_pcm`.
+    :param pcm_path:   The path of the PCM file.
+    :param parameters: The parameters returned by `decode_to_pcm`.
+    :return:           A dictionary containing the 'duration', 'channels', and 'sample_rate' of the decoded audio.
+    """
+    frame_width = parameters["sample_width"] * parameters["channels"]
+    frames = os.path.getsize(pcm_path) // frame_width
+    return {
+        "duration": frames / parameters["frame_rate"],
+        "channels": parameters["channels"],
+        "sample_rate": parameters["frame_rate"]
+    }
@@ -0,0 +1,157 @@
+#  Copyright (C) 2020  Mind Audio Central
+#
+#  This file is part of mac_backend_api.
+#
+#  mac_backend_api is free software: you can redistribute it and/or modify
+#  it under the terms of the GNU General Public License as published by
+#  the Free Software Foundation, either version 3 of the License, or
+#  (at your option) any later version.
+#
+#  mac_backend_api is distributed in the hope that it will be useful,
+#  but WITHOUT ANY WARRANTY; without even the implied warranty of
+#  MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+#  GNU General Public License for more details.
+#
+#  You should have received a copy of the GNU General Public License
+#  along with mac_backend_api.  If not, see <https://www.gnu.org/licenses/>.
+
+import hashlib
+import os
+import tempfile
+import threading
+
+from django.conf import settings
+from django.core.files.storage import FileSystemStorage
+from django.utils.deconstruct import deconstructible
+
+
+@deconstructible
+class ShardedContentStorage(FileSystemStorage):
+    """
+    Stores files by the SHA-256 of their contents, in directories sharded by the digest's leading characters.
+
+    The name passed to `save` only contributes its extension: a file whose digest is "abcd12..." is stored as
+    "<STREAM_STORAGE_PREFIX>/ab/cd/abcd12....ogg".  Two levels of 256 directories keep every directory small however
+    many files are stored, and identical files are only stored once.
+
+    Files are written to a temporary file which is renamed into place, so readers never see a partially written file.
+    `STREAM_STORAGE_FSYNC` controls durability: True fsyncs every file as it is written, "batch" defers the fsyncs until
+    `sync` is called or `STREAM_STORAGE_FSYNC_BATCH_SIZE` files are pending, and False leaves flushing to the operating
+    system.
+    """
+    SHARD_DEPTH = 2
+    SHARD_WIDTH = 2
+
+    def __init__(self, prefix=None, fsync=None, fsync_batch_size=None, **kwargs):
+        super().__init__(**kwargs)
+        self._prefix = prefix
+        self._fsync = fsync
+        self._fsync_batch_size = fsync_batch_size
+        self.pending = []
+        self.pending_lock = threading.Lock()
+
+    @property
+    def prefix(self) -> str:
+        return self._value_or_setting(self._prefix, settings.STREAM_STORAGE_PREFIX)
+
+    @property
+    def fsync(self):
+        return self._value_or_setting(self._fsync, settings.STREAM_STORAGE_FSYNC)
+
+    @property
+    def fsync_batch_size(self) -> int:
+        return self._value_or_setting(self._fsync_batch_size, settings.STREAM_STORAGE_FSYNC_BATCH_SIZE)
+
+    def get_content_name(self, digest, extension) -> str:
+        """
+        Get the name under which a file with the given digest is stored.
+        :param digest:    The hex digest of the file's contents.
+        :param extension: The file's extension, including the leading dot.
+        :return:          The name of the file.
+        """
+        shards = [digest[i * self.SHARD_WIDTH:(i + 1) * self.SHARD_WIDTH] for i in range(self.SHARD_DEPTH)]
+        return "/".join([self.prefix, *shards, digest + extension.lower()])
+
+    def get_available_name(self, name, max_length=None) -> str:
+        # The final name depends on the content, an existing file with the same name has the same contents.
+        return name
+
+    def _save(self, name, content) -> str:
+        temporary_directory = self.path(f"{self.prefix}/tmp")
+        os.makedirs(temporary_directory, exist_ok=True)
+        file_descriptor, temporary_path = tempfile.mkstemp(dir=temporary_directory)
+        try:
+            sha256 = hashlib.sha256()
+            with os.fdopen(file_descriptor, "wb") as temporary_file:
+                for chunk in content.chunks():
+                    sha256.update(chunk)
+                    temporary_file.write(chunk)
+                if self.fsync is True:
+                    temporary_file.flush()
+                    os.fsync(temporary_file.fileno())
+            name = self.get_content_name(sha256.hexdigest(), os.path.splitext(name)[1])
+            full_path = self.path(name)
+            os.makedirs(os.path.dirname(full_path), exist_ok=True)
+            # A file of the wrong size under this name can only be left by a crash before it was synced.
+            if os.path.exists(full_path) and os.path.getsize(full_path) == os.path.getsize(temporary_path):
+                os.remove(temporary_path)
+                return name
+            if self.file_permissions_mode is not None:
+                os.chmod(temporary_path, self.file_permissions_mode)
+            os.replace(temporary_path, full_path)
+        except BaseException:
+            if os.path.exists(temporary_path):
+                os.remove(temporary_path)
+            raise
+        if self.fsync is True:
+            sync_directory(os.path.dirname(full_path))
+        elif self.fsync == "batch":
+            self.defer_sync(full_path)
+        return name
+
+    def defer_sync(self, path) -> None:
+        """
+        Queue a written file to be synced, syncing the queue once it reaches `fsync_batch_size` files.
+        :param path: The absolute path of the file.
+        """
+        with self.pending_lock:
+            self.pending.append(path)
+            full = len(self.pending) >= self.fsync_batch_size
+        if full:
+            self.sync()
+
+    def sync(self) -> None:
+        """
+        Flush every file written since the last sync, and the directories they were renamed into, to disk.
+
+        Syncing a batch lets the operating system write the files back concurrently, and syncs each directory once
+        however many files were added to it.
+        """
+        with self.pending_lock:
+            paths, self.pending = self.pending, []
+        for path in paths:
+            file_descriptor = os.open(path, os.O_RDONLY)
+            try:
+                os.fsync(file_descriptor)
+            finally:
+                os.close(file_descriptor)
+        for directory in sorted({os.path.dirname(path) for path in paths}):
+            sync_directory(directory)
+
+
+def sync_directory(path) -> None:
+    """
+    fsync a directory so the files renamed into it survive a crash.  Does nothing where directories cannot be opened.
+    :param path: The directory's path.
+    """
+    try:
+        file_descriptor = os.open(path, os.O_RDONLY)
+    except OSError:
+        return
+    try:
+        os.fsync(file_descriptor)
+    finally:
+        os.close(file_descriptor)
+
+
+stream_storage = ShardedContentStorage()
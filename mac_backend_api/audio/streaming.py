@@ -0,0 +1,204 @@
+#  Copyright (C) 2020  Mind Audio Central
+#
+#  This file is part of mac_backend_api.
+#
+#  mac_backend_api is free software: you can redistribute it and/or modify
+#  it under the terms of the GNU General Public License as published by
+#  the Free Software Foundation, either version 3 of the License, or
+#  (at your option) any later version.
+#
+#  mac_backend_api is distributed in the hope that it will be useful,
+#  but WITHOUT ANY WARRANTY; without even the implied warranty of
+#  MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+#  GNU General Public License for more details.
+#
+#  You should have received a copy of the GNU General Public License
+#  along with mac_backend_api.  If not, see <https://www.gnu.org/licenses/>.
+
+import re
+from urllib.parse import quote
+
+from django.conf import settings
+from django.core.exceptions import ImproperlyConfigured
+from django.http import FileResponse, HttpResponse
+from django.utils.cache import get_conditional_response
+from django.utils.http import http_date, parse_http_date_safe, quote_etag
+
+CONTENT_TYPES = {
+    "mp3": "audio/mpeg",
+    "aac": "audio/aac",
+    "ogg": "audio/ogg",
+    "wav": "audio/wav",
+}
+
+OFFLOAD_HEADERS = {
+    "x-accel-redirect": "X-Accel-Redirect",
+    "x-sendfile": "X-Sendfile",
+}
+
+RANGE_PATTERN = re.compile(r"^bytes=(?P<start>\d*)-(?P<end>\d*)$")
+
+
+class RangeFile:
+    """
+    A read-only view of a byte range of an open file.
+
+    The underlying file is positioned at the start of the range and its `fileno` is exposed, so WSGI servers which
+    implement `wsgi.file_wrapper` with sendfile() can send the range without copying it through Python.  Other servers
+    read the range through `read`, which never returns bytes past its end.
+    """
+
+    def __init__(self, file, start, length):
+        self.file = file
+        self.remaining = length
+        self.file.seek(start)
+
+    def read(self, size=-1) -> bytes:
+        if size < 0 or size > self.remaining:
+            size = self.remaining
+        data = self.file.read(size)
+        self.remaining -= len(data)
+        return data
+
+    def fileno(self) -> int:
+        return self.file.fileno()
+
+    def close(self) -> None:
+        self.file.close()
+
+
+def parse_range(header, size):
+    """
+    Parse a single range `Range` header.
+
+    Headers requesting several ranges are not supported and are ignored, as RFC 7233 allows.
+    :param header: The value of the Range header, or None.
+    :param size:   The size of the file in bytes.
+    :return:       A tuple of the range's (start, end) offsets, inclusive.  None if the whole file should be sent, or
+                   False if the range cannot be satisfied.
+    """
+    match = RANGE_PATTERN.match(header or "")
+    if match is None:
+        return None
+    start, end = match.group("start"), match.group("end")
+    if not start and not end:
+        return None
+    if not start:
+        suffix = int(end)
+        if suffix == 0 or size == 0:
+            return False
+        return max(size - suffix, 0), size - 1
+    start = int(start)
+    end = min(int(end), size - 1) if end else size - 1
+    if start >= size or end < start:
+        return False
+    return start, end
+
+
+def is_playback_start(request) -> bool:
+    """
+    Check if a request for a file starts playing it, rather than resuming or seeking within it.
+    :param request: The request.
+    :return:        True for GET requests without a Range header or with a range starting at the first byte.
+    """
+    match = RANGE_PATTERN.match(request.META.get("HTTP_RANGE", "bytes=0-"))
+    return request.method == "GET" and match is not None and match.group("start") == "0"
+
+
+def is_range_fresh(request, etag, last_modified) -> bool:
+    """
+    Check an `If-Range` header, a Range request is only honoured if the representation has not changed.
+    :param request:       The request.
+    :param etag:          The current ETag of the file.
+    :param last_modified: The file's modification time as a timestamp.
+    :return:              True if the Range header should be used.
+    """
+    if_range = request.META.get("HTTP_IF_RANGE")
+    if if_range is None:
+        return True
+    if if_range.startswith('"') or if_range.startswith("W/"):
+        return if_range == etag
+    return parse_http_date_safe(if_range) == last_modified
+
+
+def serve_file(request, field_file, content_type, filename, as_attachment=False) -> HttpResponse:
+    """
+    Serve a stored file, or hand it off to the web server when `MEDIA_OFFLOAD` is configured.
+
+    Permission checks must be made before calling this, an offloaded file is sent by the web server without any further
+    checks.
+    :param request:       The request.
+    :param field_file:    The FieldFile to serve, it must be stored on the local filesystem.
+    :param content_type:  The Content-Type of the file.
+    :param filename:      The file name offered to the client.
+    :param as_attachment: Offer the file as a download instead of inline.  Default is False.
+    :return:              The response.
+    """
+    if settings.MEDIA_OFFLOAD:
+        return offload_file(field_file, content_type, filename, as_attachment)
+    return serve_stored_file(request, field_file.storage, field_file.name, content_type, filename, as_attachment)
+
+
+def offload_file(field_file, content_type, filename, as_attachment=False) -> HttpResponse:
+    """
+    Create an empty response telling the web server to send the file itself.
+
+    With "x-accel-redirect" (nginx) the file's name is appended to `MEDIA_OFFLOAD_PREFIX`, which must be an internal
+    location aliased to MEDIA_ROOT.  With "x-sendfile" (Apache mod_xsendfile, lighttpd) the file's absolute path is
+    sent.  The web server handles Range and conditional requests.
+    :param field_file:    The FieldFile to serve, it must be stored on the local filesystem.
+    :param content_type:  The Content-Type of the file.
+    :param filename:      The file name offered to the client.
+    :param as_attachment: Offer the file as a download instead of inline.  Default is False.
+    :return:              The response.
+    """
+    mode = settings.MEDIA_OFFLOAD.lower()
+    if mode not in OFFLOAD_HEADERS:
+        raise ImproperlyConfigured(f"MEDIA_OFFLOAD must be one of {', '.join(OFFLOAD_HEADERS)} or None.")
+    response = HttpResponse(content_type=content_type)
+    if mode == "x-accel-redirect":
+        response[OFFLOAD_HEADERS[mode]] = quote(settings.MEDIA_OFFLOAD_PREFIX.rstrip("/") + "/" + field_file.name)
+    else:
+        response[OFFLOAD_HEADERS[mode]] = field_file.path
+    disposition = "attachment" if as_attachment else "inline"
+    response["Content-Disposition"] = f"{disposition}; filename*=utf-8''{quote(filename)}"
+    return response
+
+
+def serve_stored_file(request, storage, name, content_type, filename="", as_attachment=False) -> HttpResponse:
+    """
+    Serve a stored file with support for byte ranges and conditional requests.
+
+    Supports `Range`, `If-Range`, `If-None-Match`, and `If-Modified-Since`, so clients can seek and revalidate without
+    downloading the file again.
+    :param request:       The request.
+    :param storage:       The storage containing the file.
+    :param name:          The name of the file in the storage.
+    :param content_type:  The Content-Type of the file.
+    :param filename:      The file name offered to the client if any.  Default is "".
+    :param as_attachment: Offer the file as a download instead of inline.  Default is False.
+    :return:              A 200, 206, 304, or 416 response.
+    """
+    size = storage.size(name)
+    last_modified = int(storage.get_modified_time(name).timestamp())
+    etag = quote_etag(f"{size:x}-{last_modified:x}")
+    response = get_conditional_response(request, etag=etag, last_modified=last_modified)
+    if response is None:
+        byte_range = None
+        if is_range_fresh(request, etag, last_modified):
+            byte_range = parse_range(request.META.get("HTTP_RANGE"), size)
+        if byte_range is False:
+            response = HttpResponse(status=416)
+            response["Content-Range"] = f"bytes */{size}"
+        else:
+            start, end = byte_range or (0, size - 1)
+            file = RangeFile(storage.open(name, "rb"), start, end - start + 1)
+            response = FileResponse(file, content_type=content_type, as_attachment=as_attachment, filename=filename)
+            response["Content-Length"] = end - start + 1
+            if byte_range is not None:
+                response.status_code = 206
+                response["Content-Range"] = f"bytes {start}-{end}/{size}"
+    response["Accept-Ranges"] = "bytes"
+    response["ETag"] = etag
+    response["Last-Modified"] = http_date(last_modified)
+    return response
@@ -19,11 +19,14 @@ import os
 import pytest
 from django.contrib.auth import get_user_model
 from django.core.files import File
+from django.db import connection
 from django.test import TestCase
+from django.test.utils import CaptureQueriesContext
 from mixer.backend.django import mixer
 from pydub import AudioSegment
 
 from mac_backend_api.audio.exceptions import UserAlreadyLikesException
+from mac_backend_api.audio.likes import reconcile_like_counts
 from mac_backend_api.audio.models import Audio, Stream, Like, get_audio_stream_upload_path
 
 User = get_user_model()
@@ -48,13 +51,30 @@ class TestAudioModel(TestCase):
         assert self.audio.listen_count == 1
 
     def test_like_count(self) -> None:
-        """Ensures the Audio's like_count property finds and counts its likes"""
-        like = mixer.blend(Like)
-        like.user = self.like_user
-        like.audio = self.audio
-        like.save()
+        """Ensures the Audio's like_count is updated when likes are added and removed"""
+        self.audio.add_like(self.like_user)
+        self.audio.refresh_from_db()
         assert self.audio.like_count == 1
+        self.audio.remove_like(self.like_user)
+        self.audio.refresh_from_db()
+        assert self.audio.like_count == 0
+
+    def test_like_count_when_like_is_deleted(self) -> None:
+        """Ensures deleting a Like instance removes it from the Audio's like_count"""
+        like = Like(user=self.like_user, audio=self.audio)
+        like.save()
         like.delete()
+        self.audio.refresh_from_db()
+        assert self.audio.like_count == 0
+
+    def test_like_count_when_like_is_deleted_twice(self) -> None:
+        """Ensures deleting a Like through two instances only removes it from the Audio's like_count once"""
+        like = Like(user=self.like_user, audio=self.audio)
+        like.save()
+        Like.objects.get(id=like.id).delete()
+        like.delete()
+        self.audio.refresh_from_db()
+        assert self.audio.like_count == 0
 
     def test_like_count_with_other_likes_present(self):
         """Ensures the Audio's like_count property only counts likes referencing itself"""
@@ -73,6 +93,8 @@ class TestAudioModel(TestCase):
         self.audio.add_like(user)
         self.audio.add_like(user)
         assert self.audio.like_set.get(user=user).user == user
+        self.audio.refresh_from_db()
+        assert self.audio.like_count == 1
 
     def test_remove_like(self):
         """Ensures likes are removed correctly"""
@@ -88,6 +110,21 @@ class TestAudioModel(TestCase):
         self.audio.remove_like(user)
         self.audio.remove_like(user)
         assert len(self.audio.like_set.filter(user=user)) == 0
+        self.audio.refresh_from_db()
+        assert self.audio.like_count == 0
+
+    def test_reconcile_like_counts(self):
+        """Ensures drifted like counts are recomputed from the likes"""
+        self.audio.add_like(self.like_user)
+        other = mixer.blend(Audio)
+        Audio.objects.filter(id=self.audio.id).update(like_count=5)
+        Audio.objects.filter(id=other.id).update(like_count=-1)
+        assert reconcile_like_counts(batch_size=1) == 2
+        self.audio.refresh_from_db()
+        other.refresh_from_db()
+        assert self.audio.like_count == 1
+        assert other.like_count == 0
+        assert reconcile_like_counts() == 0
 
     def __blend_audio_and_author(self) -> None:
         self.audio = mixer.blend(Audio)
@@ -110,8 +147,9 @@ class TestAudioStreamModel(TestCase):
         self.assertEquals(14, len(self.audio_stream.id))
 
     def test_get_audio_stream_upload_path(self):
+        """Verifies the stream's name carries its format's extension, the storage picks the real path"""
         assert (get_audio_stream_upload_path(self.audio_stream, "fake-file-name")
-                == f"audio/{self.audio_stream.audio.id}/{self.audio_stream.id}.{self.audio_stream.format}")
+                == f"{self.audio_stream.id}.{self.audio_stream.format}")
 
     def test_is_valid_extension(self):
         """Verifies the is_valid_extension function works with normal input"""
@@ -128,7 +166,7 @@ class TestAudioStreamModel(TestCase):
     def __blend_audio_stream(self) -> None:
         segment = AudioSegment.silent(1000)
         segment.export("test_audio.wav", format="wav")
-        self.audio = mixer.blend(Audio)
+        self.audio = mixer.blend(Audio, source_hash="")
         self.audio_stream = mixer.blend(Stream,
                                         audio=self.audio,
                                         format=Stream.AudioFormat.OGG,
@@ -162,6 +200,23 @@ class TestLikes(TestCase):
             )
             new_like.save()
 
+    def test_double_like_keeps_transaction_usable(self):
+        """Ensures a rejected like does not break the surrounding transaction or change the like count"""
+        like_count = Audio.objects.get(id=self.like_audio.id).like_count
+        with pytest.raises(UserAlreadyLikesException):
+            Like(user=self.like_user, audio=self.like_audio).save()
+        self.like_audio.refresh_from_db()
+        assert self.like_audio.like_count == like_count
+
+    def test_new_like_is_one_insert(self):
+        """Ensures a like is created without first querying for an existing like"""
+        user = mixer.blend(User)
+        with CaptureQueriesContext(connection) as context:
+            Like(user=user, audio=self.like_audio).save()
+        statements = [query["sql"].split()[0] for query in context.captured_queries]
+        assert statements.count("SELECT") == 0
+        assert statements.count("INSERT") == 1
+
     def __blend_like(self):
         self.like = mixer.blend(Like)
         self.like.user = self.like_user
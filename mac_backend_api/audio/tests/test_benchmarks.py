@@ -0,0 +1,62 @@
+#  Copyright (C) 2020  Mind Audio Central
+#
+#  This file is part of mac_backend_api.
+#
+#  mac_backend_api is free software: you can redistribute it and/or modify
+#  it under the terms of the GNU General Public License as published by
+#  the Free Software Foundation, either version 3 of the License, or
+#  (at your option) any later version.
+#
+#  mac_backend_api is distributed in the hope that it will be useful,
+#  but WITHOUT ANY WARRANTY; without even the implied warranty of
+#  MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+#  GNU General Public License for more details.
+#
+#  You should have received a copy of the GNU General Public License
+#  along with mac_backend_api.  If not, see <https://www.gnu.org/licenses/>.
+
+import json
+import os
+import tempfile
+from io import StringIO
+
+from django.core.management import call_command
+from django.test import TestCase
+
+from mac_backend_api.audio.benchmarks import percentile, run_case
+from mac_backend_api.audio.models import Audio, TranscodeJob
+from mac_backend_api.audio.tests.test_transcoding import create_audio, make_wav_file
+
+
+class TestBenchmarkIngest(TestCase):
+    def test_percentile(self) -> None:
+        """Verify percentiles use the nearest rank."""
+        values = list(range(1, 101))
+        self.assertEquals(percentile(values, 50), 50)
+        self.assertEquals(percentile(values, 99), 99)
+        self.assertEquals(percentile([3.0], 99), 3.0)
+        self.assertIsNone(percentile([], 50))
+
+    def test_run_case_transcodes_own_uploads(self) -> None:
+        """Verify transcoding only runs the benchmark's own jobs, leaving other queued jobs to the worker."""
+        other = create_audio(make_wav_file())
+        run_case("wav", 0.5, 1, transcode=True)
+        self.assertFalse(TranscodeJob.objects.filter(stream__audio=other).exclude(attempts=0).exists())
+        self.assertFalse(TranscodeJob.objects.exclude(stream__audio=other).filter(attempts=0).exists())
+
+    def test_benchmark_ingest_command(self) -> None:
+        """Verify the command writes a result for every case and rolls back its uploads."""
+        with tempfile.TemporaryDirectory() as directory:
+            output = os.path.join(directory, "results.json")
+            call_command("benchmark_ingest", formats=["wav"], durations=[0.5, 1], count=2, output=output,
+                         stdout=StringIO())
+            with open(output) as file:
+                results = json.load(file)
+        self.assertEquals([(case["format"], case["duration"]) for case in results["cases"]], [("wav", 0.5), ("wav", 1)])
+        case = results["cases"][0]
+        self.assertEquals(case["count"], 2)
+        self.assertGreater(case["uploads_per_second"], 0)
+        self.assertLessEqual(case["latency"]["p50"], case["latency"]["p99"])
+        self.assertEquals(set(case["stages"]), {"hash", "probe", "plan", "streams"})
+        self.assertIn("cpu_count", results["environment"])
+        self.assertFalse(Audio.objects.exists())
@@ -0,0 +1,68 @@
+#  Copyright (C) 2020  Mind Audio Central
+#
+#  This file is part of mac_backend_api.
+#
+#  mac_backend_api is free software: you can redistribute it and/or modify
+#  it under the terms of the GNU General Public License as published by
+#  the Free Software Foundation, either version 3 of the License, or
+#  (at your option) any later version.
+#
+#  mac_backend_api is distributed in the hope that it will be useful,
+#  but WITHOUT ANY WARRANTY; without even the implied warranty of
+#  MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+#  GNU General Public License for more details.
+#
+#  You should have received a copy of the GNU General Public License
+#  along with mac_backend_api.  If not, see <https://www.gnu.org/licenses/>.
+
+import hashlib
+
+from django.core.files.base import ContentFile
+from django.core.files.uploadhandler import StopFutureHandlers
+from django.test import TestCase
+
+from mac_backend_api.audio.hashing import (HashingMemoryFileUploadHandler, HashingTemporaryFileUploadHandler,
+                                           get_sha256)
+
+CONTENT = b"audio data" * 1000
+
+
+class TestHashingUploadHandlers(TestCase):
+    def test_memory_handler(self) -> None:
+        """Verifies files kept in memory are given the digest of the received data."""
+        handler = HashingMemoryFileUploadHandler()
+        handler.handle_raw_input(None, {}, len(CONTENT), None)
+        self.assertEquals(self.receive(handler).sha256, hashlib.sha256(CONTENT).hexdigest())
+
+    def test_temporary_file_handler(self) -> None:
+        """Verifies files streamed to a temporary file are given the digest of the received data."""
+        handler = HashingTemporaryFileUploadHandler()
+        self.assertEquals(self.receive(handler).sha256, hashlib.sha256(CONTENT).hexdigest())
+
+    def receive(self, handler):
+        """
+        Feed `CONTENT` through an upload handler in chunks.
+        :param handler: The upload handler.
+        :return:        The uploaded file.
+        """
+        try:
+            handler.new_file("file", "upload.wav", "audio/wav", len(CONTENT))
+        except StopFutureHandlers:
+            pass
+        for start in range(0, len(CONTENT), 1024):
+            handler.receive_data_chunk(CONTENT[start:start + 1024], start)
+        return handler.file_complete(len(CONTENT))
+
+
+class TestGetSha256(TestCase):
+    def test_get_sha256_reads_unhashed_files(self) -> None:
+        """Verifies files without a precomputed digest are hashed and rewound."""
+        file = ContentFile(CONTENT)
+        self.assertEquals(get_sha256(file), hashlib.sha256(CONTENT).hexdigest())
+        self.assertEquals(file.tell(), 0)
+
+    def test_get_sha256_uses_precomputed_digest(self) -> None:
+        """Verifies the digest computed while receiving the file is used."""
+        file = ContentFile(CONTENT)
+        file.sha256 = "precomputed"
+        self.assertEquals(get_sha256(file), "precomputed")
@@ -0,0 +1,115 @@
+#  Copyright (C) 2020  Mind Audio Central
+#
+#  This file is part of mac_backend_api.
+#
+#  mac_backend_api is free software: you can redistribute it and/or modify
+#  it under the terms of the GNU General Public License as published by
+#  the Free Software Foundation, either version 3 of the License, or
+#  (at your option) any later version.
+#
+#  mac_backend_api is distributed in the hope that it will be useful,
+#  but WITHOUT ANY WARRANTY; without even the implied warranty of
+#  MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+#  GNU General Public License for more details.
+#
+#  You should have received a copy of the GNU General Public License
+#  along with mac_backend_api.  If not, see <https://www.gnu.org/licenses/>.
+import os
+import tempfile
+from io import StringIO
+
+from django.contrib.auth import get_user_model
+from django.core.management import call_command
+from django.core.management.base import CommandError
+from django.test import TestCase
+from mixer.backend.django import mixer
+
+from mac_backend_api.audio.importing import import_batch, prepare_file
+from mac_backend_api.audio.models import Audio, ImportedFile, Stream, TranscodeJob
+from mac_backend_api.audio.tests.test_transcoding import WAV_PRESETS, make_wav_file
+from mac_backend_api.audio.transcoding.queue import run_jobs, start_jobs
+
+User = get_user_model()
+
+
+def write_wav_file(directory, name, duration=1000) -> str:
+    """
+    Write a WAV file containing silence.
+    :param directory: The directory to write the file to.
+    :param name:      The name of the file.
+    :param duration:  The length of the audio in milliseconds.  Default is 1000.
+    :return:          The path of the file.
+    """
+    path = os.path.join(directory, name)
+    with open(path, "wb") as file:
+        file.write(make_wav_file(duration).read())
+    return path
+
+
+class TestImportAudio(TestCase):
+    def setUp(self) -> None:
+        self.directory = tempfile.TemporaryDirectory()
+        os.mkdir(os.path.join(self.directory.name, "album"))
+        write_wav_file(self.directory.name, "first.wav")
+        write_wav_file(os.path.join(self.directory.name, "album"), "second.wav", duration=1500)
+        with open(os.path.join(self.directory.name, "notes.txt"), "w") as file:
+            file.write("not audio")
+
+    def tearDown(self) -> None:
+        self.directory.cleanup()
+
+    def import_audio(self, **options) -> None:
+        call_command("import_audio", self.directory.name, queue=True, processes=1, stdout=StringIO(), **options)
+
+    def test_import_audio(self) -> None:
+        """Verifies every audio file is imported with its metadata, authors, and streams queued at bulk priority."""
+        author = mixer.blend(User)
+        self.import_audio(author=[author.username], public=True)
+        self.assertEquals(sorted(Audio.objects.values_list("title", flat=True)), ["first", "second"])
+        audio = Audio.objects.get(title="second")
+        self.assertEquals(audio.duration, 1.5)
+        self.assertEquals(audio.source_sample_rate, 48000)
+        self.assertTrue(audio.is_public)
+        self.assertTrue(audio.source.storage.exists(audio.source.name))
+        self.assertEquals(list(audio.authors.all()), [author])
+        self.assertTrue(audio.streams.exists())
+        self.assertEquals(TranscodeJob.objects.count(), Stream.objects.count())
+        self.assertFalse(TranscodeJob.objects.exclude(priority=TranscodeJob.JobPriority.BULK).exists())
+        self.assertEquals(ImportedFile.objects.count(), 2)
+
+    def test_import_audio_resumes(self) -> None:
+        """Verifies files imported by an earlier run are skipped."""
+        self.import_audio(batch_size=1)
+        write_wav_file(self.directory.name, "third.wav")
+        self.import_audio()
+        self.assertEquals(sorted(Audio.objects.values_list("title", flat=True)), ["first", "second", "third"])
+        self.assertEquals(ImportedFile.objects.count(), 3)
+
+    def test_identical_files_share_a_source(self) -> None:
+        """Verifies identical files are stored once."""
+        write_wav_file(self.directory.name, "copy.wav")
+        self.import_audio()
+        first = Audio.objects.get(title="first")
+        self.assertEquals(Audio.objects.get(title="copy").source.name, first.source.name)
+
+    def test_unknown_author(self) -> None:
+        """Verifies the command fails before importing anything when an author does not exist."""
+        with self.assertRaises(CommandError):
+            self.import_audio(author=["nobody"])
+        self.assertFalse(Audio.objects.exists())
+
+    def test_prepare_file_error(self) -> None:
+        """Verifies a file which cannot be read is reported instead of raising."""
+        path = os.path.join(self.directory.name, "missing.wav")
+        self.assertIn("error", prepare_file(path))
+
+    def test_import_batch_transcodes(self) -> None:
+        """Verifies the jobs of an imported batch can be started and rendered."""
+        prepared = [prepare_file(os.path.join(self.directory.name, "first.wav"))]
+        jobs = import_batch(prepared, presets=WAV_PRESETS)
+        run_jobs(start_jobs(TranscodeJob.objects.filter(id__in=[job.id for job in jobs])))
+        audio = Audio.objects.get()
+        self.assertEquals(audio.streams.count(), len(WAV_PRESETS))
+        for stream in audio.streams.all():
+            self.assertEquals(stream.status, Stream.StreamStatus.READY)
+        self.assertTrue(audio.waveforms.exists())
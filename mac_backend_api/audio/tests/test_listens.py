@@ -0,0 +1,130 @@
+#  Copyright (C) 2020  Mind Audio Central
+#
+#  This file is part of mac_backend_api.
+#
+#  mac_backend_api is free software: you can redistribute it and/or modify
+#  it under the terms of the GNU General Public License as published by
+#  the Free Software Foundation, either version 3 of the License, or
+#  (at your option) any later version.
+#
+#  mac_backend_api is distributed in the hope that it will be useful,
+#  but WITHOUT ANY WARRANTY; without even the implied warranty of
+#  MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+#  GNU General Public License for more details.
+#
+#  You should have received a copy of the GNU General Public License
+#  along with mac_backend_api.  If not, see <https://www.gnu.org/licenses/>.
+from datetime import datetime, timedelta, timezone
+from unittest import mock
+
+from django.db import connection
+from django.test import TestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+from mixer.backend.django import mixer
+
+from mac_backend_api.audio.analytics import get_listen_series
+from mac_backend_api.audio.listens import ListenBuffer
+from mac_backend_api.audio.models import Audio, ListenRollup
+
+
+@override_settings(LISTEN_FLUSH_INTERVAL=60)
+class TestListenBuffer(TestCase):
+    def setUp(self) -> None:
+        self.buffer = ListenBuffer()
+        self.audio = mixer.blend(Audio, listen_count=0)
+        self.other = mixer.blend(Audio, listen_count=0)
+
+    def tearDown(self) -> None:
+        if self.buffer.timer is not None:
+            self.buffer.timer.cancel()
+
+    def test_listens_are_buffered(self) -> None:
+        """Verifies listens are not written until the buffer is flushed, and a flush is scheduled."""
+        self.buffer.add(self.audio.id)
+        self.audio.refresh_from_db()
+        self.assertEquals(self.audio.listen_count, 0)
+        self.assertIsNotNone(self.buffer.timer)
+
+    def test_flush(self) -> None:
+        """Verifies listens are coalesced per audio and written with one update per distinct increment."""
+        for audio_id in (self.audio.id, self.audio.id, self.other.id, self.audio.id):
+            self.buffer.add(audio_id)
+        self.assertEquals(self.buffer.flush(), 4)
+        self.audio.refresh_from_db()
+        self.other.refresh_from_db()
+        self.assertEquals(self.audio.listen_count, 3)
+        self.assertEquals(self.other.listen_count, 1)
+        self.assertIsNone(self.buffer.timer)
+        self.assertEquals(self.buffer.flush(), 0)
+
+    def test_flush_query_count(self) -> None:
+        """Verifies the number of queries a flush takes does not grow with the number of audios."""
+        def count_flush_queries(audios) -> int:
+            for audio in audios:
+                self.buffer.add(audio.id)
+            with CaptureQueriesContext(connection) as context:
+                self.buffer.flush()
+            return len(context)
+
+        few = count_flush_queries([self.audio, self.other])
+        self.assertEquals(count_flush_queries(mixer.cycle(10).blend(Audio)), few)
+
+    def test_flush_rolls_up_listens_by_hour(self) -> None:
+        """Verifies listens are added to the rollup of the hour they were played in."""
+        first_hour = datetime(2020, 6, 1, 12, tzinfo=timezone.utc)
+        for played_at in (first_hour, first_hour + timedelta(minutes=59), first_hour + timedelta(hours=1)):
+            with mock.patch("django.utils.timezone.now", return_value=played_at):
+                self.buffer.add(self.audio.id)
+        self.buffer.flush()
+        with mock.patch("django.utils.timezone.now", return_value=first_hour):
+            self.buffer.add(self.audio.id)
+        self.buffer.flush()
+        rollups = ListenRollup.objects.filter(audio=self.audio)
+        self.assertEquals([(rollup.hour, rollup.count) for rollup in rollups],
+                          [(first_hour, 3), (first_hour + timedelta(hours=1), 1)])
+
+    def test_flush_skips_deleted_audios(self) -> None:
+        """Verifies listens of audios deleted before the flush are dropped instead of failing the flush."""
+        self.buffer.add(self.audio.id)
+        self.buffer.add(self.other.id)
+        self.other.delete()
+        self.assertEquals(self.buffer.flush(), 2)
+        self.assertEquals(list(ListenRollup.objects.values_list("audio_id", flat=True)), [self.audio.id])
+
+    def test_failed_flush_keeps_listens(self) -> None:
+        """Verifies listens which could not be written are buffered again."""
+        self.buffer.add(self.audio.id, count=2)
+        with mock.patch("mac_backend_api.audio.listens.apply_listens", side_effect=RuntimeError("database down")):
+            with self.assertRaises(RuntimeError):
+                self.buffer.flush()
+        self.buffer.flush()
+        self.audio.refresh_from_db()
+        self.assertEquals(self.audio.listen_count, 2)
+
+    @override_settings(LISTEN_FLUSH_INTERVAL=0)
+    def test_unbuffered(self) -> None:
+        """Verifies listens are written immediately without a flush interval."""
+        self.buffer.add(self.audio.id)
+        self.audio.refresh_from_db()
+        self.assertEquals(self.audio.listen_count, 1)
+        self.assertIsNone(self.buffer.timer)
+
+
+class TestListenSeries(TestCase):
+    def setUp(self) -> None:
+        self.audio = mixer.blend(Audio)
+        self.start = datetime(2020, 6, 1, tzinfo=timezone.utc)
+        for hours, count in ((0, 1), (5, 2), (24, 4), (48, 8)):
+            ListenRollup.objects.create(audio=self.audio, hour=self.start + timedelta(hours=hours), count=count)
+        ListenRollup.objects.create(audio=mixer.blend(Audio), hour=self.start, count=16)
+
+    def test_hourly_series(self) -> None:
+        """Verifies the hourly series lists each rollup of the audios within the range."""
+        series = get_listen_series(self.audio.listen_rollups.all(), self.start, self.start + timedelta(days=2))
+        self.assertEquals([(point["time"], point["count"]) for point in series],
+                          [(self.start, 1), (self.start + timedelta(hours=5), 2), (self.start + timedelta(days=1), 4)])
+
+    def test_daily_series(self) -> None:
+        """Verifies rollups are summed per day."""
+        series = get_listen_series(ListenRollup.objects.all(), self.start, self.start + timedelta(days=3), "day")
+        self.assertEquals([point["count"] for point in series], [19, 4, 8])
@@ -0,0 +1,68 @@
+#  Copyright (C) 2020  Mind Audio Central
+#
+#  This file is part of mac_backend_api.
+#
+#  mac_backend_api is free software: you can redistribute it and/or modify
+#  it under the terms of the GNU General Public License as published by
+#  the Free Software Foundation, either version 3 of the License, or
+#  (at your option) any later version.
+#
+#  mac_backend_api is distributed in the hope that it will be useful,
+#  but WITHOUT ANY WARRANTY; without even the implied warranty of
+#  MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+#  GNU General Public License for more details.
+#
+#  You should have received a copy of the GNU General Public License
+#  along with mac_backend_api.  If not, see <https://www.gnu.org/licenses/>.
+
+import os
+import tempfile
+
+from django.test import TestCase
+from pydub import AudioSegment
+from pydub.generators import Sine
+
+from mac_backend_api.audio.transcoding.loudness import compute_loudness, gated_loudness
+
+
+class TestLoudness(TestCase):
+    def setUp(self) -> None:
+        descriptor, self.pcm_path = tempfile.mkstemp(suffix=".pcm")
+        os.close(descriptor)
+
+    def tearDown(self) -> None:
+        os.remove(self.pcm_path)
+
+    def measure(self, segment) -> dict:
+        """
+        Write an AudioSegment as PCM and measure it.
+        :param segment: The AudioSegment.
+        :return:        The result of `compute_loudness`.
+        """
+        with open(self.pcm_path, "wb") as pcm:
+            pcm.write(segment.raw_data)
+        parameters = {"sample_width": segment.sample_width, "frame_rate": segment.frame_rate,
+                      "channels": segment.channels}
+        return compute_loudness(self.pcm_path, parameters)
+
+    def test_full_scale_sine(self) -> None:
+        """Verify a full scale sine peaks at 0 dBFS, with an RMS of -3 dBFS and a loudness of about -3.7 LUFS."""
+        result = self.measure(Sine(1000, sample_rate=48000).to_audio_segment(duration=2000, volume=0))
+        self.assertAlmostEqual(result["peak"], 0, places=2)
+        self.assertAlmostEqual(result["rms"], -3.01, places=1)
+        self.assertAlmostEqual(result["loudness"], -3.70, places=1)
+
+    def test_stereo_sums_channels(self) -> None:
+        """Verify the loudness of both channels is summed, making a stereo signal 3 LU louder than mono."""
+        mono = Sine(1000, sample_rate=48000).to_audio_segment(duration=2000, volume=-20)
+        stereo = AudioSegment.from_mono_audiosegments(mono, mono)
+        self.assertAlmostEqual(self.measure(stereo)["loudness"] - self.measure(mono)["loudness"], 3.01, places=1)
+
+    def test_silence(self) -> None:
+        """Verify silence has no loudness, peak, or RMS level."""
+        result = self.measure(AudioSegment.silent(2000, frame_rate=48000))
+        self.assertEquals(result, {"loudness": None, "peak": None, "rms": None})
+
+    def test_relative_gate(self) -> None:
+        """Verify quiet passages more than 10 LU below the rest do not lower the integrated loudness."""
+        self.assertAlmostEqual(gated_loudness([0.1] * 10 + [0.001] * 10), gated_loudness([0.1] * 10))
@@ -0,0 +1,56 @@
+#  Copyright (C) 2020  Mind Audio Central
+#
+#  This file is part of mac_backend_api.
+#
+#  mac_backend_api is free software: you can redistribute it and/or modify
+#  it under the terms of the GNU General Public License as published by
+#  the Free Software Foundation, either version 3 of the License, or
+#  (at your option) any later version.
+#
+#  mac_backend_api is distributed in the hope that it will be useful,
+#  but WITHOUT ANY WARRANTY; without even the implied warranty of
+#  MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+#  GNU General Public License for more details.
+#
+#  You should have received a copy of the GNU General Public License
+#  along with mac_backend_api.  If not, see <https://www.gnu.org/licenses/>.
+
+from django.test import TestCase
+
+from mac_backend_api.audio.models import Segment, Stream
+from mac_backend_api.audio.playlists import render_master_playlist, render_variant_playlist
+
+
+class TestPlaylists(TestCase):
+    def test_render_master_playlist(self) -> None:
+        """Verifies each stream is listed with its bandwidth and codec."""
+        streams = [
+            Stream(id="high", format=Stream.AudioFormat.AAC, bit_rate=Stream.AudioBitRate.HIGH, actual_bit_rate=120000),
+            Stream(id="low", format=Stream.AudioFormat.MP3, bit_rate=Stream.AudioBitRate.LOW),
+        ]
+        playlist = render_master_playlist(streams, lambda stream: f"/{stream.id}.m3u8")
+        self.assertEquals(playlist, "\n".join([
+            "#EXTM3U",
+            "#EXT-X-VERSION:3",
+            '#EXT-X-STREAM-INF:BANDWIDTH=120000,CODECS="mp4a.40.2"',
+            "/high.m3u8",
+            '#EXT-X-STREAM-INF:BANDWIDTH=64000,CODECS="mp4a.40.34"',
+            "/low.m3u8",
+        ]) + "\n")
+
+    def test_render_variant_playlist(self) -> None:
+        """Verifies segments are listed in order with the longest segment as the target duration."""
+        segments = [Segment(index=0, duration=6.0), Segment(index=1, duration=2.5)]
+        playlist = render_variant_playlist(segments, lambda segment: f"/{segment.index}.aac")
+        self.assertEquals(playlist, "\n".join([
+            "#EXTM3U",
+            "#EXT-X-VERSION:3",
+            "#EXT-X-TARGETDURATION:6",
+            "#EXT-X-MEDIA-SEQUENCE:0",
+            "#EXT-X-PLAYLIST-TYPE:VOD",
+            "#EXTINF:6.000,",
+            "/0.aac",
+            "#EXTINF:2.500,",
+            "/1.aac",
+            "#EXT-X-ENDLIST",
+        ]) + "\n")
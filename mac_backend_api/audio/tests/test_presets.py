@@ -0,0 +1,78 @@
+#  Copyright (C) 2020  Mind Audio Central
+#
+#  This file is part of mac_backend_api.
+#
+#  mac_backend_api is free software: you can redistribute it and/or modify
+#  it under the terms of the GNU General Public License as published by
+#  the Free Software Foundation, either version 3 of the License, or
+#  (at your option) any later version.
+#
+#  mac_backend_api is distributed in the hope that it will be useful,
+#  but WITHOUT ANY WARRANTY; without even the implied warranty of
+#  MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+#  GNU General Public License for more details.
+#
+#  You should have received a copy of the GNU General Public License
+#  along with mac_backend_api.  If not, see <https://www.gnu.org/licenses/>.
+
+from django.test import TestCase
+from mixer.backend.django import mixer
+
+from mac_backend_api.audio.api.serializers import HLS_STREAM_PRESETS, OGG_STREAM_PRESETS, AudioSerializer
+from mac_backend_api.audio.models import Audio, Stream
+from mac_backend_api.audio.presets import plan_renditions
+
+
+class TestPlanRenditions(TestCase):
+    def test_high_quality_source(self) -> None:
+        """Verify every preset is rendered for a source which can fill them."""
+        audio = mixer.blend(Audio, source_sample_rate=96000, source_bit_rate=320000)
+        planned, skipped = plan_renditions(audio, OGG_STREAM_PRESETS)
+        self.assertEquals(planned, list(OGG_STREAM_PRESETS))
+        self.assertEquals(skipped, [])
+
+    def test_unknown_source(self) -> None:
+        """Verify every preset is rendered when the source could not be probed."""
+        audio = mixer.blend(Audio, source_sample_rate=None, source_bit_rate=None)
+        planned, skipped = plan_renditions(audio, OGG_STREAM_PRESETS)
+        self.assertEquals(planned, list(OGG_STREAM_PRESETS))
+
+    def test_lowers_presets_to_source(self) -> None:
+        """Verify presets exceeding the source are lowered instead of upsampling it."""
+        audio = mixer.blend(Audio, source_sample_rate=48000, source_bit_rate=320000)
+        planned, skipped = plan_renditions(audio, OGG_STREAM_PRESETS)
+        self.assertEquals([(preset["sample_rate"], preset["bit_rate"]) for preset in planned],
+                          [(48000, 128000), (48000, 96000), (44100, 64000)])
+        self.assertEquals(skipped, [])
+
+    def test_merges_duplicate_renditions(self) -> None:
+        """Verify a low quality source gets its exactly fitting rendition, and the presets exceeding it are recorded."""
+        audio = mixer.blend(Audio, source_sample_rate=44100, source_bit_rate=64000)
+        planned, skipped = plan_renditions(audio, OGG_STREAM_PRESETS)
+        self.assertEquals(planned, list(OGG_STREAM_PRESETS[2:]))
+        self.assertEquals([preset for preset, reason in skipped], list(OGG_STREAM_PRESETS[:2]))
+        self.assertEquals(skipped[0][1], "Would upsample the 44100 Hz source to 96000 Hz and inflate the 64000 bps "
+                                         "source to 128000 bps, merged into the 44100 Hz 64000 bps rendition")
+
+    def test_exact_preset_wins_over_lowered(self) -> None:
+        """Verify a preset fitting the source is rendered, and an earlier preset lowered onto it is skipped."""
+        audio = mixer.blend(Audio, source_sample_rate=48000, source_bit_rate=96000)
+        planned, skipped = plan_renditions(audio, OGG_STREAM_PRESETS)
+        self.assertEquals(planned, list(OGG_STREAM_PRESETS[1:]))
+        self.assertEquals([preset for preset, reason in skipped], [OGG_STREAM_PRESETS[0]])
+
+    def test_source_below_every_choice(self) -> None:
+        """Verify sources below every stream setting are rendered at the lowest settings."""
+        audio = mixer.blend(Audio, source_sample_rate=22050, source_bit_rate=24000)
+        planned, skipped = plan_renditions(audio, OGG_STREAM_PRESETS)
+        self.assertEquals([(preset["sample_rate"], preset["bit_rate"]) for preset in planned], [(44100, 32000)])
+        self.assertEquals(len(skipped), 2)
+
+    def test_create_default_streams_records_skipped(self) -> None:
+        """Verify skipped presets of every ladder are stored with their reason."""
+        audio = mixer.blend(Audio, source_hash="", source_sample_rate=44100, source_bit_rate=64000)
+        AudioSerializer().create_default_streams(audio)
+        self.assertEquals(sorted(audio.streams.values_list("format", flat=True)), ["aac", "ogg"])
+        self.assertEquals(set(audio.streams.values_list("sample_rate", flat=True)), {Stream.AudioSampleRate.LOW})
+        self.assertEquals(audio.skipped_renditions.count(), len(OGG_STREAM_PRESETS) + len(HLS_STREAM_PRESETS) - 2)
+        self.assertTrue(all(skipped.reason for skipped in audio.skipped_renditions.all()))
@@ -0,0 +1,63 @@
+#  Copyright (C) 2020  Mind Audio Central
+#
+#  This file is part of mac_backend_api.
+#
+#  mac_backend_api is free software: you can redistribute it and/or modify
+#  it under the terms of the GNU General Public License as published by
+#  the Free Software Foundation, either version 3 of the License, or
+#  (at your option) any later version.
+#
+#  mac_backend_api is distributed in the hope that it will be useful,
+#  but WITHOUT ANY WARRANTY; without even the implied warranty of
+#  MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+#  GNU General Public License for more details.
+#
+#  You should have received a copy of the GNU General Public License
+#  along with mac_backend_api.  If not, see <https://www.gnu.org/licenses/>.
+
+import os
+import tempfile
+
+from django.test import TestCase
+from pydub import AudioSegment
+
+from mac_backend_api.audio.probe import pcm_metadata, probe_file
+
+
+class TestProbe(TestCase):
+    def setUp(self) -> None:
+        self.directory = tempfile.TemporaryDirectory()
+        self.path = os.path.join(self.directory.name, "probe.wav")
+
+    def tearDown(self) -> None:
+        self.directory.cleanup()
+
+    def test_probe_file(self) -> None:
+        """Verifies stream information is read from the file's headers."""
+        AudioSegment.silent(1500, frame_rate=48000).set_channels(2).export(self.path, format="wav")
+        self.assertEquals(probe_file(self.path), {
+            "duration": 1.5,
+            "channels": 2,
+            "bit_rate": 48000 * 16 * 2,
+            "sample_rate": 48000,
+            "size": os.path.getsize(self.path)
+        })
+
+    def test_probe_unsupported_file(self) -> None:
+        """Verifies only the size is known for files which cannot be parsed."""
+        with open(self.path, "wb") as file:
+            file.write(b"not audio")
+        self.assertEquals(probe_file(self.path), {
+            "duration": None,
+            "channels": None,
+            "bit_rate": None,
+            "sample_rate": None,
+            "size": 9
+        })
+
+    def test_pcm_metadata(self) -> None:
+        """Verifies the duration of decoded PCM is calculated from its size and frame width."""
+        with open(self.path, "wb") as file:
+            file.write(bytes(44100 * 2 * 2))
+        metadata = pcm_metadata(self.path, {"sample_width": 2, "frame_rate": 44100, "channels": 2})
+        self.assertEquals(metadata, {"duration": 1.0, "channels": 2, "sample_rate": 44100})
@@ -0,0 +1,137 @@
+#  Copyright (C) 2020  Mind Audio Central
+#
+#  This file is part of mac_backend_api.
+#
+#  mac_backend_api is free software: you can redistribute it and/or modify
+#  it under the terms of the GNU General Public License as published by
+#  the Free Software Foundation, either version 3 of the License, or
+#  (at your option) any later version.
+#
+#  mac_backend_api is distributed in the hope that it will be useful,
+#  but WITHOUT ANY WARRANTY; without even the implied warranty of
+#  MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+#  GNU General Public License for more details.
+#
+#  You should have received a copy of the GNU General Public License
+#  along with mac_backend_api.  If not, see <https://www.gnu.org/licenses/>.
+from io import StringIO
+from unittest import mock
+
+from django.core.files.base import ContentFile
+from django.core.management import call_command
+from django.test import TestCase
+from django.utils import timezone
+
+from mac_backend_api.audio.models import CachedRendition, Stream, TranscodeJob
+from mac_backend_api.audio.storage import stream_storage
+from mac_backend_api.audio.tests.test_transcoding import create_audio, make_wav_file
+from mac_backend_api.audio.transcoding.cache import find_cached_rendition
+from mac_backend_api.audio.transcoding.encoder import encode_pcm
+from mac_backend_api.audio.transcoding.queue import claim_jobs, enqueue_stream, run_jobs
+from mac_backend_api.audio.transcoding.retranscode import iterate_batches, rerender_streams, select_streams
+
+
+def create_rendered_audio():
+    """
+    Create an Audio and render its streams.
+    :return: The Audio instance.
+    """
+    audio = create_audio(make_wav_file())
+    run_jobs(claim_jobs(limit=10))
+    return audio
+
+
+class TestRetranscode(TestCase):
+    def test_select_streams(self) -> None:
+        """Verifies streams are selected by their preset and the time they were rendered."""
+        audio = create_rendered_audio()
+        stream = audio.streams.get(sample_rate=Stream.AudioSampleRate.LOW)
+        cutoff = timezone.now()
+        self.assertEquals(select_streams(cutoff).count(), audio.streams.count())
+        self.assertEquals(list(select_streams(cutoff, sample_rates=[Stream.AudioSampleRate.LOW])), [stream])
+        self.assertFalse(select_streams(cutoff, formats=[Stream.AudioFormat.OGG]).exists())
+        self.assertFalse(select_streams(audio.uploaded_at).exists())
+        Stream.objects.filter(id=stream.id).update(rendered_at=None)
+        self.assertEquals(list(select_streams(audio.uploaded_at)), [stream])
+
+    def test_select_streams_skips_unfinished_jobs(self) -> None:
+        """Verifies streams which are already being rendered are not selected."""
+        audio = create_rendered_audio()
+        stream = audio.streams.first()
+        TranscodeJob.objects.create(stream=stream, is_rerender=True)
+        self.assertNotIn(stream, select_streams(timezone.now()))
+
+    def test_iterate_batches(self) -> None:
+        """Verifies batches are paged through in id order."""
+        create_rendered_audio()
+        create_rendered_audio()
+        streams = select_streams(timezone.now())
+        batches = list(iterate_batches(streams, 3))
+        self.assertEquals([len(batch) for batch in batches], [3, 1])
+        self.assertEquals([stream.id for batch in batches for stream in batch],
+                          list(streams.order_by("id").values_list("id", flat=True)))
+        self.assertEquals(list(iterate_batches(streams, 3, after=batches[0][-1].id)), [batches[1]])
+
+    def test_rerender_streams_swaps_files(self) -> None:
+        """Verifies a stream's file is replaced with a new rendition, and the old file is deleted."""
+        audio = create_rendered_audio()
+        stream = audio.streams.first()
+        old_name = stream_storage.save("old.wav", ContentFile(b"old"))
+        Stream.objects.filter(id=stream.id).update(file=old_name)
+        with mock.patch("mac_backend_api.audio.transcoding.cache.ENCODER_VERSION", 2), \
+                mock.patch("mac_backend_api.audio.transcoding.queue.SEGMENT_FORMATS", ("wav",)):
+            self.assertEquals(rerender_streams([Stream.objects.select_related("audio").get(id=stream.id)]), 1)
+        stream.refresh_from_db()
+        self.assertEquals(stream.status, Stream.StreamStatus.READY)
+        self.assertNotEquals(stream.file.name, old_name)
+        self.assertGreater(stream.segments.count(), 0)
+        self.assertFalse(stream_storage.exists(old_name))
+        self.assertEquals(stream.transcode_jobs.latest("created_at").priority, TranscodeJob.JobPriority.BULK)
+
+    def test_rerender_failure_keeps_stream(self) -> None:
+        """Verifies a stream keeps serving its file when it cannot be rendered again."""
+        audio = create_rendered_audio()
+        stream = audio.streams.select_related("audio").first()
+        with mock.patch("mac_backend_api.audio.transcoding.cache.ENCODER_VERSION", 2), \
+                mock.patch("mac_backend_api.audio.transcoding.queue.encode_pcm", side_effect=ValueError("failed")):
+            self.assertEquals(rerender_streams([stream]), 0)
+        rendered = Stream.objects.get(id=stream.id)
+        self.assertEquals(rendered.status, Stream.StreamStatus.READY)
+        self.assertEquals(rendered.file.name, stream.file.name)
+        self.assertTrue(stream_storage.exists(stream.file.name))
+
+    def test_rerender_streams_without_cache(self) -> None:
+        """Verifies cached renditions are reused by default, and encoded again and replaced without the cache."""
+        audio = create_rendered_audio()
+        streams = list(audio.streams.select_related("audio"))
+        with mock.patch("mac_backend_api.audio.transcoding.queue.encode_pcm", wraps=encode_pcm) as encode:
+            self.assertEquals(rerender_streams(streams), len(streams))
+            encode.assert_not_called()
+            self.assertEquals(rerender_streams(streams, use_cache=False), len(streams))
+            self.assertEquals(encode.call_count, len(streams))
+        self.assertEquals(CachedRendition.objects.count(), len(streams))
+        for stream in audio.streams.all():
+            self.assertEquals(find_cached_rendition(stream).file.name, stream.file.name)
+
+    def test_failed_first_render_is_not_ready(self) -> None:
+        """Verifies streams which are not re-renders are still marked as pending when their job fails."""
+        audio = create_rendered_audio()
+        stream = audio.streams.first()
+        enqueue_stream(stream)
+        with mock.patch("mac_backend_api.audio.transcoding.cache.ENCODER_VERSION", 2), \
+                mock.patch("mac_backend_api.audio.transcoding.queue.encode_pcm", side_effect=ValueError("failed")):
+            run_jobs(claim_jobs(limit=10))
+        stream.refresh_from_db()
+        self.assertEquals(stream.status, Stream.StreamStatus.PENDING)
+
+    def test_retranscode_command_resumes(self) -> None:
+        """Verifies the command renders every selected stream, and a second run with the same cutoff renders none."""
+        audio = create_rendered_audio()
+        cutoff = timezone.now().isoformat()
+        output = StringIO()
+        call_command("retranscode", rendered_before=cutoff, processes=1, stdout=output)
+        self.assertIn(f"Rendered {audio.streams.count()} of {audio.streams.count()} stream(s)", output.getvalue())
+        self.assertFalse(audio.streams.filter(rendered_at__lt=cutoff).exists())
+        output = StringIO()
+        call_command("retranscode", rendered_before=cutoff, processes=1, stdout=output)
+        self.assertIn("Rendering 0 stream(s)", output.getvalue())
@@ -33,7 +33,9 @@ class TestAudioSerializer(TestCase):
 
     def test_fields(self) -> None:
         assert list(self.serialized_audio.data.keys()) == ["id", "title", "url", "description", "listen_count",
-                                                           "uploaded_at", "is_public", "authors", "streams"]
+                                                           "like_count", "liked_by_me", "uploaded_at", "is_public",
+                                                           "duration", "channels", "loudness", "peak", "rms",
+                                                           "authors", "streams"]
 
     def test_stream_creation(self) -> None:
         """Verifies the required streams are created."""
@@ -45,10 +47,27 @@ class TestAudioSerializer(TestCase):
         })
         serializer.is_valid()
         audio = serializer.save()
-        self.assertEquals(len(audio.streams.all()), 3, msg="There should be 3 streams associated with the Audio")
-        self.assertEquals(len(audio.streams.filter(bit_rate=Stream.AudioBitRate.HIGH)), 1)
-        self.assertEquals(len(audio.streams.filter(bit_rate=Stream.AudioBitRate.AVERAGE)), 1)
-        self.assertEquals(len(audio.streams.filter(bit_rate=Stream.AudioBitRate.LOW)), 1)
+        self.assertEquals(len(audio.streams.all()), 6, msg="There should be 6 streams associated with the Audio")
+        for audio_format in (Stream.AudioFormat.OGG, Stream.AudioFormat.AAC):
+            streams = audio.streams.filter(format=audio_format)
+            self.assertEquals(len(streams.filter(bit_rate=Stream.AudioBitRate.HIGH)), 1)
+            self.assertEquals(len(streams.filter(bit_rate=Stream.AudioBitRate.AVERAGE)), 1)
+            self.assertEquals(len(streams.filter(bit_rate=Stream.AudioBitRate.LOW)), 1)
+
+    def test_stream_creation_is_deferred(self) -> None:
+        """Verifies the streams are left pending with a queued transcode job instead of being rendered immediately."""
+        serializer = AudioSerializer(data={
+            "title": "test",
+            "description": "test",
+            "file": TEST_FILE
+        })
+        serializer.is_valid()
+        audio = serializer.save()
+        assert audio.source
+        for stream in audio.streams.all():
+            self.assertEquals(stream.status, Stream.StreamStatus.PENDING)
+            self.assertEquals(stream.transcode_jobs.count(), 1)
+            assert not stream.file
 
 
 class TestStreamSerializer(TestCase):
@@ -60,7 +79,9 @@ class TestStreamSerializer(TestCase):
 
     def test_fields(self) -> None:
         assert list(self.serialized_stream.data.keys()) == ["id", "url", "audio", "format", "bit_rate", "sample_rate",
-                                                            "allow_downloads", "file"]
+                                                            "allow_downloads", "status", "file", "duration",
+                                                            "channels", "actual_bit_rate", "actual_sample_rate",
+                                                            "size"]
 
 
 class TestEmbeddedStreamSerializer(TestCase):
@@ -72,4 +93,6 @@ class TestEmbeddedStreamSerializer(TestCase):
 
     def test_fields(self) -> None:
         assert list(self.serialized_stream.data.keys()) == ["id", "url", "format", "bit_rate", "sample_rate",
-                                                            "allow_downloads", "file"]
+                                                            "allow_downloads", "status", "file", "duration",
+                                                            "channels", "actual_bit_rate", "actual_sample_rate",
+                                                            "size"]
@@ -0,0 +1,82 @@
+#  Copyright (C) 2020  Mind Audio Central
+#
+#  This file is part of mac_backend_api.
+#
+#  mac_backend_api is free software: you can redistribute it and/or modify
+#  it under the terms of the GNU General Public License as published by
+#  the Free Software Foundation, either version 3 of the License, or
+#  (at your option) any later version.
+#
+#  mac_backend_api is distributed in the hope that it will be useful,
+#  but WITHOUT ANY WARRANTY; without even the implied warranty of
+#  MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+#  GNU General Public License for more details.
+#
+#  You should have received a copy of the GNU General Public License
+#  along with mac_backend_api.  If not, see <https://www.gnu.org/licenses/>.
+
+import hashlib
+import os
+import tempfile
+from unittest import mock
+
+from django.core.files.base import ContentFile
+from django.test import TestCase
+
+from mac_backend_api.audio.storage import ShardedContentStorage
+
+
+class TestShardedContentStorage(TestCase):
+    def setUp(self) -> None:
+        self.directory = tempfile.TemporaryDirectory()
+        self.storage = ShardedContentStorage(location=self.directory.name, prefix="objects", fsync="batch",
+                                             fsync_batch_size=3)
+
+    def tearDown(self) -> None:
+        self.directory.cleanup()
+
+    def test_save_shards_by_content(self) -> None:
+        """Verify files are named by the digest of their contents, sharded by its leading characters."""
+        digest = hashlib.sha256(b"content").hexdigest()
+        name = self.storage.save("audio/1/stream.OGG", ContentFile(b"content"))
+        self.assertEquals(name, f"objects/{digest[:2]}/{digest[2:4]}/{digest}.ogg")
+        with self.storage.open(name) as file:
+            self.assertEquals(file.read(), b"content")
+
+    def test_save_identical_content(self) -> None:
+        """Verify identical files are stored once, whatever name they were saved under."""
+        first = self.storage.save("first.ogg", ContentFile(b"content"))
+        second = self.storage.save("second.ogg", ContentFile(b"content"))
+        self.assertEquals(first, second)
+
+    def test_save_leaves_no_temporary_files(self) -> None:
+        """Verify the temporary file is renamed into place."""
+        self.storage.save("stream.ogg", ContentFile(b"content"))
+        self.assertEquals(os.listdir(self.storage.path("objects/tmp")), [])
+
+    def test_save_failure_removes_temporary_file(self) -> None:
+        """Verify a failed write does not leave a file behind."""
+        content = ContentFile(b"content")
+        with mock.patch.object(content, "chunks", side_effect=IOError):
+            with self.assertRaises(IOError):
+                self.storage.save("stream.ogg", content)
+        self.assertEquals(os.listdir(self.storage.path("objects/tmp")), [])
+
+    def test_batched_sync(self) -> None:
+        """Verify files are synced together once the batch is full."""
+        with mock.patch("os.fsync") as fsync:
+            self.storage.save("first.ogg", ContentFile(b"first"))
+            self.storage.save("second.ogg", ContentFile(b"second"))
+            self.assertEquals(len(self.storage.pending), 2)
+            fsync.assert_not_called()
+            self.storage.save("third.ogg", ContentFile(b"third"))
+        self.assertEquals(self.storage.pending, [])
+        self.assertGreaterEqual(fsync.call_count, 3)
+
+    def test_sync_every_file(self) -> None:
+        """Verify every file is synced as it is written when fsync is True."""
+        storage = ShardedContentStorage(location=self.directory.name, prefix="objects", fsync=True)
+        with mock.patch("os.fsync") as fsync:
+            storage.save("stream.ogg", ContentFile(b"content"))
+        self.assertEquals(fsync.call_count, 2)
+        self.assertEquals(storage.pending, [])
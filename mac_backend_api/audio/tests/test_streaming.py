@@ -0,0 +1,111 @@
+#  Copyright (C) 2020  Mind Audio Central
+#
+#  This file is part of mac_backend_api.
+#
+#  mac_backend_api is free software: you can redistribute it and/or modify
+#  it under the terms of the GNU General Public License as published by
+#  the Free Software Foundation, either version 3 of the License, or
+#  (at your option) any later version.
+#
+#  mac_backend_api is distributed in the hope that it will be useful,
+#  but WITHOUT ANY WARRANTY; without even the implied warranty of
+#  MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+#  GNU General Public License for more details.
+#
+#  You should have received a copy of the GNU General Public License
+#  along with mac_backend_api.  If not, see <https://www.gnu.org/licenses/>.
+
+from io import BytesIO
+
+from django.core.files.base import ContentFile
+from django.core.files.storage import default_storage
+from django.http import Http404, HttpResponse
+from django.test import RequestFactory, TestCase, override_settings
+
+from mac_backend_api.audio.middleware import MediaOffloadStandInMiddleware
+from mac_backend_api.audio.streaming import RangeFile, parse_range
+
+
+class TestParseRange(TestCase):
+    def test_no_header(self) -> None:
+        """Verify the whole file is served without a Range header."""
+        self.assertIsNone(parse_range(None, 100))
+
+    def test_bounded_range(self) -> None:
+        """Verify a bounded range is parsed as inclusive offsets."""
+        self.assertEquals(parse_range("bytes=10-19", 100), (10, 19))
+
+    def test_open_range(self) -> None:
+        """Verify an open ended range extends to the end of the file."""
+        self.assertEquals(parse_range("bytes=10-", 100), (10, 99))
+
+    def test_suffix_range(self) -> None:
+        """Verify a suffix range selects the last bytes of the file."""
+        self.assertEquals(parse_range("bytes=-10", 100), (90, 99))
+        self.assertEquals(parse_range("bytes=-1000", 100), (0, 99))
+
+    def test_end_past_file(self) -> None:
+        """Verify the end of a range is clamped to the end of the file."""
+        self.assertEquals(parse_range("bytes=90-1000", 100), (90, 99))
+
+    def test_unsatisfiable_range(self) -> None:
+        """Verify ranges starting past the end of the file cannot be satisfied."""
+        self.assertIs(parse_range("bytes=100-", 100), False)
+        self.assertIs(parse_range("bytes=-0", 100), False)
+
+    def test_unsupported_range(self) -> None:
+        """Verify multiple and malformed ranges are ignored."""
+        self.assertIsNone(parse_range("bytes=0-1,5-6", 100))
+        self.assertIsNone(parse_range("lines=0-1", 100))
+        self.assertIsNone(parse_range("bytes=-", 100))
+
+
+class TestRangeFile(TestCase):
+    def test_read(self) -> None:
+        """Verify reads never return bytes outside of the range."""
+        file = RangeFile(BytesIO(b"0123456789"), 2, 5)
+        self.assertEquals(file.read(3), b"234")
+        self.assertEquals(file.read(), b"56")
+        self.assertEquals(file.read(), b"")
+
+
+@override_settings(MEDIA_OFFLOAD_PREFIX="/protected/")
+class TestMediaOffloadStandInMiddleware(TestCase):
+    def setUp(self) -> None:
+        self.name = default_storage.save("offload.ogg", ContentFile(b"0123456789"))
+        self.request_factory = RequestFactory()
+
+    def tearDown(self) -> None:
+        default_storage.delete(self.name)
+
+    def test_x_accel_redirect(self) -> None:
+        """Verify X-Accel-Redirect responses are replaced with the requested range of the file."""
+        response = self.make_request("X-Accel-Redirect", f"/protected/{self.name}", HTTP_RANGE="bytes=0-3")
+        self.assertEquals(response.status_code, 206)
+        self.assertEquals(b"".join(response.streaming_content), b"0123")
+
+    def test_x_sendfile(self) -> None:
+        """Verify X-Sendfile responses are replaced with the file."""
+        response = self.make_request("X-Sendfile", default_storage.path(self.name))
+        self.assertEquals(response.status_code, 200)
+        self.assertEquals(b"".join(response.streaming_content), b"0123456789")
+
+    def test_outside_media_root(self) -> None:
+        """Verify files outside of MEDIA_ROOT are not served."""
+        with self.assertRaises(Http404):
+            self.make_request("X-Sendfile", "/etc/passwd")
+
+    def make_request(self, header, value, **headers) -> HttpResponse:
+        """
+        Make a request through the middleware to a view returning an offloaded response.
+        :param header:  The offload header set by the view.
+        :param value:   The value of the offload header.
+        :param headers: Extra request headers.
+        :return:        The response returned by the middleware.
+        """
+        def view(request):
+            response = HttpResponse(content_type="audio/ogg")
+            response[header] = value
+            return response
+
+        return MediaOffloadStandInMiddleware(view)(self.request_factory.get("", **headers))
@@ -0,0 +1,393 @@
+#  Copyright (C) 2020  Mind Audio Central
+#
+#  This file is part of mac_backend_api.
+#
+#  mac_backend_api is free software: you can redistribute it and/or modify
+#  it under the terms of the GNU General Public License as published by
+#  the Free Software Foundation, either version 3 of the License, or
+#  (at your option) any later version.
+#
+#  mac_backend_api is distributed in the hope that it will be useful,
+#  but WITHOUT ANY WARRANTY; without even the implied warranty of
+#  MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+#  GNU General Public License for more details.
+#
+#  You should have received a copy of the GNU General Public License
+#  along with mac_backend_api.  If not, see <https://www.gnu.org/licenses/>.
+
+import os
+import tempfile
+from datetime import timedelta
+from io import BytesIO, StringIO
+from unittest import mock
+
+from django.conf import settings
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.core.management import call_command
+from django.test import TestCase, override_settings
+from django.utils import timezone
+from pydub import AudioSegment
+from pydub.generators import Sine
+
+from mac_backend_api.audio.api.serializers import DEFAULT_STREAM_PRESETS, AudioSerializer
+from mac_backend_api.audio.models import CachedRendition, Segment, Stream, TranscodeJob
+from mac_backend_api.audio.transcoding.encoder import decode_to_pcm, encode_pcm
+from mac_backend_api.audio.transcoding.cache import evict_renditions, find_cached_rendition
+from mac_backend_api.audio.transcoding.on_demand import request_rendition, wait_for_rendition
+from mac_backend_api.audio.transcoding.queue import (MAX_ATTEMPTS, claim_jobs, enqueue_stream, requeue_expired_jobs,
+                                                     run_jobs)
+from mac_backend_api.audio.transcoding.scheduler import get_queue_metrics
+
+WAV_PRESETS = (
+    {
+        "format": Stream.AudioFormat.WAV,
+        "sample_rate": Stream.AudioSampleRate.AVERAGE,
+        "bit_rate": Stream.AudioBitRate.AVERAGE
+    },
+    {
+        "format": Stream.AudioFormat.WAV,
+        "sample_rate": Stream.AudioSampleRate.LOW,
+        "bit_rate": Stream.AudioBitRate.LOW
+    }
+)
+
+
+def make_wav_file(duration=1000, name="source.wav") -> SimpleUploadedFile:
+    """
+    Create an uploaded WAV file containing silence.
+    :param duration: The length of the audio in milliseconds.  Default is 1000.
+    :param name:     The name of the uploaded file.  Default is "source.wav".
+    :return:         The uploaded file.
+    """
+    buffer = BytesIO()
+    AudioSegment.silent(duration, frame_rate=48000).export(buffer, format="wav")
+    return SimpleUploadedFile(name, buffer.getvalue(), content_type="audio/wav")
+
+
+def create_audio(audio_file, presets=WAV_PRESETS):
+    """
+    Create an Audio through the AudioSerializer, replacing its default streams with the given presets.
+    :param audio_file: The uploaded source file.
+    :param presets:    The stream presets to queue.  Default is WAV_PRESETS.
+    :return:           The Audio instance.
+    """
+    serializer = AudioSerializer(data={"title": "test", "file": audio_file})
+    serializer.is_valid()
+    audio = serializer.save()
+    audio.streams.all().delete()
+    serializer.create_default_streams(audio, presets)
+    return audio
+
+
+class TestTranscodeQueue(TestCase):
+    def test_claim_jobs_marks_running(self) -> None:
+        """Verifies claimed jobs and their streams are marked as running."""
+        audio = create_audio(make_wav_file())
+        jobs = claim_jobs(limit=10)
+        self.assertEquals(len(jobs), len(WAV_PRESETS))
+        for job in jobs:
+            self.assertEquals(job.status, TranscodeJob.JobStatus.RUNNING)
+            self.assertEquals(job.attempts, 1)
+        for stream in audio.streams.all():
+            self.assertEquals(stream.status, Stream.StreamStatus.PROCESSING)
+
+    def test_claim_jobs_does_not_claim_twice(self) -> None:
+        """Verifies a job is only handed out once."""
+        create_audio(make_wav_file())
+        claim_jobs(limit=10)
+        self.assertEquals(claim_jobs(limit=10), [])
+
+    def test_claim_jobs_limit(self) -> None:
+        """Verifies jobs are claimed for at most `limit` audios, and all of an audio's jobs are claimed together."""
+        create_audio(make_wav_file())
+        create_audio(make_wav_file())
+        jobs = claim_jobs(limit=1)
+        self.assertEquals(len(jobs), len(WAV_PRESETS))
+        self.assertEquals(len({job.stream.audio_id for job in jobs}), 1)
+
+    def test_run_jobs(self) -> None:
+        """Verifies running a job renders the stream's file with the preset's sample-rate."""
+        audio = create_audio(make_wav_file())
+        run_jobs(claim_jobs(limit=10))
+        for stream in audio.streams.all():
+            self.assertEquals(stream.status, Stream.StreamStatus.READY)
+            self.assertEquals(AudioSegment.from_file(stream.file.path).frame_rate, stream.sample_rate)
+        self.assertEquals(TranscodeJob.objects.filter(status=TranscodeJob.JobStatus.DONE).count(), len(WAV_PRESETS))
+
+    def test_source_metadata_is_probed_at_upload(self) -> None:
+        """Verifies the source's metadata is stored on the Audio when it is uploaded."""
+        audio = create_audio(make_wav_file(duration=1500))
+        self.assertEquals(audio.duration, 1.5)
+        self.assertEquals(audio.channels, 1)
+        self.assertEquals(audio.source_sample_rate, 48000)
+        self.assertEquals(audio.source_size, audio.source.size)
+
+    def test_run_jobs_probes_renditions(self) -> None:
+        """Verifies each rendered stream's metadata is stored on the Stream."""
+        audio = create_audio(make_wav_file(duration=1500))
+        run_jobs(claim_jobs(limit=10))
+        for stream in audio.streams.all():
+            self.assertAlmostEqual(stream.duration, 1.5, places=3)
+            self.assertEquals(stream.channels, 1)
+            self.assertEquals(stream.actual_sample_rate, stream.sample_rate)
+            self.assertEquals(stream.size, stream.file.size)
+
+    def test_run_jobs_computes_waveforms(self) -> None:
+        """Verifies a waveform is stored for every configured resolution when the source is decoded."""
+        audio = create_audio(make_wav_file())
+        run_jobs(claim_jobs(limit=10))
+        self.assertEquals([waveform.samples_per_pixel for waveform in audio.waveforms.all()],
+                          list(settings.WAVEFORM_SAMPLES_PER_PIXEL))
+
+    def test_duplicate_upload_reuses_waveforms(self) -> None:
+        """Verifies an identical re-upload shares the first upload's waveform files."""
+        first = create_audio(make_wav_file())
+        run_jobs(claim_jobs(limit=10))
+        second = create_audio(make_wav_file())
+        self.assertEquals([waveform.file.name for waveform in second.waveforms.all()],
+                          [waveform.file.name for waveform in first.waveforms.all()])
+
+    @override_settings(TRANSCODE_SEGMENT_DURATION=0.4)
+    def test_run_jobs_stores_segments(self) -> None:
+        """Verifies each rendition is split into segments of the configured length."""
+        audio = create_audio(make_wav_file(duration=1000))
+        with mock.patch("mac_backend_api.audio.transcoding.queue.SEGMENT_FORMATS", ("wav",)):
+            run_jobs(claim_jobs(limit=10))
+        for stream in audio.streams.all():
+            self.assertEquals([segment.duration for segment in stream.segments.all()], [0.4, 0.4, 0.2])
+            self.assertEquals([segment.index for segment in stream.segments.all()], [0, 1, 2])
+
+    def test_run_jobs_segments_hls_formats_only(self) -> None:
+        """Verifies renditions in formats HLS cannot play are not segmented."""
+        audio = create_audio(make_wav_file())
+        run_jobs(claim_jobs(limit=10))
+        self.assertEquals(Segment.objects.filter(stream__audio=audio).count(), 0)
+
+    @override_settings(TRANSCODE_SEGMENT_DURATION=None)
+    def test_run_jobs_without_segments(self) -> None:
+        """Verifies no segments are written when segmented output is disabled."""
+        audio = create_audio(make_wav_file())
+        run_jobs(claim_jobs(limit=10))
+        self.assertEquals(Segment.objects.filter(stream__audio=audio).count(), 0)
+
+    def test_run_jobs_decodes_source_once(self) -> None:
+        """Verifies every rendition of an audio is encoded from a single decode of its source."""
+        audio = create_audio(make_wav_file())
+        with mock.patch("mac_backend_api.audio.transcoding.queue.decode_to_pcm", wraps=decode_to_pcm) as decode:
+            run_jobs(claim_jobs(limit=10))
+        self.assertEquals(decode.call_count, 1)
+        self.assertEquals(audio.streams.filter(status=Stream.StreamStatus.READY).count(), len(WAV_PRESETS))
+
+    def test_duplicate_upload_reuses_source_and_renditions(self) -> None:
+        """Verifies re-uploading an identical file shares the stored source and rendered streams of the first upload."""
+        first = create_audio(make_wav_file(name="first.wav"))
+        run_jobs(claim_jobs(limit=10))
+        second = create_audio(make_wav_file(name="second.wav"))
+        self.assertEquals(second.source_hash, first.source_hash)
+        self.assertEquals(second.source.name, first.source.name)
+        self.assertEquals(claim_jobs(limit=10), [])
+        for stream in second.streams.all():
+            self.assertEquals(stream.status, Stream.StreamStatus.READY)
+            self.assertEquals(stream.file.name, first.streams.get(sample_rate=stream.sample_rate).file.name)
+
+    def test_queued_duplicate_reuses_rendition(self) -> None:
+        """Verifies a job queued before an identical source was rendered reuses the rendition instead of encoding."""
+        first = create_audio(make_wav_file())
+        second = create_audio(make_wav_file())
+        run_jobs(claim_jobs(limit=1))
+        with mock.patch("mac_backend_api.audio.transcoding.queue.decode_to_pcm") as decode:
+            run_jobs(claim_jobs(limit=10))
+        decode.assert_not_called()
+        for stream in second.streams.all():
+            self.assertEquals(stream.status, Stream.StreamStatus.READY)
+            self.assertEquals(stream.file.name, first.streams.get(sample_rate=stream.sample_rate).file.name)
+
+    def test_failed_job_is_retried(self) -> None:
+        """Verifies a failed job is queued again until it runs out of attempts."""
+        audio = create_audio(SimpleUploadedFile("broken.wav", b"not audio"))
+        for attempt in range(MAX_ATTEMPTS):
+            run_jobs(claim_jobs(limit=10))
+        for stream in audio.streams.all():
+            self.assertEquals(stream.status, Stream.StreamStatus.FAILED)
+            job = stream.transcode_jobs.get()
+            self.assertEquals(job.status, TranscodeJob.JobStatus.FAILED)
+            self.assertEquals(job.attempts, MAX_ATTEMPTS)
+            assert job.error
+
+    def test_storing_rendition_fails_job(self) -> None:
+        """Verifies an error while storing a rendition fails the job instead of leaving it running."""
+        audio = create_audio(make_wav_file())
+        with mock.patch("mac_backend_api.audio.transcoding.queue.probe_file", side_effect=OSError("disk full")):
+            run_jobs(claim_jobs(limit=10))
+        for stream in audio.streams.all():
+            self.assertEquals(stream.status, Stream.StreamStatus.PENDING)
+            job = stream.transcode_jobs.get()
+            self.assertEquals(job.status, TranscodeJob.JobStatus.QUEUED)
+            self.assertEquals(job.error, "disk full")
+        self.assertEquals(len(claim_jobs(limit=10)), len(WAV_PRESETS))
+
+    def test_expired_jobs_are_requeued(self) -> None:
+        """Verifies jobs left running past the lease are claimed again, and running jobs within it are not."""
+        create_audio(make_wav_file())
+        claim_jobs(limit=10)
+        self.assertEquals(requeue_expired_jobs(timeout=60), 0)
+        TranscodeJob.objects.update(started_at=timezone.now() - timedelta(hours=2))
+        with override_settings(TRANSCODE_JOB_TIMEOUT=60 * 60):
+            jobs = claim_jobs(limit=10)
+        self.assertEquals(len(jobs), len(WAV_PRESETS))
+        for job in jobs:
+            self.assertEquals(job.attempts, 2)
+            assert job.error
+
+    @override_settings(TRANSCODE_LAZY_RENDITIONS=True)
+    def test_lazy_renditions(self) -> None:
+        """Verifies only the middle rendition of each format is queued at upload, the others on first request."""
+        audio = create_audio(make_wav_file(), presets=DEFAULT_STREAM_PRESETS)
+        self.assertEquals(set(TranscodeJob.objects.values_list("stream__format", flat=True)), {"ogg", "aac"})
+        self.assertEquals(TranscodeJob.objects.count(), 2)
+        self.assertEquals(audio.streams.filter(status=Stream.StreamStatus.DEFERRED).count(), 4)
+        deferred = audio.streams.filter(status=Stream.StreamStatus.DEFERRED).first()
+        self.assertTrue(request_rendition(deferred))
+        self.assertFalse(request_rendition(deferred))
+        self.assertEquals(deferred.transcode_jobs.count(), 1)
+
+    def test_wait_for_rendition(self) -> None:
+        """Verifies waiting returns the stream once a worker has rendered it."""
+        audio = create_audio(make_wav_file())
+        stream = audio.streams.first()
+        with mock.patch("time.sleep", side_effect=lambda seconds: run_jobs(claim_jobs(limit=10))):
+            stream = wait_for_rendition(stream, timeout=60)
+        self.assertEquals(stream.status, Stream.StreamStatus.READY)
+
+    def test_run_jobs_measures_loudness(self) -> None:
+        """Verifies the source's loudness is measured from the decoded PCM and copied to duplicate uploads."""
+        buffer = BytesIO()
+        Sine(440, sample_rate=48000).to_audio_segment(duration=1000, volume=-6).export(buffer, format="wav")
+        audio = create_audio(SimpleUploadedFile("sine.wav", buffer.getvalue()))
+        run_jobs(claim_jobs(limit=10))
+        audio.refresh_from_db()
+        self.assertAlmostEqual(audio.peak, -6, places=1)
+        self.assertAlmostEqual(audio.rms, -9, places=0)
+        self.assertIsNotNone(audio.loudness)
+        duplicate = create_audio(SimpleUploadedFile("duplicate.wav", buffer.getvalue()))
+        self.assertEquals(duplicate.loudness, audio.loudness)
+
+    def test_claim_jobs_by_priority(self) -> None:
+        """Verifies interactive jobs are claimed before older bulk jobs."""
+        bulk = create_audio(make_wav_file(name="bulk.wav", duration=500))
+        TranscodeJob.objects.update(priority=TranscodeJob.JobPriority.BULK)
+        interactive = create_audio(make_wav_file(name="interactive.wav"))
+        jobs = claim_jobs(limit=1)
+        self.assertEquals({job.stream.audio_id for job in jobs}, {interactive.id})
+        self.assertEquals(len(claim_jobs(limit=1)), bulk.streams.count())
+
+    def test_queue_metrics(self) -> None:
+        """Verifies the queue metrics count queued jobs by priority, and running jobs."""
+        create_audio(make_wav_file())
+        TranscodeJob.objects.filter(id=TranscodeJob.objects.first().id).update(priority=TranscodeJob.JobPriority.BULK)
+        metrics = get_queue_metrics()
+        self.assertEquals(metrics["queued"], {"interactive": len(WAV_PRESETS) - 1, "bulk": 1})
+        self.assertEquals(metrics["running"], 0)
+        self.assertIsNotNone(metrics["oldest_queued"])
+        claim_jobs(limit=1)
+        self.assertEquals(get_queue_metrics()["running"], len(WAV_PRESETS))
+
+    def test_transcode_worker_command(self) -> None:
+        """Verifies the worker command drains the queue using its process pool."""
+        audio = create_audio(make_wav_file())
+        call_command("transcode_worker", processes=1, once=True, stdout=StringIO())
+        for stream in audio.streams.all():
+            self.assertEquals(stream.status, Stream.StreamStatus.READY)
+
+
+class TestRenditionCache(TestCase):
+    def test_rendered_streams_are_cached(self) -> None:
+        """Verifies every rendered stream is cached with its segments."""
+        audio = create_audio(make_wav_file(duration=1000))
+        run_jobs(claim_jobs(limit=10))
+        self.assertEquals(CachedRendition.objects.count(), len(WAV_PRESETS))
+        for stream in audio.streams.all():
+            rendition = find_cached_rendition(stream)
+            self.assertEquals(rendition.file.name, stream.file.name)
+            self.assertEquals(rendition.segments.count(), stream.segments.count())
+
+    def test_retranscode_reuses_cache(self) -> None:
+        """Verifies re-queued streams are finished from the cache without being encoded again."""
+        audio = create_audio(make_wav_file())
+        run_jobs(claim_jobs(limit=10))
+        for stream in audio.streams.all():
+            enqueue_stream(stream)
+        with mock.patch("mac_backend_api.audio.transcoding.queue.encode_pcm") as encode:
+            run_jobs(claim_jobs(limit=10))
+        encode.assert_not_called()
+        self.assertFalse(audio.streams.exclude(status=Stream.StreamStatus.READY).exists())
+
+    def test_encoder_version_invalidates_cache(self) -> None:
+        """Verifies renditions cached by an older encoder are not reused."""
+        audio = create_audio(make_wav_file())
+        run_jobs(claim_jobs(limit=10))
+        stream = audio.streams.first()
+        with mock.patch("mac_backend_api.audio.transcoding.cache.ENCODER_VERSION", 2):
+            self.assertIsNone(find_cached_rendition(stream))
+
+    def test_evict_renditions(self) -> None:
+        """Verifies renditions only held by the cache are evicted above the budget, and their files deleted."""
+        audio = create_audio(make_wav_file())
+        run_jobs(claim_jobs(limit=10))
+        streams = list(audio.streams.all())
+        kept = find_cached_rendition(streams[0])
+        evicted = CachedRendition.objects.exclude(id=kept.id).get()
+        audio.streams.get(file=evicted.file.name).delete()
+        self.assertEquals(evict_renditions(max_size=evicted.total_size), 0)
+        self.assertEquals(evict_renditions(max_size=0), 1)
+        self.assertEquals(list(CachedRendition.objects.all()), [kept])
+        self.assertFalse(os.path.exists(evicted.file.path))
+        self.assertTrue(os.path.exists(kept.file.path))
+
+    def test_evict_keeps_referenced_renditions(self) -> None:
+        """Verifies renditions whose files are still used by a stream are neither counted nor evicted."""
+        audio = create_audio(make_wav_file())
+        run_jobs(claim_jobs(limit=10))
+        self.assertEquals(evict_renditions(max_size=0), 0)
+        self.assertEquals(CachedRendition.objects.count(), len(WAV_PRESETS))
+        for stream in audio.streams.all():
+            self.assertTrue(os.path.exists(stream.file.path))
+
+
+class TestEncoder(TestCase):
+    def setUp(self) -> None:
+        self.directory = tempfile.TemporaryDirectory()
+        self.source_path = os.path.join(self.directory.name, "source.wav")
+        self.pcm_path = os.path.join(self.directory.name, "source.pcm")
+        with open(self.source_path, "wb") as source:
+            source.write(make_wav_file(duration=500).read())
+
+    def tearDown(self) -> None:
+        self.directory.cleanup()
+
+    def test_decode_to_pcm(self) -> None:
+        """Verifies the decoded PCM file holds the source's raw samples."""
+        parameters = decode_to_pcm(self.source_path, self.pcm_path)
+        self.assertEquals(parameters, {"sample_width": 2, "frame_rate": 48000, "channels": 1})
+        self.assertEquals(os.path.getsize(self.pcm_path), 48000 // 2 * 2)
+
+    def test_encode_pcm(self) -> None:
+        """Verifies renditions encoded from the PCM file are resampled to the requested sample-rate."""
+        parameters = decode_to_pcm(self.source_path, self.pcm_path)
+        output_path = os.path.join(self.directory.name, "output.wav")
+        encode_pcm(self.pcm_path, parameters, output_path, Stream.AudioFormat.WAV, Stream.AudioBitRate.AVERAGE,
+                   Stream.AudioSampleRate.AVERAGE)
+        rendition = AudioSegment.from_file(output_path)
+        self.assertEquals(rendition.frame_rate, Stream.AudioSampleRate.AVERAGE)
+        self.assertEquals(len(rendition), 500)
+
+    def test_encode_pcm_segments(self) -> None:
+        """Verifies segments are written as separate files, the last one holding the remainder."""
+        parameters = decode_to_pcm(self.source_path, self.pcm_path)
+        output_path = os.path.join(self.directory.name, "output.wav")
+        durations = encode_pcm(self.pcm_path, parameters, output_path, Stream.AudioFormat.WAV,
+                               Stream.AudioBitRate.AVERAGE, Stream.AudioSampleRate.AVERAGE, self.directory.name, 0.2)
+        self.assertEquals(durations, [0.2, 0.2, 0.1])
+        for index, duration in enumerate(durations):
+            segment = AudioSegment.from_file(os.path.join(self.directory.name, f"{index}.wav"))
+            self.assertEquals(len(segment), duration * 1000)
@@ -0,0 +1,98 @@
+#  Copyright (C) 2020  Mind Audio Central
+#
+#  This file is part of mac_backend_api.
+#
+#  mac_backend_api is free software: you can redistribute it and/or modify
+#  it under the terms of the GNU General Public License as published by
+#  the Free Software Foundation, either version 3 of the License, or
+#  (at your option) any later version.
+#
+#  mac_backend_api is distributed in the hope that it will be useful,
+#  but WITHOUT ANY WARRANTY; without even the implied warranty of
+#  MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+#  GNU General Public License for more details.
+#
+#  You should have received a copy of the GNU General Public License
+#  along with mac_backend_api.  If not, see <https://www.gnu.org/licenses/>.
+from datetime import datetime, timedelta, timezone
+
+from django.test import TestCase, override_settings
+from mixer.backend.django import mixer
+
+from mac_backend_api.audio.models import Audio, Like, ListenRollup, TrendingScore
+from mac_backend_api.audio.trending import update_trending
+
+NOW = datetime(2020, 6, 10, 13, 30, tzinfo=timezone.utc)
+HOUR = datetime(2020, 6, 10, 12, tzinfo=timezone.utc)
+
+
+@override_settings(TRENDING_HALF_LIFE=24, TRENDING_WINDOW=7, TRENDING_LIKE_WEIGHT=5, TRENDING_MIN_SCORE=0.01)
+class TestUpdateTrending(TestCase):
+    def setUp(self) -> None:
+        self.audio = mixer.blend(Audio, is_public=True)
+        self.other = mixer.blend(Audio, is_public=True)
+
+    def get_scores(self) -> dict:
+        """
+        Get the stored trending scores.
+        :return: A dictionary mapping Audio ids to their score.
+        """
+        return dict(TrendingScore.objects.values_list("audio_id", "score"))
+
+    def test_decay(self) -> None:
+        """Verifies listens lose half of their weight every half-life, and likes are weighted."""
+        ListenRollup.objects.create(audio=self.audio, hour=HOUR - timedelta(hours=1), count=4)
+        ListenRollup.objects.create(audio=self.other, hour=HOUR - timedelta(hours=25), count=4)
+        mixer.blend(Like, audio=self.other, created_at=HOUR - timedelta(minutes=30))
+        self.assertEquals(update_trending(NOW), 2)
+        scores = self.get_scores()
+        self.assertAlmostEqual(scores[self.audio.id], 4)
+        self.assertAlmostEqual(scores[self.other.id], 7)
+        self.assertEquals(set(TrendingScore.objects.values_list("computed_through", flat=True)), {HOUR})
+
+    def test_incremental_matches_full(self) -> None:
+        """Verifies updating hour by hour gives the scores of one full computation."""
+        ListenRollup.objects.create(audio=self.audio, hour=HOUR - timedelta(hours=30), count=10)
+        update_trending(NOW - timedelta(hours=12))
+        ListenRollup.objects.create(audio=self.audio, hour=HOUR - timedelta(hours=6), count=3)
+        ListenRollup.objects.create(audio=self.other, hour=HOUR - timedelta(hours=2), count=8)
+        mixer.blend(Like, audio=self.audio, created_at=HOUR - timedelta(hours=3))
+        update_trending(NOW - timedelta(hours=5))
+        update_trending(NOW)
+        incremental = self.get_scores()
+        update_trending(NOW, full=True)
+        full = self.get_scores()
+        self.assertEquals(set(incremental), set(full))
+        for audio_id, score in full.items():
+            self.assertAlmostEqual(incremental[audio_id], score)
+
+    def test_late_listens_are_scored(self) -> None:
+        """Verifies listens flushed just after the end of an hour are scored with it."""
+        ListenRollup.objects.create(audio=self.other, hour=HOUR - timedelta(hours=3), count=1)
+        update_trending(HOUR + timedelta(seconds=1))
+        ListenRollup.objects.create(audio=self.audio, hour=HOUR - timedelta(hours=1), count=4)
+        update_trending(NOW)
+        self.assertAlmostEqual(self.get_scores()[self.audio.id], 4)
+
+    def test_up_to_date(self) -> None:
+        """Verifies running again in the same hour changes nothing."""
+        ListenRollup.objects.create(audio=self.audio, hour=HOUR - timedelta(hours=1), count=4)
+        update_trending(NOW)
+        self.assertEquals(update_trending(NOW + timedelta(minutes=10)), 0)
+        self.assertAlmostEqual(self.get_scores()[self.audio.id], 4)
+
+    def test_excludes_private_and_old(self) -> None:
+        """Verifies private audios and activity outside the window are not scored, and decayed scores are removed."""
+        private = mixer.blend(Audio, is_public=False)
+        ListenRollup.objects.create(audio=private, hour=HOUR - timedelta(hours=1), count=4)
+        ListenRollup.objects.create(audio=self.audio, hour=HOUR - timedelta(days=8), count=1000)
+        ListenRollup.objects.create(audio=self.other, hour=HOUR - timedelta(hours=1), count=1)
+        update_trending(NOW)
+        self.assertEquals(set(self.get_scores()), {self.other.id})
+        self.other.is_public = False
+        self.other.save()
+        mixer.blend(Like, audio=self.audio, created_at=HOUR)
+        update_trending(NOW + timedelta(hours=1))
+        self.assertEquals(set(self.get_scores()), {self.audio.id})
+        update_trending(NOW + timedelta(days=30))
+        self.assertEquals(self.get_scores(), {})
@@ -14,19 +14,32 @@
 #
 #  You should have received a copy of the GNU General Public License
 #  along with mac_backend_api.  If not, see <https://www.gnu.org/licenses/>.
-
+import fcntl
+import os
+from datetime import timedelta
 from io import BytesIO
+from unittest import mock
 
 from django.contrib.auth import get_user_model
 from django.contrib.auth.models import Permission
+from django.core.files.base import ContentFile
 from django.core.files.uploadedfile import InMemoryUploadedFile
-from django.test import TestCase
+from django.db import connection
+from django.test import TestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+from django.utils import timezone
 from mixer.backend.django import mixer
 from rest_framework.response import Response
 from rest_framework.test import APIRequestFactory, force_authenticate
 
-from mac_backend_api.audio.api.views import AudioViewSet, StreamViewSet
-from mac_backend_api.audio.models import Audio, Stream
+from mac_backend_api.audio.api.serializers import HLS_STREAM_PRESETS, AudioSerializer
+from mac_backend_api.audio.api.views import AudioViewSet, StreamViewSet, TranscodeQueueViewSet, UploadSessionViewSet
+from mac_backend_api.audio.exceptions import UploadConflictException
+from mac_backend_api.audio.models import (Audio, ListenRollup, Segment, Stream, TrendingScore, UploadSession,
+                                          Waveform)
+from mac_backend_api.audio.tests.test_transcoding import make_wav_file
+from mac_backend_api.audio.transcoding.encoder import EXPORT_SETTINGS
+from mac_backend_api.audio.transcoding.queue import claim_jobs, run_jobs
 
 User = get_user_model()
 
@@ -101,11 +114,138 @@ class TestAudioViewSet(TestCase):
         response = self.make_get_request(view_name="list")
         self.assertEquals(response.status_code, 200, msg=response.data)
 
+    def test_list_view_likes(self) -> None:
+        """Verify the list view includes each audio's like count and whether the current user likes it."""
+        liked, other = make_public(blend_audio(count=2))
+        user = blend_user()
+        liked.add_like(user)
+        response = self.make_get_request(view_name="list", user=user)
+        results = {audio["id"]: audio for audio in response.data}
+        self.assertEquals(results[liked.id]["like_count"], 1)
+        self.assertTrue(results[liked.id]["liked_by_me"])
+        self.assertEquals(results[other.id]["like_count"], 0)
+        self.assertFalse(results[other.id]["liked_by_me"])
+        response = self.make_get_request(view_name="list")
+        self.assertFalse(any(audio["liked_by_me"] for audio in response.data))
+
+    def test_list_view_query_count(self) -> None:
+        """Verify the list view's queries do not grow with the number of audios."""
+        user = blend_user()
+
+        def count_queries() -> int:
+            with CaptureQueriesContext(connection) as context:
+                self.make_get_request(view_name="list", user=user)
+            return len(context)
+
+        for audio in make_public(blend_audio(count=2)):
+            audio.authors.add(user)
+            audio.add_like(user)
+            mixer.blend(Stream, audio=audio)
+        small = count_queries()
+        for audio in make_public(blend_audio(count=8)):
+            audio.authors.add(blend_user())
+            audio.add_like(user)
+            mixer.blend(Stream, audio=audio)
+        self.assertEquals(count_queries(), small)
+
     def test_retrieve_view(self) -> None:
         """Verify the retrieve view returns a 200 for unauthenticated users when provided a valid id."""
         response = self.make_get_request(view_name="retrieve", audio=blend_audio())
         self.assertEquals(response.status_code, 200, msg=response.data)
 
+    def test_list_view_filter_by_duration(self) -> None:
+        """Verify the list view only returns audio within the requested duration range."""
+        short, long = make_public(blend_audio(count=2))
+        Audio.objects.filter(id=short.id).update(duration=30)
+        Audio.objects.filter(id=long.id).update(duration=600)
+        response = self.make_list_request({"min_duration": 60})
+        self.assertEquals([audio["id"] for audio in response.data], [long.id])
+
+    def test_list_view_filter_invalid_value(self) -> None:
+        """Verify the list view returns a 400 when a filter value has the wrong type."""
+        response = self.make_list_request({"channels": "stereo"})
+        self.assertEquals(response.status_code, 400, msg=response.data)
+
+    def test_list_view_ordering_by_duration(self) -> None:
+        """Verify the list view can be sorted by duration."""
+        audios = make_public(blend_audio(count=3))
+        for duration, audio in zip((120, 30, 60), audios):
+            Audio.objects.filter(id=audio.id).update(duration=duration)
+        response = self.make_list_request({"ordering": "-duration"})
+        self.assertEquals([audio["duration"] for audio in response.data], [120, 60, 30])
+
+    def test_waveform_view(self) -> None:
+        """Verify the waveform view serves the closest stored resolution with a long cache lifetime."""
+        audio = blend_audio()
+        for samples_per_pixel in (256, 1024, 4096):
+            waveform = Waveform(audio=audio, samples_per_pixel=samples_per_pixel)
+            waveform.file.save("waveform.dat", ContentFile(str(samples_per_pixel).encode()))
+        response = self.make_waveform_request(audio, {"samples_per_pixel": 512})
+        self.assertEquals(response.status_code, 200)
+        self.assertEquals(b"".join(response.streaming_content), b"1024")
+        self.assertIn("immutable", response["Cache-Control"])
+        response = self.make_waveform_request(audio, {"samples_per_pixel": 100000})
+        self.assertEquals(b"".join(response.streaming_content), b"4096")
+
+    def test_waveform_view_not_computed(self) -> None:
+        """Verify the waveform view returns a 404 when the waveform has not been computed."""
+        response = self.make_waveform_request(blend_audio(), {})
+        self.assertEquals(response.status_code, 404, msg=response.data)
+
+    def make_waveform_request(self, audio, query) -> Response:
+        """
+        Make a get request to the waveform view and return its response.
+        :param audio: The audio to request the waveform of.
+        :param query: A dictionary of query parameters.
+        :return:      The response from the view.
+        """
+        view = self.view_set.as_view({"get": "waveform"})
+        return view(self.request_factory.get("", data=query), id=audio.id)
+
+    def test_playlist_view(self) -> None:
+        """Verify the playlist view lists a variant for each segmented stream in a format HLS supports."""
+        audio = blend_audio()
+        formats = (audio_format for audio_format in ("mp3", "aac", "ogg"))
+        segmented, unsegmented, ogg = mixer.cycle(3).blend(Stream, audio=audio, status=Stream.StreamStatus.READY,
+                                                           format=formats)
+        mixer.blend(Segment, stream=segmented, index=0, duration=6)
+        mixer.blend(Segment, stream=ogg, index=0, duration=6)
+        view = self.view_set.as_view({"get": "playlist"})
+        response = view(self.request_factory.get(""), id=audio.id)
+        self.assertEquals(response.status_code, 200)
+        self.assertEquals(response["Content-Type"], "application/vnd.apple.mpegurl")
+        self.assertIn(f"/api/stream/{segmented.id}/playlist/", response.content.decode())
+        self.assertNotIn(unsegmented.id, response.content.decode())
+        self.assertNotIn(ogg.id, response.content.decode())
+
+    def test_playlist_view_default_presets(self) -> None:
+        """Verify an upload rendered with the default presets gets a master playlist of its HLS renditions."""
+        serializer = AudioSerializer(data={"title": "test", "file": make_wav_file()})
+        serializer.is_valid(raise_exception=True)
+        audio = serializer.save()
+        # The tests cannot rely on ffmpeg, so every rendition is encoded as WAV under its own format's name.
+        with mock.patch.dict(EXPORT_SETTINGS, {"aac": EXPORT_SETTINGS["wav"], "ogg": EXPORT_SETTINGS["wav"]}):
+            run_jobs(claim_jobs(limit=10))
+        view = self.view_set.as_view({"get": "playlist"})
+        response = view(self.request_factory.get(""), id=audio.id)
+        self.assertEquals(response.status_code, 200)
+        self.assertEquals(response.content.decode().count('CODECS="mp4a.40.2"'), len(HLS_STREAM_PRESETS))
+
+    def test_playlist_view_without_segments(self) -> None:
+        """Verify the playlist view returns a 404 when the audio has no segmented streams."""
+        view = self.view_set.as_view({"get": "playlist"})
+        response = view(self.request_factory.get(""), id=blend_audio().id)
+        self.assertEquals(response.status_code, 404, msg=response.data)
+
+    def make_list_request(self, query) -> Response:
+        """
+        Make a get request with query parameters to the list view and return its response.
+        :param query: A dictionary of query parameters.
+        :return:      The Response from the view.
+        """
+        view = self.view_set.as_view({"get": "list"})
+        return view(self.request_factory.get("", data=query))
+
     def make_get_request(self, view_name, audio=None, user=None) -> Response:
         """
         Make a get request to the specified view and return its response.
@@ -145,6 +285,21 @@ class TestAudioViewSet(TestCase):
         response = self.make_create_request(audio_file=TEST_FILE)
         self.assertEquals(response.status_code, 401, msg=response.data)
 
+    @override_settings(TRANSCODE_QUEUE_HIGH_WATER_MARK=0, TRANSCODE_RETRY_AFTER=30)
+    def test_create_view_above_high_water_mark(self) -> None:
+        """Verify the create view accepts uploads with a 202 while the transcode queue is backed up."""
+        response = self.make_create_request(audio_file=TEST_FILE, user=blend_user("Can add audio"))
+        self.assertEquals(response.status_code, 202, msg=response.data)
+        self.assertEquals(response["Retry-After"], "30")
+
+    @override_settings(TRANSCODE_QUEUE_MAX_DEPTH=0, TRANSCODE_RETRY_AFTER=30)
+    def test_create_view_queue_full(self) -> None:
+        """Verify the create view refuses uploads with a 503 once the transcode queue is full."""
+        response = self.make_create_request(audio_file=TEST_FILE, user=blend_user("Can add audio"))
+        self.assertEquals(response.status_code, 503, msg=response.data)
+        self.assertEquals(response["Retry-After"], "30")
+        self.assertFalse(Audio.objects.exists())
+
     def make_create_request(self, audio_file=None, user=None) -> Response:
         """
         Make a request to the create view and return its response.
@@ -245,6 +400,163 @@ class TestAudioViewSet(TestCase):
             request.user = user
         return view(request, id=audio.id)
 
+    def test_like_view(self) -> None:
+        """Verify the like view likes the audio once, however often it is called."""
+        audio, user = blend_audio(), blend_user()
+        self.make_like_request("like", audio, user)
+        response = self.make_like_request("like", audio, user)
+        self.assertEquals(response.status_code, 200, msg=response.data)
+        self.assertEquals(response.data, {"id": audio.id, "liked": True, "like_count": 1})
+        self.assertTrue(audio.like_set.filter(user=user).exists())
+
+    def test_unlike_view(self) -> None:
+        """Verify the unlike view removes the user's like, however often it is called."""
+        audio, user = blend_audio(), blend_user()
+        audio.add_like(user)
+        self.make_like_request("unlike", audio, user)
+        response = self.make_like_request("unlike", audio, user)
+        self.assertEquals(response.status_code, 200, msg=response.data)
+        self.assertEquals(response.data, {"id": audio.id, "liked": False, "like_count": 0})
+
+    def test_like_view_no_user(self) -> None:
+        """Verify the like view returns a 401 when the user is unauthenticated."""
+        response = self.make_like_request("like", blend_audio())
+        self.assertEquals(response.status_code, 401, msg=response.data)
+
+    def make_like_request(self, view_name, audio, user=None) -> Response:
+        """
+        Make a post request to the like or unlike view and return its response.
+        :param view_name: "like" or "unlike".
+        :param audio:     The audio to like or unlike.
+        :param user:      The user making the request if any.  Default is None.
+        :return:          The Response from the view.
+        """
+        view = self.view_set.as_view({"post": view_name}, **getattr(self.view_set, view_name).kwargs)
+        request = self.request_factory.post("")
+        if user is not None:
+            force_authenticate(request, user)
+        return view(request, id=audio.id)
+
+    def test_like_batch_view(self) -> None:
+        """Verify the like batch view applies the last operation for each audio and skips missing audios."""
+        liked, unliked, untouched = blend_audio(count=3)
+        user = blend_user()
+        unliked.add_like(user)
+        untouched.add_like(blend_user())
+        response = self.make_like_batch_request([
+            {"audio": liked.id, "liked": False},
+            {"audio": liked.id, "liked": True},
+            {"audio": unliked.id, "liked": False},
+            {"audio": untouched.id, "liked": False},
+            {"audio": "missing", "liked": True},
+        ], user)
+        self.assertEquals(response.status_code, 200, msg=response.data)
+        self.assertEquals(response.data["liked"], [liked.id])
+        self.assertEquals(response.data["not_found"], ["missing"])
+        self.assertEquals(list(user.like_set.values_list("audio_id", flat=True)), [liked.id])
+        for audio, like_count in ((liked, 1), (unliked, 0), (untouched, 1)):
+            audio.refresh_from_db()
+            self.assertEquals(audio.like_count, like_count)
+
+    def test_like_batch_view_query_count(self) -> None:
+        """Verify the like batch view's queries do not grow with the number of operations."""
+        user = blend_user()
+        audios = blend_audio(count=20)
+        with CaptureQueriesContext(connection) as small:
+            self.make_like_batch_request([{"audio": audio.id, "liked": True} for audio in audios[:2]], user)
+        with CaptureQueriesContext(connection) as large:
+            self.make_like_batch_request([{"audio": audio.id, "liked": True} for audio in audios[2:]], user)
+        self.assertEquals(len(large), len(small))
+
+    @override_settings(LIKE_BATCH_MAX_SIZE=1)
+    def test_like_batch_view_too_large(self) -> None:
+        """Verify the like batch view returns a 400 when too many operations are sent."""
+        audios = blend_audio(count=2)
+        response = self.make_like_batch_request([{"audio": audio.id, "liked": True} for audio in audios],
+                                                blend_user())
+        self.assertEquals(response.status_code, 400, msg=response.data)
+
+    def make_like_batch_request(self, operations, user) -> Response:
+        """
+        Make a post request to the like batch view and return its response.
+        :param operations: The like operations to send.
+        :param user:       The user making the request.
+        :return:           The Response from the view.
+        """
+        view = self.view_set.as_view({"post": "like_batch"}, **self.view_set.like_batch.kwargs)
+        request = self.request_factory.post("", data={"operations": operations}, format="json")
+        force_authenticate(request, user)
+        return view(request)
+
+    def test_listen_series_view(self) -> None:
+        """Verify the listen series view returns the audio's rollups to its authors."""
+        audio, author = blend_audio(), blend_user()
+        audio.authors.add(author)
+        now = timezone.now()
+        ListenRollup.objects.create(audio=audio, hour=now - timedelta(days=1), count=3)
+        ListenRollup.objects.create(audio=audio, hour=now - timedelta(days=10), count=5)
+        response = self.make_listen_series_request("listen_series", author, {"interval": "day"}, id=audio.id)
+        self.assertEquals(response.status_code, 200, msg=response.data)
+        self.assertEquals([point["count"] for point in response.data["series"]], [3])
+        self.assertEquals(response.data["interval"], "day")
+
+    def test_listen_series_view_not_author(self) -> None:
+        """Verify the listen series view returns a 403 to users who are not the audio's authors."""
+        response = self.make_listen_series_request("listen_series", blend_user(), id=blend_audio().id)
+        self.assertEquals(response.status_code, 403, msg=response.data)
+
+    def test_listen_series_view_invalid_range(self) -> None:
+        """Verify the listen series view returns a 400 when the range ends before it starts."""
+        audio, author = blend_audio(), blend_user()
+        audio.authors.add(author)
+        query = {"since": "2020-06-02T00:00:00Z", "until": "2020-06-01T00:00:00Z"}
+        response = self.make_listen_series_request("listen_series", author, query, id=audio.id)
+        self.assertEquals(response.status_code, 400, msg=response.data)
+
+    def test_author_listen_series_view(self) -> None:
+        """Verify the author listen series view combines the rollups of the author's audios."""
+        author = blend_user()
+        hour = timezone.now().replace(minute=0, second=0, microsecond=0) - timedelta(hours=1)
+        for audio in blend_audio(count=2):
+            audio.authors.add(author)
+            ListenRollup.objects.create(audio=audio, hour=hour, count=2)
+        ListenRollup.objects.create(audio=blend_audio(), hour=hour, count=7)
+        response = self.make_listen_series_request("author_listen_series", author)
+        self.assertEquals(response.status_code, 200, msg=response.data)
+        self.assertEquals(response.data["series"], [{"time": hour, "count": 4}])
+        response = self.make_listen_series_request("author_listen_series", blend_user(), {"author": author.username})
+        self.assertEquals(response.status_code, 403, msg=response.data)
+
+    def test_trending_view(self) -> None:
+        """Verify the trending view lists the scored public audios by descending score."""
+        audios = make_public(blend_audio(count=3))
+        now = timezone.now()
+        TrendingScore.objects.create(audio=audios[0], score=1, computed_through=now)
+        TrendingScore.objects.create(audio=audios[1], score=5, computed_through=now)
+        private = blend_audio()
+        TrendingScore.objects.create(audio=private, score=10, computed_through=now)
+        view = self.view_set.as_view({"get": "trending"})
+        response = view(self.request_factory.get(""))
+        self.assertEquals(response.status_code, 200, msg=response.data)
+        self.assertEquals([audio["id"] for audio in response.data], [audios[1].id, audios[0].id])
+        response = view(self.request_factory.get("", data={"limit": 1}))
+        self.assertEquals([audio["id"] for audio in response.data], [audios[1].id])
+        response = view(self.request_factory.get("", data={"limit": "many"}))
+        self.assertEquals(response.status_code, 400, msg=response.data)
+
+    def make_listen_series_request(self, view_name, user, query=None, **kwargs) -> Response:
+        """
+        Make a get request to a listen series view and return its response.
+        :param view_name: "listen_series" or "author_listen_series".
+        :param user:      The user making the request.
+        :param query:     The query parameters.  Default is None.
+        :return:          The Response from the view.
+        """
+        view = self.view_set.as_view({"get": view_name}, **getattr(self.view_set, view_name).kwargs)
+        request = self.request_factory.get("", data=query)
+        force_authenticate(request, user)
+        return view(request, **kwargs)
+
 
 def blend_stream(count=1):
     """
@@ -372,6 +684,169 @@ class TestStreamViewSet(TestCase):
         response = self.make_update_request(stream=stream, user=user)
         self.assertEquals(response.status_code, 200, msg=response.data)
 
+    def test_playlist_view(self) -> None:
+        """Verify the playlist view lists the stream's segments."""
+        stream = blend_stream()
+        for index in range(2):
+            mixer.blend(Segment, stream=stream, index=index, duration=6)
+        view = self.view_set.as_view({"get": "playlist"})
+        response = view(self.request_factory.get(""), id=stream.id)
+        self.assertEquals(response.status_code, 200)
+        self.assertEquals(response.content.decode().count("#EXTINF:6.000,"), 2)
+        self.assertIn(f"/api/stream/{stream.id}/segments/1/", response.content.decode())
+
+    def test_segment_view(self) -> None:
+        """Verify the segment view serves a segment's file, and returns a 404 for a missing index."""
+        stream = mixer.blend(Stream, format="mp3", status=Stream.StreamStatus.READY)
+        segment = mixer.blend(Segment, stream=stream, index=0, duration=6)
+        segment.file.save("0.mp3", ContentFile(b"0123456789"))
+        view = self.view_set.as_view({"get": "segment"})
+        response = view(self.request_factory.get(""), id=stream.id, index="0")
+        self.assertEquals(response.status_code, 200)
+        self.assertEquals(b"".join(response.streaming_content), b"0123456789")
+        self.assertEquals(response["Content-Type"], "audio/mpeg")
+        response = view(self.request_factory.get(""), id=stream.id, index="1")
+        self.assertEquals(response.status_code, 404)
+
+    def test_media_view(self) -> None:
+        """Verify the media view serves the whole file and advertises range support."""
+        stream = self.blend_stream_with_file()
+        response = self.make_media_request(stream)
+        self.assertEquals(response.status_code, 200)
+        self.assertEquals(b"".join(response.streaming_content), b"0123456789")
+        self.assertEquals(response["Accept-Ranges"], "bytes")
+        self.assertEquals(response["Content-Type"], "audio/ogg")
+
+    def test_media_view_range(self) -> None:
+        """Verify the media view returns a 206 containing only the requested range."""
+        stream = self.blend_stream_with_file()
+        response = self.make_media_request(stream, HTTP_RANGE="bytes=2-5")
+        self.assertEquals(response.status_code, 206)
+        self.assertEquals(b"".join(response.streaming_content), b"2345")
+        self.assertEquals(response["Content-Range"], "bytes 2-5/10")
+        self.assertEquals(response["Content-Length"], "4")
+
+    def test_media_view_counts_listens(self) -> None:
+        """Verify requests starting at the beginning of the file count as a listen, and resumed requests do not."""
+        stream = self.blend_stream_with_file()
+        self.make_media_request(stream)
+        self.make_media_request(stream, HTTP_RANGE="bytes=0-")
+        self.make_media_request(stream, HTTP_RANGE="bytes=2-5")
+        stream.audio.refresh_from_db()
+        self.assertEquals(stream.audio.listen_count, 2)
+
+    def test_media_view_unsatisfiable_range(self) -> None:
+        """Verify the media view returns a 416 when the range starts past the end of the file."""
+        stream = self.blend_stream_with_file()
+        response = self.make_media_request(stream, HTTP_RANGE="bytes=20-")
+        self.assertEquals(response.status_code, 416)
+        self.assertEquals(response["Content-Range"], "bytes */10")
+
+    def test_media_view_stale_if_range(self) -> None:
+        """Verify the media view ignores the range when If-Range does not match the file."""
+        stream = self.blend_stream_with_file()
+        response = self.make_media_request(stream, HTTP_RANGE="bytes=2-5", HTTP_IF_RANGE='"stale"')
+        self.assertEquals(response.status_code, 200)
+
+    def test_media_view_not_modified(self) -> None:
+        """Verify the media view returns a 304 when the client's ETag is current."""
+        stream = self.blend_stream_with_file()
+        etag = self.make_media_request(stream)["ETag"]
+        response = self.make_media_request(stream, HTTP_IF_NONE_MATCH=etag)
+        self.assertEquals(response.status_code, 304)
+
+    def test_media_view_not_ready(self) -> None:
+        """Verify the media view returns a 503 with Retry-After for streams which are still being rendered."""
+        stream = self.blend_stream_with_file()
+        stream.status = Stream.StreamStatus.PENDING
+        stream.save()
+        response = self.make_media_request(stream)
+        self.assertEquals(response.status_code, 503)
+        self.assertTrue(response.has_header("Retry-After"))
+
+    def test_media_view_failed(self) -> None:
+        """Verify the media view returns a 404 for streams which could not be rendered."""
+        stream = self.blend_stream_with_file()
+        stream.status = Stream.StreamStatus.FAILED
+        stream.save()
+        response = self.make_media_request(stream)
+        self.assertEquals(response.status_code, 404)
+
+    def test_media_view_deferred(self) -> None:
+        """Verify requesting a deferred stream queues a single render however many requests are made."""
+        stream = self.blend_stream_with_file()
+        stream.status = Stream.StreamStatus.DEFERRED
+        stream.save()
+        for _ in range(3):
+            self.assertEquals(self.make_media_request(stream).status_code, 503)
+        stream.refresh_from_db()
+        self.assertEquals(stream.status, Stream.StreamStatus.PENDING)
+        self.assertEquals(stream.transcode_jobs.count(), 1)
+
+    def test_media_view_download_not_allowed(self) -> None:
+        """Verify downloads are refused when the stream does not allow them and the user is not an author."""
+        stream = self.blend_stream_with_file()
+        response = self.make_media_request(stream, query="?download=true", user=blend_user())
+        self.assertEquals(response.status_code, 403)
+
+    def test_media_view_download_by_author(self) -> None:
+        """Verify authors can download their streams even if downloads are not allowed."""
+        stream = self.blend_stream_with_file()
+        user = blend_user()
+        stream.audio.authors.add(user)
+        response = self.make_media_request(stream, query="?download=true", user=user)
+        self.assertEquals(response.status_code, 200)
+        self.assertTrue(response["Content-Disposition"].startswith("attachment"))
+
+    @override_settings(MEDIA_OFFLOAD="x-accel-redirect", MEDIA_OFFLOAD_PREFIX="/protected/")
+    def test_media_view_x_accel_redirect(self) -> None:
+        """Verify the media view hands the file to nginx when offloading is enabled."""
+        stream = self.blend_stream_with_file()
+        response = self.make_media_request(stream)
+        self.assertEquals(response.status_code, 200)
+        self.assertEquals(response["X-Accel-Redirect"], f"/protected/{stream.file.name}")
+        self.assertEquals(response.content, b"")
+
+    @override_settings(MEDIA_OFFLOAD="x-sendfile")
+    def test_media_view_x_sendfile(self) -> None:
+        """Verify the media view sends the file's path when X-Sendfile offloading is enabled."""
+        stream = self.blend_stream_with_file()
+        response = self.make_media_request(stream)
+        self.assertEquals(response["X-Sendfile"], stream.file.path)
+
+    @override_settings(MEDIA_OFFLOAD="x-sendfile")
+    def test_media_view_offload_download_not_allowed(self) -> None:
+        """Verify download permissions are checked before offloading."""
+        stream = self.blend_stream_with_file()
+        response = self.make_media_request(stream, query="?download=true", user=blend_user())
+        self.assertEquals(response.status_code, 403)
+        self.assertFalse(response.has_header("X-Sendfile"))
+
+    def blend_stream_with_file(self) -> Stream:
+        """
+        Blend a ready, non-downloadable ogg stream with a ten byte file.
+        :return: The Stream instance.
+        """
+        stream = mixer.blend(Stream, format="ogg", allow_downloads=False, status=Stream.StreamStatus.READY)
+        stream.file.save("media.ogg", ContentFile(b"0123456789"))
+        return stream
+
+    def make_media_request(self, stream, query="", user=None, **headers) -> Response:
+        """
+        Make a request to the media view and return its response.
+        :param stream:  The stream to request.
+        :param query:   The query string of the request.  Default is "".
+        :param user:    The user making the request if any.  Default is None.
+        :param headers: Extra request headers.
+        :return:        The Response from the view.
+        """
+        view = self.view_set.as_view({"get": "media"})
+        request = self.request_factory.get(query, **headers)
+        if user is not None:
+            force_authenticate(request, user)
+            request.user = user
+        return view(request, id=stream.id)
+
     def make_update_request(self, stream, user=None) -> Response:
         """
         Make a request to the update view and return its response.
@@ -427,3 +902,254 @@ class TestStreamViewSet(TestCase):
             force_authenticate(request, user)
             request.user = user
         return view(request, id=stream.id)
+
+
+class TestUploadSessionViewSet(TestCase):
+    def setUp(self) -> None:
+        self.view_set = UploadSessionViewSet
+        self.request_factory = APIRequestFactory()
+        self.user = blend_user("Can add audio")
+        self.content = bytes(range(256)) * 4
+        self.data = {
+            "title": "Hello, world!",
+            "description": "This is a test.",
+            "filename": "long_recording.wav",
+            "size": len(self.content)
+        }
+
+    def test_create_view(self) -> None:
+        """Verify the create view returns a 201 with an offset of 0."""
+        response = self.make_create_request(user=self.user)
+        self.assertEquals(response.status_code, 201, msg=response.data)
+        self.assertEquals(response.data["offset"], 0)
+
+    def test_create_view_no_permission(self) -> None:
+        """Verify the create view returns a 403 when the user is missing permissions."""
+        response = self.make_create_request(user=blend_user())
+        self.assertEquals(response.status_code, 403, msg=response.data)
+
+    def test_create_view_no_user(self) -> None:
+        """Verify the create view returns a 401 when the user is unauthenticated."""
+        response = self.make_create_request()
+        self.assertEquals(response.status_code, 401, msg=response.data)
+
+    def make_create_request(self, user=None) -> Response:
+        """
+        Make a request to the create view and return its response.
+        :param user: The user making the request if any.  Default is None.
+        :return:     The Response from the view.
+        """
+        view = self.view_set.as_view({"post": "create"})
+        request = self.request_factory.post("", data=self.data, format="json")
+        if user is not None:
+            force_authenticate(request, user)
+            request.user = user
+        return view(request)
+
+    def test_update_view_writes_chunks(self) -> None:
+        """Verify chunks are appended to the file and the offset advances."""
+        session = self.create_session()
+        response = self.make_update_request(session, 0, 511)
+        self.assertEquals(response.status_code, 200, msg=response.data)
+        self.assertEquals(response.data["offset"], 512)
+        response = self.make_update_request(session, 512, 1023)
+        self.assertEquals(response.data["offset"], 1024)
+        session.refresh_from_db()
+        with open(session.file.path, "rb") as partial:
+            self.assertEquals(partial.read(), self.content)
+
+    def test_update_view_resent_chunk(self) -> None:
+        """Verify a chunk overlapping data which was already received only writes the new bytes."""
+        session = self.create_session()
+        self.make_update_request(session, 0, 511)
+        response = self.make_update_request(session, 256, 767)
+        self.assertEquals(response.data["offset"], 768)
+        session.refresh_from_db()
+        with open(session.file.path, "rb") as partial:
+            self.assertEquals(partial.read(), self.content[:768])
+
+    def test_update_view_longer_body(self) -> None:
+        """Verify only the declared range is written when the body is longer than it."""
+        session = self.create_session()
+        response = self.make_update_request(session, 0, 9, body=self.content)
+        self.assertEquals(response.status_code, 200, msg=response.data)
+        self.assertEquals(response.data["offset"], 10)
+        session.refresh_from_db()
+        with open(session.file.path, "rb") as partial:
+            self.assertEquals(partial.read(), self.content[:10])
+
+    def test_update_view_concurrent_chunk(self) -> None:
+        """Verify the update view returns a 409 while another chunk of the upload is being written."""
+        session = self.create_session()
+        with open(session.file.path, "r+b") as partial:
+            fcntl.flock(partial, fcntl.LOCK_EX)
+            response = self.make_update_request(session, 0, 511)
+        self.assertEquals(response.status_code, 409, msg=response.data)
+        self.assertEquals(response.data["offset"], 0)
+        self.assertEquals(self.make_update_request(session, 0, 511).data["offset"], 512)
+
+    def test_write_chunk_received_changed(self) -> None:
+        """Verify a chunk is rejected when the offset moved while its body was being read."""
+        session = self.create_session()
+
+        def read(size):
+            UploadSession.objects.filter(id=session.id).update(received=256)
+            return self.content[:size]
+
+        with self.assertRaises(UploadConflictException):
+            session.write_chunk(mock.Mock(read=read), 0, 512)
+        session.refresh_from_db()
+        self.assertEquals(session.received, 256)
+
+    def test_update_view_gap(self) -> None:
+        """Verify the update view returns a 409 with the current offset when a chunk would leave a gap."""
+        session = self.create_session()
+        response = self.make_update_request(session, 512, 1023)
+        self.assertEquals(response.status_code, 409, msg=response.data)
+        self.assertEquals(response.data["offset"], 0)
+
+    def test_update_view_out_of_range(self) -> None:
+        """Verify the update view returns a 416 when a chunk extends past the end of the file."""
+        session = self.create_session()
+        response = self.make_update_request(session, 0, 1024, total=1025)
+        self.assertEquals(response.status_code, 416, msg=response.data)
+
+    def test_update_view_without_content_range(self) -> None:
+        """Verify the update view returns a 400 when the Content-Range header is missing."""
+        session = self.create_session()
+        response = self.make_update_request(session, 0, 511, content_range=None)
+        self.assertEquals(response.status_code, 400, msg=response.data)
+
+    def test_update_view_others_session(self) -> None:
+        """Verify the update view returns a 404 when the session belongs to another user."""
+        session = self.create_session()
+        response = self.make_update_request(session, 0, 511, user=blend_user("Can add audio"))
+        self.assertEquals(response.status_code, 404, msg=response.data)
+
+    def make_update_request(self, session, start, end, total=None, content_range="", user=None,
+                            body=None) -> Response:
+        """
+        Make a request to the update view uploading a range of `self.content` and return its response.
+        :param session:       The upload session to write to.
+        :param start:         The offset of the first byte to send.
+        :param end:           The offset of the last byte to send.
+        :param total:         The total size to send in the Content-Range header.  Default is the session's size.
+        :param content_range: The Content-Range header to send.  Default is built from start, end, and total, None
+                              omits the header.
+        :param user:          The user making the request.  Default is the session's user.
+        :param body:          The request body.  Default is the range of `self.content`.
+        :return:              The Response from the view.
+        """
+        view = self.view_set.as_view({"put": "update"})
+        headers = dict()
+        if content_range == "":
+            content_range = f"bytes {start}-{end}/{total or session.size}"
+        if content_range is not None:
+            headers["HTTP_CONTENT_RANGE"] = content_range
+        request = self.request_factory.put("", data=body or self.content[start:end + 1],
+                                           content_type="application/octet-stream", **headers)
+        force_authenticate(request, user or session.user)
+        return view(request, id=session.id)
+
+    def test_finalize_view(self) -> None:
+        """Verify finalizing a complete upload creates an Audio with pending streams from the uploaded file."""
+        session = self.create_session()
+        self.make_update_request(session, 0, 1023)
+        response = self.make_finalize_request(session)
+        self.assertEquals(response.status_code, 201, msg=response.data)
+        audio = Audio.objects.get(id=response.data["id"])
+        self.assertEquals(audio.title, self.data["title"])
+        self.assertEquals(list(audio.authors.all()), [self.user])
+        with audio.source.open("rb") as source:
+            self.assertEquals(source.read(), self.content)
+        self.assertEquals(audio.streams.filter(status=Stream.StreamStatus.PENDING).count(), 6)
+
+    def test_finalize_view_twice(self) -> None:
+        """Verify finalizing a session again returns the same Audio."""
+        session = self.create_session()
+        self.make_update_request(session, 0, 1023)
+        first = self.make_finalize_request(session)
+        second = self.make_finalize_request(session)
+        self.assertEquals(first.data["id"], second.data["id"])
+        self.assertEquals(Audio.objects.count(), 1)
+
+    def test_finalize_view_duplicate(self) -> None:
+        """Verify the partial file of an upload duplicating an existing source is deleted."""
+        first = self.create_session()
+        self.make_update_request(first, 0, 1023)
+        self.make_finalize_request(first)
+        second = self.create_session()
+        self.make_update_request(second, 0, 1023)
+        path = second.file.path
+        response = self.make_finalize_request(second)
+        self.assertEquals(response.status_code, 201, msg=response.data)
+        self.assertFalse(os.path.exists(path))
+        self.assertEquals(Audio.objects.get(id=response.data["id"]).source.name,
+                          Audio.objects.exclude(id=response.data["id"]).get().source.name)
+
+    @override_settings(TRANSCODE_QUEUE_HIGH_WATER_MARK=0, TRANSCODE_RETRY_AFTER=30)
+    def test_finalize_view_above_high_water_mark(self) -> None:
+        """Verify the finalize view creates the Audio with a 202 while the transcode queue is backed up."""
+        session = self.create_session()
+        self.make_update_request(session, 0, 1023)
+        response = self.make_finalize_request(session)
+        self.assertEquals(response.status_code, 202, msg=response.data)
+        self.assertEquals(response["Retry-After"], "30")
+        self.assertEquals(Audio.objects.count(), 1)
+
+    @override_settings(TRANSCODE_QUEUE_MAX_DEPTH=0, TRANSCODE_RETRY_AFTER=30)
+    def test_finalize_view_queue_full(self) -> None:
+        """Verify the finalize view refuses with a 503 once the transcode queue is full, keeping the received file."""
+        session = self.create_session()
+        self.make_update_request(session, 0, 1023)
+        response = self.make_finalize_request(session)
+        self.assertEquals(response.status_code, 503, msg=response.data)
+        self.assertEquals(response["Retry-After"], "30")
+        self.assertFalse(Audio.objects.exists())
+        session.refresh_from_db()
+        self.assertTrue(os.path.exists(session.file.path))
+
+    def test_finalize_view_incomplete(self) -> None:
+        """Verify the finalize view returns a 409 when the upload is incomplete."""
+        session = self.create_session()
+        self.make_update_request(session, 0, 511)
+        response = self.make_finalize_request(session)
+        self.assertEquals(response.status_code, 409, msg=response.data)
+        self.assertEquals(response.data["offset"], 512)
+
+    def make_finalize_request(self, session) -> Response:
+        """
+        Make a request to the finalize view and return its response.
+        :param session: The upload session to finalize.
+        :return:        The Response from the view.
+        """
+        view = self.view_set.as_view({"post": "finalize"})
+        request = self.request_factory.post("", format="json")
+        force_authenticate(request, session.user)
+        return view(request, id=session.id)
+
+    def create_session(self) -> UploadSession:
+        """
+        Create an upload session for `self.content` through the create view.
+        :return: The UploadSession instance.
+        """
+        response = self.make_create_request(user=self.user)
+        return UploadSession.objects.get(id=response.data["id"])
+
+
+class TestTranscodeQueueViewSet(TestCase):
+    def test_list_view(self) -> None:
+        """Verify the list view reports the queue's depth to admins."""
+        view = TranscodeQueueViewSet.as_view({"get": "list"})
+        request = APIRequestFactory().get("")
+        force_authenticate(request, mixer.blend(User, is_staff=True))
+        response = view(request)
+        self.assertEquals(response.status_code, 200)
+        self.assertEquals(response.data["queued"], {"interactive": 0, "bulk": 0})
+
+    def test_list_view_not_admin(self) -> None:
+        """Verify the list view returns a 403 for users who are not admins."""
+        view = TranscodeQueueViewSet.as_view({"get": "list"})
+        request = APIRequestFactory().get("")
+        force_authenticate(request, blend_user())
+        self.assertEquals(view(request).status_code, 403)
@@ -0,0 +1,82 @@
+#  Copyright (C) 2020  Mind Audio Central
+#
+#  This file is part of mac_backend_api.
+#
+#  mac_backend_api is free software: you can redistribute it and/or modify
+#  it under the terms of the GNU General Public License as published by
+#  the Free Software Foundation, either version 3 of the License, or
+#  (at your option) any later version.
+#
+#  mac_backend_api is distributed in the hope that it will be useful,
+#  but WITHOUT ANY WARRANTY; without even the implied warranty of
+#  MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+#  GNU General Public License for more details.
+#
+#  You should have received a copy of the GNU General Public License
+#  along with mac_backend_api.  If not, see <https://www.gnu.org/licenses/>.
+
+import os
+import tempfile
+from array import array
+
+from django.test import TestCase
+
+from mac_backend_api.audio.transcoding.waveform import (compute_waveforms, decode_waveform, encode_waveform,
+                                                        merge_peaks, scan_peaks)
+
+
+class TestWaveform(TestCase):
+    def test_scan_peaks(self) -> None:
+        """Verifies each pixel holds the minimum and maximum of its samples, scaled to 8 bits."""
+        samples = array("h", [0, 256, -512, 0, 32767, -32768, 100, -100])
+        peaks = scan_peaks(samples.tobytes(), 2, 4 * 2, 8)
+        self.assertEquals(list(peaks), [-2, 1, -128, 127])
+
+    def test_scan_peaks_16_bit(self) -> None:
+        """Verifies peaks keep the source's values at 16 bits."""
+        samples = array("h", [0, 256, -512, 0])
+        self.assertEquals(list(scan_peaks(samples.tobytes(), 2, 4 * 2, 16)), [-512, 256])
+
+    def test_merge_peaks(self) -> None:
+        """Verifies neighbouring pixels are combined, keeping a trailing odd pixel."""
+        peaks = array("b", [-1, 2, -3, 1, -5, 5])
+        self.assertEquals(list(merge_peaks(peaks)), [-3, 2, -5, 5])
+
+    def test_merge_peaks_factor(self) -> None:
+        """Verifies any number of neighbouring pixels can be combined."""
+        peaks = array("b", [-1, 2, -3, 1, -5, 5, -2, 7])
+        self.assertEquals(list(merge_peaks(peaks, 3)), [-5, 5, -2, 7])
+
+    def test_compute_waveforms_uneven_levels(self) -> None:
+        """Verifies levels which are not power-of-two multiples of the finest level cover their own samples."""
+        with tempfile.TemporaryDirectory() as directory:
+            pcm_path = os.path.join(directory, "source.pcm")
+            with open(pcm_path, "wb") as pcm:
+                pcm.write(array("h", [0] * 1200).tobytes())
+            parameters = {"sample_width": 2, "frame_rate": 44100, "channels": 1}
+            waveforms = compute_waveforms(pcm_path, parameters, (100, 300, 400), 8)
+            with self.assertRaises(ValueError):
+                compute_waveforms(pcm_path, parameters, (100, 150), 8)
+        self.assertEquals({level: len(decode_waveform(data)[2]) // 2 for level, data in waveforms.items()},
+                          {100: 12, 300: 4, 400: 3})
+
+    def test_encode_waveform_round_trip(self) -> None:
+        """Verifies encoded waveforms decode to the same peaks and settings."""
+        peaks = array("h", [-300, 300, -20, 40])
+        sample_rate, samples_per_pixel, decoded = decode_waveform(encode_waveform(peaks, 44100, 512, 16))
+        self.assertEquals((sample_rate, samples_per_pixel, list(decoded)), (44100, 512, list(peaks)))
+
+    def test_compute_waveforms(self) -> None:
+        """Verifies a waveform is computed for every level with the expected number of pixels."""
+        with tempfile.TemporaryDirectory() as directory:
+            pcm_path = os.path.join(directory, "source.pcm")
+            with open(pcm_path, "wb") as pcm:
+                pcm.write(array("h", [1000, -1000] * 2048).tobytes())
+            waveforms = compute_waveforms(pcm_path, {"sample_width": 2, "frame_rate": 44100, "channels": 1},
+                                          (256, 1024), 8)
+        self.assertEquals(list(waveforms.keys()), [256, 1024])
+        for samples_per_pixel, data in waveforms.items():
+            sample_rate, decoded_samples_per_pixel, peaks = decode_waveform(data)
+            self.assertEquals(decoded_samples_per_pixel, samples_per_pixel)
+            self.assertEquals(len(peaks), 4096 // samples_per_pixel * 2)
+            self.assertEquals(set(peaks), {-4, 3})
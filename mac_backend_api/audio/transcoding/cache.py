@@ -0,0 +1,167 @@
+#  Copyright (C) 2020  Mind Audio Central
+#
+#  This file is part of mac_backend_api.
+#
+#  mac_backend_api is free software: you can redistribute it and/or modify
+#  it under the terms of the GNU General Public License as published by
+#  the Free Software Foundation, either version 3 of the License, or
+#  (at your option) any later version.
+#
+#  mac_backend_api is distributed in the hope that it will be useful,
+#  but WITHOUT ANY WARRANTY; without even the implied warranty of
+#  MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+#  GNU General Public License for more details.
+#
+#  You should have received a copy of the GNU General Public License
+#  along with mac_backend_api.  If not, see <https://www.gnu.org/licenses/>.
+
+import logging
+
+from django.conf import settings
+from django.db import IntegrityError, transaction
+from django.db.models import Sum
+from django.utils import timezone
+
+from mac_backend_api.audio.models import CachedRendition, CachedSegment, Segment, Stream
+from mac_backend_api.audio.storage import stream_storage
+from mac_backend_api.audio.transcoding.encoder import ENCODER_VERSION
+
+EVICTION_BATCH_SIZE = 100
+# Kept below SQLite's limit of 999 query parameters
+QUERY_BATCH_SIZE = 500
+
+logger = logging.getLogger(__name__)
+
+
+def get_encoder_version() -> str:
+    """
+    Get the version identifying the encoder's current output, including the settings which change it.
+    :return: The version.
+    """
+    return f"{ENCODER_VERSION}:{settings.TRANSCODE_SEGMENT_DURATION}"
+
+
+def find_cached_rendition(stream):
+    """
+    Find the cached rendition of a stream's source and settings, marking it as used.
+    :param stream: The Stream to find a rendition for.
+    :return:       A CachedRendition instance, or None if the source is unhashed or the rendition is not cached.
+    """
+    source_hash = stream.audio.source_hash
+    if not source_hash:
+        return None
+    rendition = CachedRendition.objects.filter(
+        source_hash=source_hash,
+        format=stream.format,
+        bit_rate=stream.bit_rate,
+        sample_rate=stream.sample_rate,
+        encoder_version=get_encoder_version()
+    ).first()
+    if rendition is not None:
+        CachedRendition.objects.filter(id=rendition.id).update(last_used_at=timezone.now())
+    return rendition
+
+
+def cache_rendition(stream):
+    """
+    Cache a freshly rendered stream's file and segments.
+    :param stream: The rendered Stream.
+    :return:       The CachedRendition, or None if the stream's source is unhashed or it was already cached.
+    """
+    if not stream.audio.source_hash or not stream.file:
+        return None
+    segments = list(stream.segments.all())
+    rendition = CachedRendition(
+        source_hash=stream.audio.source_hash,
+        format=stream.format,
+        bit_rate=stream.bit_rate,
+        sample_rate=stream.sample_rate,
+        encoder_version=get_encoder_version(),
+        file=stream.file.name,
+        total_size=stream.file.size + sum(segment.file.size for segment in segments)
+    )
+    for field in Stream.METADATA_FIELDS.values():
+        setattr(rendition, field, getattr(stream, field))
+    try:
+        with transaction.atomic():
+            rendition.save()
+    except IntegrityError:
+        # Another worker cached the same rendition first.
+        return None
+    CachedSegment.objects.bulk_create([
+        CachedSegment(rendition=rendition, index=segment.index, duration=segment.duration, file=segment.file.name)
+        for segment in segments
+    ])
+    return rendition
+
+
+def uncache_renditions(streams) -> int:
+    """
+    Remove the current encoder's cached renditions of streams' sources and settings, so they are encoded again, and
+    cached anew, the next time they are rendered.  Their files are left in place.
+    :param streams: The Streams, with their Audio selected, at most `QUERY_BATCH_SIZE`.
+    :return:        The number of renditions removed.
+    """
+    keys = {(stream.audio.source_hash, stream.format, stream.bit_rate, stream.sample_rate) for stream in streams}
+    renditions = CachedRendition.objects.filter(
+        source_hash__in={key[0] for key in keys if key[0]},
+        encoder_version=get_encoder_version()
+    )
+    rendition_ids = [
+        rendition_id
+        for rendition_id, *key in renditions.values_list("id", "source_hash", "format", "bit_rate", "sample_rate")
+        if tuple(key) in keys
+    ]
+    return CachedRendition.objects.filter(id__in=rendition_ids).delete()[1].get(CachedRendition._meta.label, 0)
+
+
+def evict_renditions(max_size=None) -> int:
+    """
+    Remove the least recently used renditions until the cache fits its budget.
+
+    Only renditions whose file no stream uses count against the budget and are evicted, evicting the others would free
+    no disk space and only lose the cache entries.  Files are only deleted once no stream, segment, or other cached
+    rendition refers to them.
+    :param max_size: The budget in bytes.  Default is None, which uses `TRANSCODE_CACHE_MAX_SIZE`, where None disables
+                     eviction.
+    :return:         The number of renditions evicted.
+    """
+    if max_size is None:
+        max_size = settings.TRANSCODE_CACHE_MAX_SIZE
+    if max_size is None:
+        return 0
+    cached_only = CachedRendition.objects.exclude(file__in=Stream.objects.exclude(file="").values("file"))
+    excess = (cached_only.aggregate(total=Sum("total_size"))["total"] or 0) - max_size
+    evicted = 0
+    while excess > 0:
+        batch = list(cached_only.order_by("last_used_at")[:EVICTION_BATCH_SIZE])
+        if not batch:
+            break
+        selected = list()
+        for rendition in batch:
+            if excess <= 0:
+                break
+            selected.append(rendition)
+            excess -= rendition.total_size
+        names = {rendition.file.name for rendition in selected}
+        names.update(CachedSegment.objects.filter(rendition__in=selected).values_list("file", flat=True))
+        CachedRendition.objects.filter(id__in=[rendition.id for rendition in selected]).delete()
+        delete_unreferenced_files(names)
+        evicted += len(selected)
+    if evicted:
+        logger.info("Evicted %d cached rendition(s)", evicted)
+    return evicted
+
+
+def delete_unreferenced_files(names) -> None:
+    """
+    Delete stream files which no stream, segment, or cached rendition refers to.
+    :param names: The names of the candidate files.
+    """
+    names = sorted(names)
+    for start in range(0, len(names), QUERY_BATCH_SIZE):
+        unreferenced = set(names[start:start + QUERY_BATCH_SIZE])
+        for model in (Stream, Segment, CachedRendition, CachedSegment):
+            unreferenced.difference_update(model.objects.filter(file__in=unreferenced).values_list("file", flat=True))
+        for name in unreferenced:
+            stream_storage.delete(name)
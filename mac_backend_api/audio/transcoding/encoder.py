@@ -0,0 +1,137 @@
+#  Copyright (C) 2020  Mind Audio Central
+#
+#  This file is part of mac_backend_api.
+#
+#  mac_backend_api is free software: you can redistribute it and/or modify
+#  it under the terms of the GNU General Public License as published by
+#  the Free Software Foundation, either version 3 of the License, or
+#  (at your option) any later version.
+#
+#  mac_backend_api is distributed in the hope that it will be useful,
+#  but WITHOUT ANY WARRANTY; without even the implied warranty of
+#  MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+#  GNU General Public License for more details.
+#
+#  You should have received a copy of the GNU General Public License
+#  along with mac_backend_api.  If not, see <https://www.gnu.org/licenses/>.
+
+import mmap
+import os
+from contextlib import contextmanager
+
+from pydub import AudioSegment
+
+# Bump whenever a change to the encoding changes its output, cached renditions of older versions are then re-encoded.
+ENCODER_VERSION = 1
+
+EXPORT_SETTINGS = {
+    "mp3": {"format": "mp3", "codec": "libmp3lame"},
+    "aac": {"format": "adts", "codec": "aac"},
+    "ogg": {"format": "ogg", "codec": "libvorbis"},
+    "wav": {"format": "wav", "codec": None},
+}
+
+# HLS only supports these formats as packed audio segments (RFC 8216 section 3.4), other renditions are not segmented.
+SEGMENT_FORMATS = ("mp3", "aac")
+
+
+def decode_to_pcm(source_path, pcm_path) -> dict:
+    """
+    Decode an audio file to raw PCM so it can be shared by every rendition encoded from it.
+
+    This function does not touch the database so it can safely be run in a worker process.
+    :param source_path: The path of the file to decode.
+    :param pcm_path:    The path the raw PCM data will be written to.
+    :return:            A dictionary containing the 'sample_width', 'frame_rate', and 'channels' of the PCM data.
+    """
+    segment = AudioSegment.from_file(source_path)
+    with open(pcm_path, "wb") as pcm:
+        pcm.write(segment.raw_data)
+    return {
+        "sample_width": segment.sample_width,
+        "frame_rate": segment.frame_rate,
+        "channels": segment.channels
+    }
+
+
+@contextmanager
+def open_pcm(pcm_path, parameters):
+    """
+    Memory-map a PCM file written by `decode_to_pcm` as an AudioSegment.
+
+    Every process encoding from the same file shares its pages, so a long track is only held in memory once.
+    :param pcm_path:   The path of the PCM file.
+    :param parameters: The parameters returned by `decode_to_pcm`.
+    :return:           A context manager yielding the AudioSegment.
+    """
+    with open(pcm_path, "rb") as pcm:
+        if os.fstat(pcm.fileno()).st_size == 0:
+            yield AudioSegment(data=b"", **parameters)
+        else:
+            with mmap.mmap(pcm.fileno(), 0, access=mmap.ACCESS_READ) as buffer:
+                yield AudioSegment(data=buffer, **parameters)
+
+
+def encode_pcm(pcm_path, parameters, output_path, audio_format, bit_rate, sample_rate, segment_dir=None,
+               segment_duration=None) -> list:
+    """
+    Render a rendition from a PCM file written by `decode_to_pcm`, and optionally split it into segments.
+
+    This function does not touch the database so it can safely be run in a worker process.
+    :param pcm_path:         The path of the PCM file.
+    :param parameters:       The parameters returned by `decode_to_pcm`.
+    :param output_path:      The path the rendered file will be written to.
+    :param audio_format:     One of `Stream.AudioFormat`.
+    :param bit_rate:         The target bit-rate in bits per second.  It is ignored by lossless formats.
+    :param sample_rate:      The target sample-rate in hz.
+    :param segment_dir:      A directory to write segments to.  Default is None, which does not write segments.
+    :param segment_duration: The length of each segment in seconds, required when `segment_dir` is given.
+    :return:                 The length of each segment in seconds, or an empty list if no segments were written.
+    """
+    with open_pcm(pcm_path, parameters) as segment:
+        segment = segment.set_frame_rate(sample_rate)
+        export_segment(segment, output_path, audio_format, bit_rate, sample_rate)
+        if segment_dir is None:
+            return []
+        return split_segment(segment, segment_dir, audio_format, bit_rate, sample_rate, segment_duration)
+
+
+def split_segment(segment, segment_dir, audio_format, bit_rate, sample_rate, segment_duration) -> list:
+    """
+    Encode consecutive fixed-length pieces of an AudioSegment as separate files named `<index>.<format>`.
+    :param segment:          The decoded audio.
+    :param segment_dir:      The directory to write the pieces to.
+    :param audio_format:     One of `Stream.AudioFormat`.
+    :param bit_rate:         The target bit-rate in bits per second.  It is ignored by lossless formats.
+    :param sample_rate:      The target sample-rate in hz.
+    :param segment_duration: The length of each piece in seconds, the last piece may be shorter.
+    :return:                 The length of each piece in seconds.
+    """
+    durations = list()
+    for index, piece in enumerate(segment[::int(segment_duration * 1000)]):
+        export_segment(piece, os.path.join(segment_dir, f"{index}.{audio_format}"), audio_format, bit_rate,
+                       sample_rate)
+        durations.append(len(piece) / 1000)
+    return durations
+
+
+def export_segment(segment, output_path, audio_format, bit_rate, sample_rate) -> str:
+    """
+    Resample and encode a decoded AudioSegment to a file.
+    :param segment:      The decoded audio.
+    :param output_path:  The path the rendered file will be written to.
+    :param audio_format: One of `Stream.AudioFormat`.
+    :param bit_rate:     The target bit-rate in bits per second.  It is ignored by lossless formats.
+    :param sample_rate:  The target sample-rate in hz.
+    :return:             The output path.
+    """
+    settings = EXPORT_SETTINGS[audio_format]
+    if segment.frame_rate != sample_rate:
+        segment = segment.set_frame_rate(sample_rate)
+    if settings["codec"] is None:
+        output = segment.export(output_path, format=settings["format"])
+    else:
+        output = segment.export(output_path, format=settings["format"], codec=settings["codec"],
+                                bitrate=f"{bit_rate // 1000}k")
+    output.close()
+    return output_path
@@ -0,0 +1,62 @@
+#  Copyright (C) 2020  Mind Audio Central
+#
+#  This file is part of mac_backend_api.
+#
+#  mac_backend_api is free software: you can redistribute it and/or modify
+#  it under the terms of the GNU General Public License as published by
+#  the Free Software Foundation, either version 3 of the License, or
+#  (at your option) any later version.
+#
+#  mac_backend_api is distributed in the hope that it will be useful,
+#  but WITHOUT ANY WARRANTY; without even the implied warranty of
+#  MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+#  GNU General Public License for more details.
+#
+#  You should have received a copy of the GNU General Public License
+#  along with mac_backend_api.  If not, see <https://www.gnu.org/licenses/>.
+
+import time
+
+from django.conf import settings
+
+from mac_backend_api.audio.models import Stream, TranscodeJob
+
+UNFINISHED_STATUSES = (Stream.StreamStatus.DEFERRED, Stream.StreamStatus.PENDING, Stream.StreamStatus.PROCESSING)
+
+
+def request_rendition(stream) -> bool:
+    """
+    Queue a deferred stream to be rendered.
+
+    The stream's status is switched from "deferred" to "pending" with a single conditional UPDATE, which acts as a
+    per-stream lock: however many requests race, in however many processes, only the one whose UPDATE matched the row
+    queues a job.
+    :param stream: The Stream to render.
+    :return:       True if this call queued the job, False if the stream was not deferred.
+    """
+    claimed = Stream.objects.filter(id=stream.id, status=Stream.StreamStatus.DEFERRED).update(
+        status=Stream.StreamStatus.PENDING
+    )
+    if claimed:
+        TranscodeJob.objects.create(stream=stream)
+    return bool(claimed)
+
+
+def wait_for_rendition(stream, timeout=None) -> Stream:
+    """
+    Render a stream on demand and wait for a worker to finish it.
+
+    Deferred streams are queued by `request_rendition`, every concurrent caller then waits on that one job.
+    :param stream:  The Stream to render.
+    :param timeout: The number of seconds to wait.  Default is None, which uses `TRANSCODE_ON_DEMAND_TIMEOUT`.
+    :return:        The refreshed Stream, which may still be unfinished if the timeout expired.
+    """
+    if timeout is None:
+        timeout = settings.TRANSCODE_ON_DEMAND_TIMEOUT
+    deadline = time.monotonic() + timeout
+    request_rendition(stream)
+    stream.refresh_from_db()
+    while stream.status in UNFINISHED_STATUSES and time.monotonic() < deadline:
+        time.sleep(settings.TRANSCODE_ON_DEMAND_POLL_INTERVAL)
+        stream.refresh_from_db()
+    return stream
@@ -0,0 +1,451 @@
+#  Copyright (C) 2020  Mind Audio Central
+#
+#  This file is part of mac_backend_api.
+#
+#  mac_backend_api is free software: you can redistribute it and/or modify
+#  it under the terms of the GNU General Public License as published by
+#  the Free Software Foundation, either version 3 of the License, or
+#  (at your option) any later version.
+#
+#  mac_backend_api is distributed in the hope that it will be useful,
+#  but WITHOUT ANY WARRANTY; without even the implied warranty of
+#  MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+#  GNU General Public License for more details.
+#
+#  You should have received a copy of the GNU General Public License
+#  along with mac_backend_api.  If not, see <https://www.gnu.org/licenses/>.
+
+import logging
+import os
+import shutil
+import tempfile
+from concurrent.futures import FIRST_COMPLETED, Executor, Future, wait
+from datetime import timedelta
+
+from django.conf import settings
+from django.core.files import File
+from django.core.files.base import ContentFile
+from django.db import transaction
+from django.db.models import F
+from django.utils import timezone
+
+from mac_backend_api.audio.models import Audio, Segment, Stream, TranscodeJob, Waveform
+from mac_backend_api.audio.probe import pcm_metadata, probe_file
+from mac_backend_api.audio.transcoding.cache import cache_rendition, find_cached_rendition
+from mac_backend_api.audio.transcoding.encoder import SEGMENT_FORMATS, decode_to_pcm, encode_pcm
+from mac_backend_api.audio.transcoding.loudness import compute_loudness
+from mac_backend_api.audio.transcoding.waveform import compute_waveforms
+
+MAX_ATTEMPTS = 3
+
+DECODE = "decode"
+ENCODE = "encode"
+WAVEFORM = "waveform"
+LOUDNESS = "loudness"
+
+logger = logging.getLogger(__name__)
+
+
+def enqueue_stream(stream, priority=TranscodeJob.JobPriority.INTERACTIVE) -> TranscodeJob:
+    """
+    Mark a stream as pending and queue a job to render its file.
+    :param stream:   The Stream to render.  Its Audio must have a source file.
+    :param priority: The JobPriority of the job.  Default is INTERACTIVE.
+    :return:         The queued TranscodeJob.
+    """
+    if stream.status != Stream.StreamStatus.PENDING:
+        stream.status = Stream.StreamStatus.PENDING
+        stream.save(update_fields=["status"])
+    return TranscodeJob.objects.create(stream=stream, priority=priority)
+
+
+def claim_jobs(limit) -> list:
+    """
+    Claim the queued jobs of up to `limit` audios, by priority and then oldest first, and mark them as running.
+
+    All of an audio's queued jobs are claimed together so its source only has to be decoded once.  Jobs are started by
+    `start_jobs`, so concurrent workers never claim the same job.  Jobs left running by a worker which died are
+    requeued first, see `requeue_expired_jobs`.
+    :param limit: The maximum number of audios to claim jobs for.
+    :return:      A list of the claimed TranscodeJob instances.
+    """
+    requeue_expired_jobs()
+    queued = TranscodeJob.objects.filter(status=TranscodeJob.JobStatus.QUEUED)
+    audio_ids = list()
+    for audio_id in queued.values_list("stream__audio_id", flat=True).iterator():
+        if audio_id not in audio_ids:
+            audio_ids.append(audio_id)
+            if len(audio_ids) >= limit:
+                break
+    if not audio_ids:
+        return []
+    streams = Stream.objects.filter(audio_id__in=audio_ids).values("id")
+    return start_jobs(queued.filter(stream_id__in=streams))
+
+
+def start_jobs(jobs) -> list:
+    """
+    Mark the queued jobs in a queryset, and the streams of those which are not re-renders, as running.
+
+    Rows are locked with SKIP LOCKED where the database supports it, so a job claimed by another process is left out.
+    :param jobs: A queryset of TranscodeJob instances.
+    :return:     A list of the started TranscodeJob instances.
+    """
+    with transaction.atomic():
+        started = jobs.select_for_update(skip_locked=True).filter(status=TranscodeJob.JobStatus.QUEUED)
+        job_ids = list(started.values_list("id", flat=True))
+        TranscodeJob.objects.filter(id__in=job_ids).update(
+            status=TranscodeJob.JobStatus.RUNNING,
+            started_at=timezone.now(),
+            attempts=F("attempts") + 1
+        )
+        Stream.objects.filter(transcode_jobs__id__in=job_ids, transcode_jobs__is_rerender=False).update(
+            status=Stream.StreamStatus.PROCESSING
+        )
+    return list(TranscodeJob.objects.filter(id__in=job_ids).select_related("stream__audio"))
+
+
+def requeue_expired_jobs(timeout=None) -> int:
+    """
+    Record a failed attempt for every job which has been running for longer than the lease, so the jobs of a worker
+    which was killed or lost its database connection are queued again.
+    :param timeout: The lease in seconds.  Default is None, which uses `TRANSCODE_JOB_TIMEOUT`.
+    :return:        The number of expired jobs.
+    """
+    if timeout is None:
+        timeout = settings.TRANSCODE_JOB_TIMEOUT
+    expired = TranscodeJob.objects.filter(
+        status=TranscodeJob.JobStatus.RUNNING,
+        started_at__lt=timezone.now() - timedelta(seconds=timeout)
+    )
+    with transaction.atomic():
+        jobs = list(expired.select_for_update(skip_locked=True))
+        for job in jobs:
+            fail_job(job, TimeoutError(f"The job was not finished within {timeout} seconds"))
+    return len(jobs)
+
+
+class ImmediateExecutor(Executor):
+    """
+    An executor which runs each call as soon as it is submitted, in the calling process.
+    """
+
+    def submit(self, fn, *args, **kwargs) -> Future:
+        future = Future()
+        try:
+            future.set_result(fn(*args, **kwargs))
+        except Exception as error:
+            future.set_exception(error)
+        return future
+
+
+class SourceBuffer:
+    """
+    Tracks the decoded PCM file of an audio's source while its renditions, waveform, and loudness are computed from it.
+    """
+
+    def __init__(self, audio, jobs, waveform=False, loudness=False):
+        self.audio = audio
+        self.jobs = jobs
+        self.waveform = waveform
+        self.loudness = loudness
+        self.path = make_temporary_path(".pcm")
+        self.remaining = len(jobs) + (1 if waveform else 0) + (1 if loudness else 0)
+
+    def release(self) -> None:
+        """
+        Mark one task as finished, removing the PCM file once every task is finished.
+        """
+        self.remaining -= 1
+        if self.remaining <= 0:
+            self.discard()
+
+    def discard(self) -> None:
+        """
+        Remove the PCM file.
+        """
+        if os.path.exists(self.path):
+            os.remove(self.path)
+
+
+def run_jobs(jobs, executor=None) -> None:
+    """
+    Transcode a list of claimed jobs and record their results.
+
+    Jobs are grouped by Audio, each source is decoded to PCM once and every rendition, along with the source's waveform
+    and loudness, is then computed from the shared PCM file in parallel.  Only the audio processing is sent to the
+    executor, database access always happens in the calling process.  An error while storing a job's result fails
+    that job only, so one bad rendition never stops the worker with the other jobs left running.
+    :param jobs:     The claimed TranscodeJob instances.
+    :param executor: A `concurrent.futures.Executor` to decode and encode with.  Default is None, which runs
+                     in-process.
+    """
+    if executor is None:
+        executor = ImmediateExecutor()
+    pending = dict()
+    for audio_jobs in group_jobs_by_audio(jobs).values():
+        audio = audio_jobs[0].stream.audio
+        reuse_waveforms(audio)
+        audio_jobs = [job for job in audio_jobs if not reuse_rendition(job)]
+        if not audio_jobs:
+            continue
+        if not audio.source:
+            for job in audio_jobs:
+                fail_job(job, ValueError(f"Audio {audio.id} has no source file to transcode"))
+            continue
+        buffer = SourceBuffer(audio, audio_jobs, waveform=not audio.waveforms.exists(), loudness=audio.loudness is None)
+        pending[executor.submit(decode_to_pcm, audio.source.path, buffer.path)] = (DECODE, buffer, None, None)
+    while pending:
+        done, _ = wait(pending, return_when=FIRST_COMPLETED)
+        for future in done:
+            task, buffer, job, output = pending.pop(future)
+            if task == ENCODE:
+                output_path, segment_dir = output
+                if future.exception() is None:
+                    finish_job(job, output_path, segment_dir=segment_dir, durations=future.result())
+                else:
+                    finish_job(job, output_path, future.exception(), segment_dir)
+                buffer.release()
+            elif task == WAVEFORM:
+                try:
+                    finish_waveforms(buffer.audio, future)
+                except Exception:
+                    logger.exception("Could not store the waveform of audio %s", buffer.audio.id)
+                buffer.release()
+            elif task == LOUDNESS:
+                try:
+                    finish_loudness(buffer.audio, future)
+                except Exception:
+                    logger.exception("Could not store the loudness of audio %s", buffer.audio.id)
+                buffer.release()
+            elif future.exception() is not None:
+                for decoded_job in buffer.jobs:
+                    fail_job(decoded_job, future.exception())
+                buffer.discard()
+            else:
+                try:
+                    fill_source_metadata(buffer.audio, pcm_metadata(buffer.path, future.result()))
+                except Exception as error:
+                    for decoded_job in buffer.jobs:
+                        fail_job(decoded_job, error)
+                    buffer.discard()
+                    continue
+                pending.update(fan_out(executor, buffer, future.result()))
+
+
+def fan_out(executor, buffer, parameters) -> dict:
+    """
+    Submit every task computed from a decoded source.  Only renditions in one of the `SEGMENT_FORMATS` are segmented.
+    :param executor:   The executor to submit to.
+    :param buffer:     The SourceBuffer of the decoded source.
+    :param parameters: The parameters returned by `decode_to_pcm`.
+    :return:           A dictionary mapping the submitted futures to (task, buffer, job, output) tuples, where output is
+                       a tuple of the rendition's (output_path, segment_dir).
+    """
+    futures = dict()
+    segment_duration = settings.TRANSCODE_SEGMENT_DURATION
+    for job in buffer.jobs:
+        stream = job.stream
+        output_path = make_temporary_path(f".{stream.format}")
+        segment_dir = tempfile.mkdtemp() if segment_duration and stream.format in SEGMENT_FORMATS else None
+        encode = executor.submit(encode_pcm, buffer.path, parameters, output_path, stream.format, stream.bit_rate,
+                                 stream.sample_rate, segment_dir, segment_duration)
+        futures[encode] = (ENCODE, buffer, job, (output_path, segment_dir))
+    if buffer.waveform:
+        waveform = executor.submit(compute_waveforms, buffer.path, parameters, settings.WAVEFORM_SAMPLES_PER_PIXEL,
+                                   settings.WAVEFORM_BITS)
+        futures[waveform] = (WAVEFORM, buffer, None, None)
+    if buffer.loudness:
+        futures[executor.submit(compute_loudness, buffer.path, parameters)] = (LOUDNESS, buffer, None, None)
+    return futures
+
+
+def finish_waveforms(audio, future) -> None:
+    """
+    Store the waveforms computed for an audio.  A failure is logged, it does not affect the audio's streams.
+    :param audio:  The Audio the waveforms were computed for.
+    :param future: The future of the `compute_waveforms` call.
+    """
+    if future.exception() is not None:
+        logger.error("Could not compute the waveform of audio %s", audio.id, exc_info=future.exception())
+        return
+    for samples_per_pixel, data in future.result().items():
+        waveform = Waveform(audio=audio, samples_per_pixel=samples_per_pixel)
+        waveform.file.save(f"{samples_per_pixel}.dat", ContentFile(data))
+
+
+def finish_loudness(audio, future) -> None:
+    """
+    Store the loudness measured for an audio.  A failure is logged, it does not affect the audio's streams.
+    :param audio:  The Audio the loudness was measured for.
+    :param future: The future of the `compute_loudness` call.
+    """
+    if future.exception() is not None:
+        logger.error("Could not measure the loudness of audio %s", audio.id, exc_info=future.exception())
+        return
+    for field, value in future.result().items():
+        setattr(audio, field, value)
+    audio.save(update_fields=list(Audio.LOUDNESS_FIELDS))
+
+
+def reuse_waveforms(audio) -> None:
+    """
+    Copy the waveforms of an identical source, if the audio has none and they have been computed.
+    :param audio: The Audio instance.
+    """
+    if not audio.source_hash or audio.waveforms.exists():
+        return
+    waveforms = Waveform.objects.filter(audio__source_hash=audio.source_hash).exclude(audio=audio)
+    copies = dict()
+    for waveform in waveforms:
+        copies.setdefault(waveform.samples_per_pixel, Waveform(
+            audio=audio,
+            samples_per_pixel=waveform.samples_per_pixel,
+            file=waveform.file.name
+        ))
+    Waveform.objects.bulk_create(copies.values())
+
+
+def reuse_rendition(job) -> bool:
+    """
+    Finish a job with a cached rendition of an identical source, if one has been rendered since it was queued.
+    :param job: The claimed TranscodeJob.
+    :return:    True if a rendition was reused and the job is finished.
+    """
+    stream = job.stream
+    rendition = find_cached_rendition(stream)
+    if rendition is None:
+        return False
+    stream.file.name = rendition.file.name
+    stream.copy_metadata(rendition)
+    stream.status = Stream.StreamStatus.READY
+    stream.rendered_at = timezone.now()
+    with transaction.atomic():
+        stream.copy_segments(rendition)
+        stream.save(update_fields=["file", "status", "rendered_at", *Stream.METADATA_FIELDS.values()])
+    mark_job_done(job)
+    return True
+
+
+def fill_source_metadata(audio, metadata) -> None:
+    """
+    Store metadata found while decoding a source, for fields which could not be probed from its headers at upload.
+    :param audio:    The Audio whose source was decoded.
+    :param metadata: A dictionary as returned by `pcm_metadata`.
+    """
+    missing = {key: value for key, value in metadata.items() if getattr(audio, Audio.METADATA_FIELDS[key]) is None}
+    audio.set_metadata(missing)
+
+
+def group_jobs_by_audio(jobs) -> dict:
+    """
+    Group jobs by the id of the Audio they render.
+    :param jobs: The TranscodeJob instances to group.
+    :return:     A dictionary mapping Audio ids to lists of jobs.
+    """
+    groups = dict()
+    for job in jobs:
+        groups.setdefault(job.stream.audio_id, list()).append(job)
+    return groups
+
+
+def make_temporary_path(suffix) -> str:
+    """
+    Create an empty temporary file.
+    :param suffix: The file name's suffix.
+    :return:       The path of the file.
+    """
+    descriptor, path = tempfile.mkstemp(suffix=suffix)
+    os.close(descriptor)
+    return path
+
+
+def finish_job(job, output_path, error=None, segment_dir=None, durations=()) -> None:
+    """
+    Store a job's rendered file and segments, or record its failure, then remove the temporary output.  An error while
+    storing the rendition is recorded as a failure of the job.
+    :param job:         The TranscodeJob which was run.
+    :param output_path: The path of the rendered file.
+    :param error:       The exception raised while encoding, if any.  Default is None.
+    :param segment_dir: The directory the segments were written to, if any.  Default is None.
+    :param durations:   The length of each segment in seconds.  Default is no segments.
+    """
+    try:
+        if error is None:
+            try:
+                complete_job(job, output_path, segment_dir, durations)
+            except Exception as complete_error:
+                logger.exception("Could not store the rendition of stream %s", job.stream_id)
+                fail_job(job, complete_error)
+        else:
+            fail_job(job, error)
+    finally:
+        if os.path.exists(output_path):
+            os.remove(output_path)
+        if segment_dir is not None:
+            shutil.rmtree(segment_dir, ignore_errors=True)
+
+
+def complete_job(job, output_path, segment_dir=None, durations=()) -> None:
+    """
+    Save a rendered file and its segments to the job's stream and mark both as finished.
+
+    The stream's file and segments are swapped in one transaction, so a stream which is re-rendered while it is being
+    played never refers to a mix of the old and new renditions.
+    :param job:         The TranscodeJob which was run.
+    :param output_path: The path of the rendered file.
+    :param segment_dir: The directory the segments were written to, if any.  Default is None.
+    :param durations:   The length of each segment in seconds.  Default is no segments.
+    """
+    stream = job.stream
+    stream.set_metadata(probe_file(output_path), save=False)
+    with open(output_path, "rb") as output:
+        stream.file.save(f"{stream.id}.{stream.format}", File(output), save=False)
+    segments = list()
+    for index, duration in enumerate(durations):
+        segment = Segment(stream=stream, index=index, duration=duration)
+        with open(os.path.join(segment_dir, f"{index}.{stream.format}"), "rb") as segment_file:
+            segment.file.save(f"{index}.{stream.format}", File(segment_file), save=False)
+        segments.append(segment)
+    # The files must be on disk before the stream is marked ready.
+    stream.file.storage.sync()
+    stream.status = Stream.StreamStatus.READY
+    stream.rendered_at = timezone.now()
+    with transaction.atomic():
+        stream.segments.all().delete()
+        Segment.objects.bulk_create(segments)
+        stream.save(update_fields=["file", "status", "rendered_at", *Stream.METADATA_FIELDS.values()])
+    cache_rendition(stream)
+    mark_job_done(job)
+
+
+def mark_job_done(job) -> None:
+    """
+    Mark a job as successfully finished.
+    :param job: The finished TranscodeJob.
+    """
+    job.status = TranscodeJob.JobStatus.DONE
+    job.error = ""
+    job.finished_at = timezone.now()
+    job.save(update_fields=["status", "error", "finished_at"])
+
+
+def fail_job(job, error) -> None:
+    """
+    Record a failed attempt.  The job is queued again until it has been attempted `MAX_ATTEMPTS` times.
+
+    The stream of a re-render keeps its current file and status.
+    :param job:   The TranscodeJob which failed.
+    :param error: The exception raised by the attempt.
+    """
+    job.error = str(error) or type(error).__name__
+    if job.attempts >= MAX_ATTEMPTS:
+        job.status = TranscodeJob.JobStatus.FAILED
+        job.finished_at = timezone.now()
+        stream_status = Stream.StreamStatus.FAILED
+    else:
+        job.status = TranscodeJob.JobStatus.QUEUED
+        stream_status = Stream.StreamStatus.PENDING
+    job.save(update_fields=["status", "error", "finished_at"])
+    if not job.is_rerender:
+        Stream.objects.filter(id=job.stream_id).update(status=stream_status)
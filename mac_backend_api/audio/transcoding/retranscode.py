@@ -0,0 +1,88 @@
+#  Copyright (C) 2020  Mind Audio Central
+#
+#  This file is part of mac_backend_api.
+#
+#  mac_backend_api is free software: you can redistribute it and/or modify
+#  it under the terms of the GNU General Public License as published by
+#  the Free Software Foundation, either version 3 of the License, or
+#  (at your option) any later version.
+#
+#  mac_backend_api is distributed in the hope that it will be useful,
+#  but WITHOUT ANY WARRANTY; without even the implied warranty of
+#  MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+#  GNU General Public License for more details.
+#
+#  You should have received a copy of the GNU General Public License
+#  along with mac_backend_api.  If not, see <https://www.gnu.org/licenses/>.
+from django.db.models import Q
+
+from mac_backend_api.audio.models import Segment, Stream, TranscodeJob
+from mac_backend_api.audio.transcoding.cache import delete_unreferenced_files, uncache_renditions
+from mac_backend_api.audio.transcoding.queue import run_jobs, start_jobs
+
+
+def select_streams(rendered_before, formats=(), bit_rates=(), sample_rates=()):
+    """
+    Select the ready streams to render again.
+
+    Streams rendered before `rendered_at` was recorded count as rendered before any date.  Streams which already have
+    an unfinished job are left out.
+    :param rendered_before: Select streams last rendered before this datetime.
+    :param formats:         Select streams in one of these formats.  Default is any format.
+    :param bit_rates:       Select streams with one of these bit-rates.  Default is any bit-rate.
+    :param sample_rates:    Select streams with one of these sample-rates.  Default is any sample-rate.
+    :return:                A queryset of the selected Streams.
+    """
+    streams = Stream.objects.filter(status=Stream.StreamStatus.READY).exclude(file="")
+    if formats:
+        streams = streams.filter(format__in=formats)
+    if bit_rates:
+        streams = streams.filter(bit_rate__in=bit_rates)
+    if sample_rates:
+        streams = streams.filter(sample_rate__in=sample_rates)
+    streams = streams.filter(Q(rendered_at__lt=rendered_before) | Q(rendered_at__isnull=True))
+    return streams.exclude(transcode_jobs__status__in=[TranscodeJob.JobStatus.QUEUED, TranscodeJob.JobStatus.RUNNING])
+
+
+def iterate_batches(streams, batch_size, after=""):
+    """
+    Page through streams by id, so each batch is found with an index seek however far through the selection it is.
+    :param streams:    A queryset of Streams.
+    :param batch_size: The number of streams in each batch.
+    :param after:      Start after the stream with this id.  Default is the first stream.
+    :return:           A generator of lists of Streams, with their Audio selected.
+    """
+    while True:
+        batch = list(streams.filter(id__gt=after).order_by("id").select_related("audio")[:batch_size])
+        if not batch:
+            return
+        yield batch
+        after = batch[-1].id
+
+
+def rerender_streams(streams, executor=None, use_cache=True) -> int:
+    """
+    Render a batch of streams again with bulk priority, replacing their files once each new rendition is stored.
+
+    The streams stay ready and keep serving their current files while they are rendered, and if rendering fails.  Old
+    files which nothing refers to any more are deleted afterwards.  Each stream is rendered with its own format,
+    bit-rate, and sample-rate.  A rendition cached by the current encoder version is reused unless `use_cache` is
+    False, so unless `ENCODER_VERSION` was bumped nothing is encoded again by default.
+    :param streams:   The Streams to render, with their Audio selected, at most `QUERY_BATCH_SIZE`.
+    :param executor:  A `concurrent.futures.Executor` to decode and encode with.  Default is None, which runs
+                      in-process.
+    :param use_cache: Reuse cached renditions.  Default is True, False encodes every stream again and replaces its
+                      cached rendition.
+    :return:          The number of streams which were rendered.
+    """
+    if not use_cache:
+        uncache_renditions(streams)
+    old_names = [stream.file.name for stream in streams]
+    old_names.extend(Segment.objects.filter(stream__in=streams).values_list("file", flat=True))
+    jobs = TranscodeJob.objects.bulk_create(
+        TranscodeJob(stream=stream, priority=TranscodeJob.JobPriority.BULK, is_rerender=True) for stream in streams
+    )
+    job_ids = [job.id for job in jobs]
+    run_jobs(start_jobs(TranscodeJob.objects.filter(id__in=job_ids)), executor)
+    delete_unreferenced_files(old_names)
+    return TranscodeJob.objects.filter(id__in=job_ids, status=TranscodeJob.JobStatus.DONE).count()
@@ -0,0 +1,81 @@
+#  Copyright (C) 2020  Mind Audio Central
+#
+#  This file is part of mac_backend_api.
+#
+#  mac_backend_api is free software: you can redistribute it and/or modify
+#  it under the terms of the GNU General Public License as published by
+#  the Free Software Foundation, either version 3 of the License, or
+#  (at your option) any later version.
+#
+#  mac_backend_api is distributed in the hope that it will be useful,
+#  but WITHOUT ANY WARRANTY; without even the implied warranty of
+#  MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+#  GNU General Public License for more details.
+#
+#  You should have received a copy of the GNU General Public License
+#  along with mac_backend_api.  If not, see <https://www.gnu.org/licenses/>.
+
+import os
+
+from django.conf import settings
+from django.db.models import Count, Min
+from django.utils import timezone
+
+from mac_backend_api.audio.models import TranscodeJob
+
+
+def get_process_limit() -> int:
+    """
+    Get the most transcoding processes a worker may run, every CPU but `TRANSCODE_RESERVED_CPUS`.
+    :return: The process limit, at least 1.
+    """
+    return max((os.cpu_count() or 1) - settings.TRANSCODE_RESERVED_CPUS, 1)
+
+
+def get_queue_depth(priority=TranscodeJob.JobPriority.INTERACTIVE) -> int:
+    """
+    Count the queued jobs of a priority class.
+    :param priority: The JobPriority to count.  Default is INTERACTIVE.
+    :return:         The number of queued jobs.
+    """
+    return TranscodeJob.objects.filter(status=TranscodeJob.JobStatus.QUEUED, priority=priority).count()
+
+
+def get_queue_metrics() -> dict:
+    """
+    Measure the transcode queue.
+
+    Only unfinished jobs are counted, so the cost does not grow with the number of finished jobs.
+    :return: A dictionary containing the number of 'queued' jobs of each priority class, the number of 'running' jobs,
+             the age in seconds of the 'oldest_queued' job or None, and the 'high_water_mark' and 'max_depth'.
+    """
+    unfinished = TranscodeJob.objects.filter(status__in=[TranscodeJob.JobStatus.QUEUED, TranscodeJob.JobStatus.RUNNING])
+    metrics = {
+        "queued": {priority.label.lower(): 0 for priority in TranscodeJob.JobPriority},
+        "running": 0,
+        "oldest_queued": None,
+        "high_water_mark": settings.TRANSCODE_QUEUE_HIGH_WATER_MARK,
+        "max_depth": settings.TRANSCODE_QUEUE_MAX_DEPTH,
+    }
+    for row in unfinished.order_by().values("status", "priority").annotate(count=Count("id"), oldest=Min("created_at")):
+        if row["status"] == TranscodeJob.JobStatus.RUNNING:
+            metrics["running"] += row["count"]
+            continue
+        metrics["queued"][TranscodeJob.JobPriority(row["priority"]).label.lower()] = row["count"]
+        age = (timezone.now() - row["oldest"]).total_seconds()
+        metrics["oldest_queued"] = max(age, metrics["oldest_queued"] or 0)
+    return metrics
+
+
+def get_backpressure_status():
+    """
+    Decide how to answer an upload given the depth of the interactive queue.
+    :return: None if the queue is below the high-water mark, 202 if it is above it, or 503 once it reaches
+             `TRANSCODE_QUEUE_MAX_DEPTH`.
+    """
+    depth = get_queue_depth()
+    if depth >= settings.TRANSCODE_QUEUE_MAX_DEPTH:
+        return 503
+    if depth >= settings.TRANSCODE_QUEUE_HIGH_WATER_MARK:
+        return 202
+    return None
@@ -0,0 +1,129 @@
+#  Copyright (C) 2020  Mind Audio Central
+#
+#  This file is part of mac_backend_api.
+#
+#  mac_backend_api is free software: you can redistribute it and/or modify
+#  it under the terms of the GNU General Public License as published by
+#  the Free Software Foundation, either version 3 of the License, or
+#  (at your option) any later version.
+#
+#  mac_backend_api is distributed in the hope that it will be useful,
+#  but WITHOUT ANY WARRANTY; without even the implied warranty of
+#  MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+#  GNU General Public License for more details.
+#
+#  You should have received a copy of the GNU General Public License
+#  along with mac_backend_api.  If not, see <https://www.gnu.org/licenses/>.
+
+import audioop
+import struct
+import sys
+from array import array
+
+from mac_backend_api.audio.transcoding.encoder import open_pcm
+
+WAVEFORM_VERSION = 1
+FLAG_8_BIT = 1
+HEADER_FORMAT = "<iIiiI"
+
+
+def compute_waveforms(pcm_path, parameters, levels, bits) -> dict:
+    """
+    Compute min/max peak arrays of a PCM file at several resolutions.
+
+    The finest level is scanned from the PCM file with `audioop.minmax`, every coarser level is merged from the level
+    before it when it is a multiple of it, or from the finest level otherwise, so the audio is only read once.  Levels
+    are encoded in the audiowaveform "dat" format (version 1), which waveform players can load directly.
+
+    This function does not touch the database so it can safely be run in a worker process.
+    :param pcm_path:   The path of a PCM file written by `decode_to_pcm`.
+    :param parameters: The parameters returned by `decode_to_pcm`.
+    :param levels:     A sequence of samples per pixel, each level must be a multiple of the smallest.
+    :param bits:       The resolution of each peak, 8 or 16.
+    :raises ValueError: If a level is not a multiple of the smallest.
+    :return:           A dictionary mapping samples per pixel to the encoded waveform.
+    """
+    levels = sorted(levels)
+    finest = levels[0]
+    for level in levels:
+        if level % finest:
+            raise ValueError(f"Waveform level {level} is not a multiple of the finest level {finest}")
+    with open_pcm(pcm_path, parameters) as segment:
+        finest_peaks = scan_peaks(segment.raw_data, segment.sample_width, segment.frame_width * finest, bits)
+    waveforms = dict()
+    peaks, samples_per_pixel = finest_peaks, finest
+    for level in levels:
+        if level % samples_per_pixel:
+            peaks, samples_per_pixel = finest_peaks, finest
+        peaks = merge_peaks(peaks, level // samples_per_pixel)
+        samples_per_pixel = level
+        waveforms[level] = encode_waveform(peaks, parameters["frame_rate"], level, bits)
+    return waveforms
+
+
+def scan_peaks(data, sample_width, step, bits) -> array:
+    """
+    Find the minimum and maximum sample of each `step` bytes of PCM data.
+    :param data:         The PCM data.
+    :param sample_width: The width of each sample in bytes.
+    :param step:         The number of bytes per pixel, a multiple of the frame width.
+    :param bits:         The resolution to scale peaks to, 8 or 16.
+    :return:             An array of interleaved minimum and maximum values.
+    """
+    shift = sample_width * 8 - bits
+    peaks = array("b" if bits == 8 else "h")
+    for offset in range(0, len(data), step):
+        minimum, maximum = audioop.minmax(data[offset:offset + step], sample_width)
+        if shift >= 0:
+            peaks.extend((minimum >> shift, maximum >> shift))
+        else:
+            peaks.extend((minimum << -shift, maximum << -shift))
+    return peaks
+
+
+def merge_peaks(peaks, factor=2) -> array:
+    """
+    Lower the resolution of a peak array by combining every `factor` neighbouring pixels.
+    :param peaks:  An array of interleaved minimum and maximum values.
+    :param factor: The number of pixels to combine.  Default is 2.
+    :return:       An array with `factor` times fewer pixels, rounded up.
+    """
+    if factor == 1:
+        return peaks
+    merged = array(peaks.typecode)
+    step = factor * 2
+    for index in range(0, len(peaks), step):
+        pixels = peaks[index:index + step]
+        merged.extend((min(pixels[0::2]), max(pixels[1::2])))
+    return merged
+
+
+def encode_waveform(peaks, sample_rate, samples_per_pixel, bits) -> bytes:
+    """
+    Encode a peak array in the audiowaveform "dat" format.
+    :param peaks:             An array of interleaved minimum and maximum values.
+    :param sample_rate:       The sample-rate of the audio the peaks were taken from.
+    :param samples_per_pixel: The number of samples each pair of peaks covers.
+    :param bits:              The resolution of the peaks, 8 or 16.
+    :return:                  The encoded waveform.
+    """
+    flags = FLAG_8_BIT if bits == 8 else 0
+    header = struct.pack(HEADER_FORMAT, WAVEFORM_VERSION, flags, sample_rate, samples_per_pixel, len(peaks) // 2)
+    if sys.byteorder == "big":
+        peaks = array(peaks.typecode, peaks)
+        peaks.byteswap()
+    return header + peaks.tobytes()
+
+
+def decode_waveform(data) -> tuple:
+    """
+    Decode a waveform encoded by `encode_waveform`.
+    :param data: The encoded waveform.
+    :return:     A tuple of (sample_rate, samples_per_pixel, peaks).
+    """
+    version, flags, sample_rate, samples_per_pixel, length = struct.unpack_from(HEADER_FORMAT, data)
+    peaks = array("b" if flags & FLAG_8_BIT else "h")
+    peaks.frombytes(data[struct.calcsize(HEADER_FORMAT):])
+    if sys.byteorder == "big":
+        peaks.byteswap()
+    return sample_rate, samples_per_pixel, peaks
@@ -0,0 +1,107 @@
+#  Copyright (C) 2020  Mind Audio Central
+#
+#  This file is part of mac_backend_api.
+#
+#  mac_backend_api is free software: you can redistribute it and/or modify
+#  it under the terms of the GNU General Public License as published by
+#  the Free Software Foundation, either version 3 of the License, or
+#  (at your option) any later version.
+#
+#  mac_backend_api is distributed in the hope that it will be useful,
+#  but WITHOUT ANY WARRANTY; without even the implied warranty of
+#  MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+#  GNU General Public License for more details.
+#
+#  You should have received a copy of the GNU General Public License
+#  along with mac_backend_api.  If not, see <https://www.gnu.org/licenses/>.
+from collections import Counter
+from datetime import timedelta
+
+from django.conf import settings
+from django.db import transaction
+from django.db.models import Count, F, Max
+from django.db.models.functions import TruncHour
+from django.utils import timezone
+
+from mac_backend_api.audio.listens import in_batches
+from mac_backend_api.audio.models import Like, ListenRollup, TrendingScore
+
+HOUR = timedelta(hours=1)
+
+
+def get_decay(age) -> float:
+    """
+    Get the weight of activity of a given age, which halves every `TRENDING_HALF_LIFE` hours.
+    :param age: The age of the activity as a timedelta.
+    :return:    The weight, between 0 and 1.
+    """
+    return 0.5 ** (age / timedelta(hours=settings.TRENDING_HALF_LIFE))
+
+
+def get_complete_hour(now=None):
+    """
+    Get the start of the previous hour.  Listens and likes before it are complete and can be scored.
+
+    Listens are buffered for up to `LISTEN_FLUSH_INTERVAL` before their rollup is written, so the hour which just ended
+    may still receive some.  Scoring lags a full hour behind so they are never missed, an hour is not read again once
+    it has been scored.
+    :param now: The current time.  Default is `timezone.now()`.
+    :return:    The aware datetime.
+    """
+    return (now or timezone.now()).replace(minute=0, second=0, microsecond=0) - HOUR
+
+
+@transaction.atomic
+def update_trending(now=None, full=False) -> int:
+    """
+    Bring the trending scores up to the last complete hour, see `get_complete_hour`.
+
+    Scores decay exponentially, so they are updated incrementally: every stored score is decayed by the time since it
+    was computed with a single UPDATE, then the listens and likes of the hours since then are added, decayed by their
+    age.  Only the new hours' ListenRollups and Likes are read.  Scores of audios which are no longer public, or which
+    decayed below `TRENDING_MIN_SCORE`, are removed.
+    :param now:  The current time.  Default is `timezone.now()`.
+    :param full: Discard the stored scores and compute them from the last `TRENDING_WINDOW` days.  Default is False,
+                 which is also a full computation when no scores are stored.
+    :return:     The number of audios whose score changed.
+    """
+    through = get_complete_hour(now)
+    since = TrendingScore.objects.aggregate(since=Max("computed_through"))["since"]
+    if full or since is None:
+        TrendingScore.objects.all().delete()
+        since = through - timedelta(days=settings.TRENDING_WINDOW)
+    if since >= through:
+        return 0
+    TrendingScore.objects.update(score=F("score") * get_decay(through - since), computed_through=through)
+    contributions = Counter()
+    rollups = ListenRollup.objects.filter(hour__gte=since, hour__lt=through, audio__is_public=True)
+    for audio_id, hour, count in rollups.values_list("audio_id", "hour", "count").iterator():
+        contributions[audio_id] += count * get_decay(through - hour - HOUR)
+    likes = Like.objects.filter(created_at__gte=since, created_at__lt=through, audio__is_public=True).order_by()
+    likes = likes.annotate(hour=TruncHour("created_at")).values("audio_id", "hour").annotate(count=Count("id"))
+    for like in likes:
+        contributions[like["audio_id"]] += settings.TRENDING_LIKE_WEIGHT * like["count"] * get_decay(
+            through - like["hour"] - HOUR
+        )
+    store_contributions(contributions, through)
+    TrendingScore.objects.filter(audio__is_public=False).delete()
+    TrendingScore.objects.filter(score__lt=settings.TRENDING_MIN_SCORE).delete()
+    return len(contributions)
+
+
+def store_contributions(contributions, through) -> None:
+    """
+    Add score contributions to the stored scores in bulk, creating the scores of audios which have none.
+    :param contributions: A dictionary mapping Audio ids to the score to add.
+    :param through:       The `computed_through` of new scores.
+    """
+    for audio_ids in in_batches(list(contributions)):
+        scores = list(TrendingScore.objects.filter(audio_id__in=audio_ids))
+        for score in scores:
+            score.score += contributions[score.audio_id]
+        TrendingScore.objects.bulk_update(scores, ["score"])
+        scored = {score.audio_id for score in scores}
+        TrendingScore.objects.bulk_create(
+            TrendingScore(audio_id=audio_id, score=contributions[audio_id], computed_through=through)
+            for audio_id in audio_ids if audio_id not in scored
+        )